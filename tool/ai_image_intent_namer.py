@@ -46,24 +46,25 @@ from __future__ import annotations
 
 import argparse
 import base64
+import bisect
+import errno
 import json
 import os
 import re
+import shutil
 import sys
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 import copy
 import hashlib
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Set, Tuple
 from urllib.parse import unquote, urlparse
 
-try:
-    import requests
-except Exception:
-    requests = None
-
 # 控制台编码（Windows/中文友好）
 try:
     sys.stdout.reconfigure(encoding="utf-8")
@@ -97,19 +98,58 @@ CAPTION_CLUES = [
 EXPLICIT_REF_PATTERNS = [
     r"如上图所示", r"如下图所示", r"如图\s*\d+", r"见图\s*\d+", r"上图", r"下图", r"如上", r"如下", r"如前图", r"见前图"
 ]
+# 显式引用短语合并为单个交替式，一次扫描即可全部剥离
+EXPLICIT_REF_RE = re.compile("|".join(EXPLICIT_REF_PATTERNS))
+# 逐模式收集（允许重叠）时使用的预编译列表，与 EXPLICIT_REF_PATTERNS 一一对应
+EXPLICIT_REF_COMPILED = [re.compile(p) for p in EXPLICIT_REF_PATTERNS]
+# 分块判定在每张图片上都会执行，相关正则在模块加载时编译一次
+VISIBLE_CHAR_RE = re.compile(r"[\u4e00-\u9fffA-Za-z0-9]")
+HEADING_LINE_RE = re.compile(r"(?m)^\s*#+\s+.*$")
+LIST_LINE_RE = re.compile(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$")
+FIGURE_LABEL_RE = re.compile(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", re.IGNORECASE)
+NON_LETTER_RE = re.compile(r"[\d\W_]+", re.UNICODE)
 
 FORBIDDEN_CHARS = '\\/:*?"<>|'
+# sanitize_filename 一次 translate 删除的字符：括号、引号与 Windows 不允许的字符
+FILENAME_DROP_TABLE = str.maketrans("", "", "（）()“”'\"" + FORBIDDEN_CHARS)
 WHITESPACE_RE = re.compile(r"\s+")
+# 标题提取、行类别判断与上下文清理逐图都会调用，同样在模块加载时编译
+FRONT_MATTER_RE = re.compile(r"^---\s*(.*?)\s*---", re.DOTALL)
+FRONT_MATTER_TITLE_RES = [re.compile(rf"^\s*{key}\s*:\s*(.+)$", re.MULTILINE) for key in ("parent", "title", "Parent", "Title")]
+BULLET_ITEM_RE = re.compile(r"^\s*[-*+]\s+")
+ORDERED_ITEM_RE = re.compile(r"^\s*\d+\.\s+")
+IMG_TAG_OPEN_RE = re.compile(r"<img\b", re.IGNORECASE)
+QUOTED_TITLE_RE = re.compile(r'(".*?"|\'.*?\')')
+ZOTERO_IMG_EMBED_RE = re.compile(r'!\[(?:\\?<img[^>]*data-attachment-key="([^"]+)"[^>]*>)\s*\|[^]]*\]\(([^)]+)\)')
+FRONT_MATTER_BLOCK_RE = re.compile(r"^---\s*.*?\s*---\s*", re.DOTALL)
+CODE_FENCE_BLOCK_RE = re.compile(r"```.*?```", re.DOTALL)
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+MD_LINK_RE = re.compile(r"\[[^\]]+\]\([^)]+\)")
+BARE_IMAGE_FILE_RE = re.compile(r"(?i)\b\S+\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b")
+METADATA_LINE_RE = re.compile(r"(?mi)^(tags\s*:.*|parent\s*:.*|collections\s*:.*|\$version\s*:.*|\$libraryID\s*:.*|\$itemKey\s*:.*)\s*$")
+RULE_LINE_RE = re.compile(r"(?m)^\s*(\*{3,}|-{3,}|_{3,})\s*$")
+SENTENCE_SPLIT_RE = re.compile(r"[。！？!?；;]+|\n+")
+TERM_NOISE_RE = re.compile(r"[『』「」【】《》()（）\*\-\+\=\[\]{}|\\]")
+TERM_SENTENCE_END_RE = re.compile(r"[。！？；.]")
 MAPPING_FILENAME = ".image_moves.json"
 PLAN_FILENAME = ".image_plan.json"
-
+INTENT_CACHE_FILENAME = ".intent_cache.json"
+INTENT_CACHE_TEXT_LIMIT = 500          # 缓存键只取上下文前 500 字
+INTENT_CACHE_MAX_ENTRIES = 5000
+INTENT_PROMPT_VERSION = "1"            # 提示词版本，计入图意缓存键；修改 build_ai_messages / build_ai_batch_messages 的提示词时递增
+IMAGE_FINGERPRINT_BYTES = 256 * 1024   # 图片指纹只读取前 256KB
+DEFAULT_VISION_MAX_SIDE = 0            # CLI 发给 VLM 的图片最长边（像素），0 表示原图（小字不会因缩放而糊掉）
+GUI_VISION_MAX_SIDE = 768              # 图形界面里缩放选项的初始值，用户可改为 0 发送原图
+VISION_JPEG_QUALITY = 82
+
+@lru_cache(maxsize=4096)
 def sanitize_filename(name: str) -> str:
     if not name:
         return "image"
-    name = "".join(ch for ch in name if ch.isprintable())
-    for ch in ("（", "）", "(", ")", "“", "”", "'", '"'):
-        name = name.replace(ch, "")
-    name = "".join(ch for ch in name if ch not in FORBIDDEN_CHARS)
+    name = name.translate(FILENAME_DROP_TABLE)
+    # 绝大多数名字本就全部可打印，整串检查一次即可跳过逐字符过滤
+    if not name.isprintable():
+        name = "".join(ch for ch in name if ch.isprintable())
     name = name.strip(" .")
     name = WHITESPACE_RE.sub("_", name)
     return name or "image"
@@ -135,6 +175,31 @@ def is_remote_url(url: str) -> bool:
     s = (url or "").strip().lower()
     return s.startswith("http://") or s.startswith("https://")
 
+def _iter_files(root: Path):
+    """
+    用 os.scandir 显式栈遍历 root 下的全部文件，产出 os.DirEntry（按目录内名称排序，深度优先）。
+    跳过以 . 开头的隐藏目录（.git/.obsidian/.trash 等），不跟随符号链接目录。
+    """
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs: List[str] = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith("."):
+                        subdirs.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
 def resolve_local_image(md_dir: Path, src: str) -> Optional[Path]:
     """
     解析/定位本地图片路径，容错以下情况：
@@ -157,17 +222,19 @@ def resolve_local_image(md_dir: Path, src: str) -> Optional[Path]:
         p2 = (md_dir / Path(s2)).resolve()
         if p2.exists():
             return p2
-        # 基于文件名递归搜索（先精确名称，再前缀匹配）
+        # 基于文件名递归搜索（先精确名称，再前缀匹配），一次遍历同时完成两种匹配
         basename = Path(s2).name or Path(s).name
         if basename:
-            for cand in md_dir.rglob(basename):
-                if cand.is_file():
-                    return cand
             stem = Path(basename).stem
-            exts = IMAGE_EXTS
-            for cand in md_dir.rglob(f"{stem}*"):
-                if cand.is_file() and cand.suffix.lower() in exts:
-                    return cand
+            prefix_hit: Optional[str] = None
+            for entry in _iter_files(md_dir):
+                name = entry.name
+                if name == basename:
+                    return Path(entry.path)
+                if prefix_hit is None and name.startswith(stem) and os.path.splitext(name)[1].lower() in IMAGE_EXTS:
+                    prefix_hit = entry.path
+            if prefix_hit is not None:
+                return Path(prefix_hit)
         return None
     except Exception:
         return None
@@ -188,6 +255,20 @@ def _hash_file(path: Path) -> str:
     return h.hexdigest()
 
 
+def move_file(src: Path, dest: Path) -> None:
+    """
+    os.replace 原子搬移；仅在跨磁盘（EXDEV）时退回流式复制 + 删除源文件。
+    其它错误（权限、占用等）照常抛出，由调用方记录，不再静默整文件读写。
+    """
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copyfile(src, dest)
+        os.unlink(src)
+
+
 def _try_move_file(src: Path, dest: Path) -> bool:
     try:
         dest.parent.mkdir(parents=True, exist_ok=True)
@@ -195,8 +276,7 @@ def _try_move_file(src: Path, dest: Path) -> bool:
         return True
     except Exception:
         try:
-            data = src.read_bytes()
-            dest.write_bytes(data)
+            shutil.copyfile(src, dest)
             try:
                 src.unlink()
             except Exception:
@@ -275,8 +355,46 @@ def read_text(path: Path) -> str:
             break
     return path.read_text(encoding="utf-8", errors="ignore")
 
+def _fsync_dir(directory: Path) -> None:
+    # Windows 没有 O_DIRECTORY，目录无法单独 fsync，跳过即可
+    flag = getattr(os, "O_DIRECTORY", None)
+    if flag is None:
+        return
+    try:
+        fd = os.open(str(directory), os.O_RDONLY | flag)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
 def write_text_utf8(path: Path, text: str) -> None:
-    path.write_text(text, encoding="utf-8", newline="\n")
+    """
+    原子写入：先写同目录 .tmp 并 fsync，再 os.replace 覆盖目标并 fsync 目录。
+    中途崩溃时目标文件要么是旧内容、要么是完整新内容，不会出现截断的文档或备份。
+    """
+    target = Path(os.path.realpath(path))  # 符号链接写到真实文件，不替换链接本身
+    tmp = target.with_name(target.name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(target, tmp)
+        except OSError:
+            pass
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(target.parent)
 
 def normalize_base_url(base_url: str) -> str:
     """规范化 Base URL，避免用户填写了 /v1 导致拼接成 /v1/v1/chat/completions"""
@@ -307,11 +425,84 @@ def guess_mime_from_ext(ext: str) -> str:
     }
     return mapping.get(ext, "application/octet-stream")
 
-def build_vision_src(md_path: Path, img_src: str) -> Optional[str]:
+@lru_cache(maxsize=None)
+def load_requests():
+    """按需导入 requests：只有调用 AI、下载或预览远程图片时才用到，启动时不必加载。缺失时返回 None。"""
+    try:
+        import requests  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    return requests
+
+@lru_cache(maxsize=None)
+def _load_pil_image():
+    """按需导入 Pillow：只有视觉模式缩图才用到，避免拖慢 CLI/GUI 启动。"""
+    try:
+        from PIL import Image  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    return Image
+
+def shrink_image_for_vision(data: bytes, max_side: int) -> Optional[bytes]:
+    """
+    将图片缩到最长边 max_side 并转为 JPEG，减少 VLM 上传体积与 token。
+    无 Pillow、无法解码或本身已足够小时返回 None（调用方沿用原图）。
+    """
+    if max_side <= 0:
+        return None
+    Image = _load_pil_image()
+    if Image is None:
+        return None
+    try:
+        from io import BytesIO
+
+        img = Image.open(BytesIO(data))
+        if max(img.size) <= max_side:
+            return None
+        # draft 让 JPEG 解码器直接按缩小比例解码，省去全分辨率解码
+        img.draft("RGB", (max_side * 2, max_side * 2))
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            canvas = Image.new("RGB", img.size, (255, 255, 255))
+            canvas.paste(img, mask=img.split()[-1])
+            img = canvas
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        resample = getattr(Image, "Resampling", Image).LANCZOS
+        img.thumbnail((max_side, max_side), resample)
+        out = BytesIO()
+        img.save(out, "JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+        return out.getvalue()
+    except Exception:
+        return None
+
+def decode_preview_image(data: bytes, box: Tuple[int, int]):
+    """
+    解码界面预览用的缩略图（返回 PIL Image，需已安装 Pillow）。
+    JPEG 通过 draft 直接按 1/2~1/8 比例解码；预览尺寸很小，缩放用 BILINEAR 即可。
+    """
+    from io import BytesIO
+
+    Image = _load_pil_image()
+    if Image is None:
+        raise RuntimeError("缺少 Pillow 库（pip install pillow）")
+    im = Image.open(BytesIO(data))
+    try:
+        im.draft("RGB", box)
+    except Exception:
+        pass
+    try:
+        im = im.convert("RGB")
+    except Exception:
+        pass
+    im.thumbnail(box, getattr(Image, "Resampling", Image).BILINEAR)
+    return im
+
+def build_vision_src(md_path: Path, img_src: str, max_side: int = 0) -> Optional[str]:
     """
     返回用于 VLM 的 image_url：
     - 远程：直接使用原始 URL
-    - 本地：转换为 data URL（data:<mime>;base64,<payload>）
+    - 本地：转换为 data URL（data:<mime>;base64,<payload>）；max_side>0 时先缩图再编码
     """
     try:
         if is_remote_url(img_src):
@@ -321,12 +512,33 @@ def build_vision_src(md_path: Path, img_src: str) -> Optional[str]:
         if not p or not p.exists():
             return None
         data = p.read_bytes()
-        b64 = base64.b64encode(data).decode("ascii")
         mime = guess_mime_from_ext(p.suffix)
+        if max_side > 0 and mime not in ("image/svg+xml", "image/gif"):
+            small = shrink_image_for_vision(data, max_side)
+            if small is not None:
+                data, mime = small, "image/jpeg"
+        b64 = base64.b64encode(data).decode("ascii")
         return f"data:{mime};base64,{b64}"
     except Exception:
         return None
 
+def _cache_digest(data: bytes) -> str:
+    # 缓存键只需防碰撞、无需抗攻击：blake2b 比 sha256 快，128 位摘要足够
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def image_fingerprint(md_path: Path, img_src: str) -> str:
+    """图片内容指纹：本地图片取前 256KB 的 blake2b，远程或无法读取时退回原始 src。"""
+    try:
+        if not is_remote_url(img_src):
+            p = resolve_local_image(md_path.parent, img_src)
+            if p and p.exists():
+                with p.open("rb") as fh:
+                    head = fh.read(IMAGE_FINGERPRINT_BYTES)
+                return "b2:" + _cache_digest(head)
+    except Exception:
+        pass
+    return "src:" + img_src
+
 def split_md_target(raw: str) -> Tuple[str, str]:
     s = raw.strip()
     if s.startswith("<") and ">" in s:
@@ -342,11 +554,11 @@ def split_md_target(raw: str) -> Tuple[str, str]:
     return url, trailing if trailing.startswith(" ") else ((" " + trailing) if trailing else "")
 
 def extract_doc_title(text: str, md_path: Path) -> str:
-    m = re.match(r"^---\s*(.*?)\s*---", text, flags=re.DOTALL)
+    m = FRONT_MATTER_RE.match(text)
     if m:
         fm = m.group(1)
-        for key in ["parent", "title", "Parent", "Title"]:
-            km = re.search(rf"^\s*{key}\s*:\s*(.+)$", fm, flags=re.MULTILINE)
+        for key_re in FRONT_MATTER_TITLE_RES:
+            km = key_re.search(fm)
             if km:
                 candidate = km.group(1).strip().strip("'\"")
                 if candidate:
@@ -394,12 +606,12 @@ def classify_line(line: str) -> str:
         return "quote"
     if s.startswith("<img") or s.startswith("<figure") or s.startswith("<table"):
         return "html"
-    if re.match(r"^\s*[-*+]\s+", s) or re.match(r"^\s*\d+\.\s+", s):
+    if BULLET_ITEM_RE.match(s) or ORDERED_ITEM_RE.match(s):
         return "list"
     if s.startswith("|") and s.endswith("|"):
         return "table"
     # 图片语法行（粗略）
-    if "![“" in line or "![" in line or re.search(r"<img\b", line, re.IGNORECASE):
+    if "![“" in line or "![" in line or IMG_TAG_OPEN_RE.search(line):
         return "maybe_image"
     return "paragraph"
 
@@ -470,59 +682,68 @@ def parse_blocks(md_text: str) -> List[Block]:
 
     return blocks
 
+def _newline_offsets(text: str) -> List[int]:
+    """全部换行符的下标（升序）；行号 = bisect_left(offsets, pos) + 1，免去逐个切片计数。"""
+    offsets: List[int] = []
+    pos = text.find("\n")
+    while pos != -1:
+        offsets.append(pos)
+        pos = text.find("\n", pos + 1)
+    return offsets
+
 def collect_images(md_text: str) -> List[ImageRef]:
     refs: List[ImageRef] = []
+    newlines = _newline_offsets(md_text)
     for m in MD_IMAGE_RE.finditer(md_text):
         alt = m.group(1).strip() or None
         raw_target = m.group(2)
         url, trailing = split_md_target(raw_target)
         title = None
-        tm = re.search(r'(".*?"|\'.*?\')', trailing or "")
+        tm = QUOTED_TITLE_RE.search(trailing or "")
         if tm:
             title = tm.group(0).strip('"').strip("'")
-        refs.append(ImageRef("md", url, m.start(), m.end(), md_text[:m.start()].count("\n") + 1, alt=alt, title=title))
+        refs.append(ImageRef("md", url, m.start(), m.end(), bisect.bisect_left(newlines, m.start()) + 1, alt=alt, title=title))
     for m in HTML_IMG_RE.finditer(md_text):
         start = m.start()
         prev = md_text[max(0, start - 3):start]
         if prev.endswith("![") or prev.endswith("![\\"):
             continue
-        refs.append(ImageRef("html", m.group(1).strip(), start, m.end(), md_text[:start].count("\n") + 1))
+        refs.append(ImageRef("html", m.group(1).strip(), start, m.end(), bisect.bisect_left(newlines, start) + 1))
     for m in WIKILINK_EMBED_RE.finditer(md_text):
         inside = m.group(1).strip()
         target = inside.split("|", 1)[0].strip()
-        refs.append(ImageRef("wikilink", target, m.start(), m.end(), md_text[:m.start()].count("\n") + 1))
+        refs.append(ImageRef("wikilink", target, m.start(), m.end(), bisect.bisect_left(newlines, m.start()) + 1))
     return refs
 
 
 def normalize_embedded_html_images(md_text: str) -> Tuple[str, int]:
-    pattern = re.compile(r'!\[(?:\\?<img[^>]*data-attachment-key="([^"]+)"[^>]*>)\s*\|[^]]*\]\(([^)]+)\)')
     def repl(match: re.Match) -> str:
         key = match.group(1) or "image"
         target = match.group(2)
         return f"![{key}]({target})"
-    new_text, count = pattern.subn(repl, md_text)
+    new_text, count = ZOTERO_IMG_EMBED_RE.subn(repl, md_text)
     return new_text, count
 
 def text_between(md_text: str, start: int, end: int) -> str:
     raw = md_text[start:end]
     # 去除 YAML Front Matter（避免把 tags/parent/collections 等元数据混入“上文/下文”）
-    raw = re.sub(r"^---\s*.*?\s*---\s*", "", raw, flags=re.DOTALL)
+    raw = FRONT_MATTER_BLOCK_RE.sub("", raw)
     # 去除代码块
-    raw = re.sub(r"```.*?```", "", raw, flags=re.DOTALL)
+    raw = CODE_FENCE_BLOCK_RE.sub("", raw)
     # 去除 HTML 标签与 <img>（保底）
-    raw = re.sub(r"<[^>]+>", "", raw)
+    raw = HTML_TAG_RE.sub("", raw)
     # 去除 Markdown 普通链接 [text](url)
-    raw = re.sub(r"\[[^\]]+\]\([^)]+\)", "", raw)
+    raw = MD_LINK_RE.sub("", raw)
     # 关键：去除 Markdown 图片语法与 Obsidian 图片嵌入，避免图片语句进入“上/下文”
     # ![alt](url "title") / ![alt](<url> "title")
     raw = MD_IMAGE_RE.sub("", raw)
     # ![[path|alias]] / ![[path]]
     raw = WIKILINK_EMBED_RE.sub("", raw)
     # 去除疑似图片地址（裸露的 *.png/jpg/...），避免如 “attachment/xxx.jpg” 进入文本
-    raw = re.sub(r"(?i)\b\S+\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b", "", raw)
+    raw = BARE_IMAGE_FILE_RE.sub("", raw)
     # 去除常见元数据行与分隔线
-    raw = re.sub(r"(?mi)^(tags\s*:.*|parent\s*:.*|collections\s*:.*|\$version\s*:.*|\$libraryID\s*:.*|\$itemKey\s*:.*)\s*$", "", raw)
-    raw = re.sub(r"(?m)^\s*(\*{3,}|-{3,}|_{3,})\s*$", "", raw)
+    raw = METADATA_LINE_RE.sub("", raw)
+    raw = RULE_LINE_RE.sub("", raw)
     # 压缩空白
     raw = WHITESPACE_RE.sub(" ", raw).strip()
     return raw
@@ -534,8 +755,8 @@ def has_caption_clues(s: str) -> bool:
 
 def find_explicit_refs(s: str) -> List[str]:
     out = []
-    for pat in EXPLICIT_REF_PATTERNS:
-        for m in re.finditer(pat, s):
+    for rx in EXPLICIT_REF_COMPILED:
+        for m in rx.finditer(s):
             out.append(m.group(0))
     return out
 
@@ -550,14 +771,55 @@ def find_neighbor_text(md_text: str, refs: List[ImageRef], idx: int) -> Tuple[st
     explicit = find_explicit_refs(above + " " + below)
     return above, below, between, explicit
 
+def find_all_neighbor_texts(md_text: str, refs: List[ImageRef]) -> List[Tuple[str, str, str, List[str]]]:
+    """
+    一次线性遍历算出全部图片的 (above, below, between, explicit_refs)，结果与逐个调用 find_neighbor_text 相同。
+    相邻两图共用同一段间隔文本（前一图的 below 即后一图的 above），每段只清洗一次。
+    """
+    if not refs:
+        return []
+    bounds = [0] + [pos for r in refs for pos in (r.start, r.end)] + [len(md_text)]
+    gaps = [text_between(md_text, bounds[k], bounds[k + 1]) for k in range(0, len(bounds), 2)]
+    out: List[Tuple[str, str, str, List[str]]] = []
+    for i in range(len(refs)):
+        above = gaps[i]
+        below = gaps[i + 1]
+        out.append((above, below, above, find_explicit_refs(above + " " + below)))
+    return out
+
+def above_starts_block(above: str, gap: int, explicit_refs: List[str]) -> bool:
+    """
+    判断“上一图到当前图之间的文字”是否开启新块：与上一图间隔 >3、无显式引用，
+    且剔除标题/列表/图号/显式引用后仍有 >=8 个字母/汉字。
+    各步剥离只会删字，先用间隔与原文字母数做廉价判断，不可能达标时跳过整串正则。
+    """
+    if gap <= 3 or explicit_refs or len(above) < 8:
+        return False
+    if len(NON_LETTER_RE.sub("", above)) < 8:
+        return False
+    if len(VISIBLE_CHAR_RE.findall(above)) < 4:
+        return False
+    above_wo_refs = above
+    try:
+        above_wo_refs = EXPLICIT_REF_RE.sub("", above_wo_refs)
+    except Exception:
+        pass
+    try:
+        above_wo_refs = HEADING_LINE_RE.sub("", above_wo_refs)
+        above_wo_refs = LIST_LINE_RE.sub("", above_wo_refs)
+        above_wo_refs = FIGURE_LABEL_RE.sub("", above_wo_refs)
+    except Exception:
+        pass
+    return len(NON_LETTER_RE.sub("", above_wo_refs)) >= 8
+
 def _collect_explicit_matches_with_spans(s: str) -> List[Tuple[int, int, str]]:
     """收集显式引用短语的 span，用于“按文字指示”决定侧向与句子聚焦。"""
     matches: List[Tuple[int, int, str]] = []
     if not s:
         return matches
-    for pat in EXPLICIT_REF_PATTERNS:
-        for m in re.finditer(pat, s):
-            matches.append((m.start(), m.end(), pat))
+    for rx in EXPLICIT_REF_COMPILED:
+        for m in rx.finditer(s):
+            matches.append((m.start(), m.end(), rx.pattern))
     return matches
 
 def _extract_sentence_around(s: str, start: int, end: int) -> str:
@@ -644,12 +906,18 @@ SCI_FIG_TOKEN_RE = re.compile(
 )
 SCI_PANEL_MARK_RE = re.compile(r"[\(\[]\s*([A-Z])\s*[\)\]]")
 SCI_PANEL_INLINE_RE = re.compile(r"(?:^|[;,\.\s])([A-H])(?:[\.:]\s*|,\s+)", re.IGNORECASE)
+SCI_PANEL_LEAD_RE = re.compile(r"^[\s\u3000\.;:,\-]+")
+SCI_SUMMARY_LABEL_RE = re.compile(r"^(?:fig(?:ure)?\.?\s*[Ss]?\s*\d+[A-Za-z]?\s*[:\-\.,]*)", re.IGNORECASE)
+SCI_SUMMARY_LEAD_RE = re.compile(r"^[\s:;,\-\.]+")
+FIG_ID_NOISE_RE = re.compile(r"[^0-9A-Za-z\-]+")
+NON_ASCII_LETTER_RE = re.compile(r"[^A-Za-z]")
+DIGITS_RE = re.compile(r"(\d+)")
 
 
 def _normalize_fig_identifier(prefix: Optional[str], number: str) -> Optional[str]:
     if not number:
         return None
-    clean_num = re.sub(r"[^0-9A-Za-z\-]+", "", number)
+    clean_num = FIG_ID_NOISE_RE.sub("", number)
     if not clean_num:
         return None
     prefix_clean = (prefix or "").strip().upper()
@@ -715,8 +983,8 @@ def _collect_panel_markers(text: Optional[str]) -> Tuple[List[str], Dict[str, st
             start = match.end()
             end = matches[idx + 1].start() if idx + 1 < len(matches) else len(normalized)
             segment = normalized[start:end].strip()
-            segment = re.sub(r"^[\s\u3000\.;:,\-]+", "", segment)
-            segment = re.sub(r"\s+", " ", segment)
+            segment = SCI_PANEL_LEAD_RE.sub("", segment)
+            segment = WHITESPACE_RE.sub(" ", segment)
             if segment:
                 segments[letter] = segment
     else:
@@ -729,8 +997,8 @@ def _collect_panel_markers(text: Optional[str]) -> Tuple[List[str], Dict[str, st
                 start = match.end()
                 end = matches_inline[idx + 1].start() if idx + 1 < len(matches_inline) else len(normalized)
                 segment = normalized[start:end].strip()
-                segment = re.sub(r"^[\s\u3000\.;:,\-]+", "", segment)
-                segment = re.sub(r"\s+", " ", segment)
+                segment = SCI_PANEL_LEAD_RE.sub("", segment)
+                segment = WHITESPACE_RE.sub(" ", segment)
                 if segment:
                     segments[letter] = segment
     return markers, segments
@@ -755,8 +1023,8 @@ def _clean_sci_summary(summary: Optional[str]) -> str:
     if not summary:
         return ""
     text = WHITESPACE_RE.sub(" ", summary).strip()
-    text = re.sub(r"^(?:fig(?:ure)?\.?\s*[Ss]?\s*\d+[A-Za-z]?\s*[:\-\.,]*)", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"^[\s:;,\-\.]+", "", text)
+    text = SCI_SUMMARY_LABEL_RE.sub("", text)
+    text = SCI_SUMMARY_LEAD_RE.sub("", text)
     text = text.strip()
     return text[:80]
 
@@ -803,7 +1071,7 @@ def build_sci_metadata(
             if panel_val and not panel:
                 panel = panel_val
         if not figure:
-            digits = re.search(r"(\d+)", stem)
+            digits = DIGITS_RE.search(stem)
             if digits:
                 figure = digits.group(1)
 
@@ -845,17 +1113,122 @@ def prompt_for_api_key_if_missing(api_key: Optional[str]) -> str:
     except Exception:
         return ""
 
-# 记录最近一次 LLM 调用错误，便于 GUI/报告展示
+# 记录最近一次 LLM 调用错误，便于 GUI/报告展示；并发调用时优先读取本线程的记录
 _LAST_LLM_ERROR: Optional[str] = None
+_LLM_ERROR_LOCAL = threading.local()
 
 def set_last_llm_error(msg: Optional[str]) -> None:
     global _LAST_LLM_ERROR
     _LAST_LLM_ERROR = msg
+    _LLM_ERROR_LOCAL.msg = msg
 
 def get_last_llm_error() -> Optional[str]:
-    return _LAST_LLM_ERROR
+    return getattr(_LLM_ERROR_LOCAL, "msg", _LAST_LLM_ERROR)
+
+class TokenBucket:
+    """线程安全的令牌桶：按每分钟请求数（RPM）匀速补充令牌，最多积攒 burst 个以允许突发。"""
+
+    def __init__(self, rate_per_min: float, burst: int = 1) -> None:
+        self.rate = max(float(rate_per_min), 0.001) / 60.0  # 每秒补充的令牌数
+        self.capacity = float(max(1, int(burst)))
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """取走一个令牌；桶空时阻塞到下一个令牌补充完成。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class IntentCache:
+    """图意结果的本地 JSON 缓存：同一图片 + 提示词的全部输入 + 模型（含接口地址、缩放边长、提示词版本）不再重复请求 LLM。"""
+
+    def __init__(self, path: Path, max_entries: int = INTENT_CACHE_MAX_ENTRIES) -> None:
+        self.path = Path(path)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict]] = None
+        self._dirty = False
+
+    @staticmethod
+    def make_key(model: str, strategy: str, vision: bool, image_token: str, above: str, below: str, *extra: str) -> str:
+        limit = INTENT_CACHE_TEXT_LIMIT
+        parts = [model or "", strategy or "", "1" if vision else "0", image_token or "", (above or "")[:limit], (below or "")[:limit], *extra]
+        return _cache_digest("|".join(parts).encode("utf-8"))
+
+    def _entries(self) -> Dict[str, Dict]:
+        if self._data is None:
+            data: Dict[str, Dict] = {}
+            try:
+                if self.path.exists():
+                    loaded = json.loads(self.path.read_text(encoding="utf-8"))
+                    if isinstance(loaded, dict):
+                        data = loaded
+            except Exception:
+                data = {}
+            self._data = data
+        return self._data
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries().get(key)
+        if isinstance(entry, dict) and isinstance(entry.get("value"), dict):
+            return copy.deepcopy(entry["value"])
+        return None
 
-def call_openai_chat(base_url: str, api_key: str, model: str, messages: List[Dict], timeout: int = 90, max_retries: int = 3, rate_limit: float = 0.0, verbose: bool = False, expect_json: bool = True) -> Optional[str]:
+    def put(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._entries()[key] = {"value": copy.deepcopy(value), "ts": int(time.time())}
+            self._dirty = True
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return
+            data = self._data
+            if len(data) > self.max_entries:
+                # 超出上限时丢弃最旧的条目
+                keep = sorted(data.items(), key=lambda kv: kv[1].get("ts", 0) if isinstance(kv[1], dict) else 0)[-self.max_entries:]
+                data = dict(keep)
+                self._data = data
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except Exception:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data = {}
+            self._dirty = False
+            try:
+                self.path.unlink()
+            except Exception:
+                pass
+
+def make_rate_limiter(rpm: float, burst: int = 1) -> Optional[TokenBucket]:
+    """RPM<=0 表示不限速，沿用旧的 rate_limit 固定延时。"""
+    try:
+        rpm = float(rpm)
+    except Exception:
+        return None
+    if rpm <= 0:
+        return None
+    return TokenBucket(rpm, burst)
+
+def call_openai_chat(base_url: str, api_key: str, model: str, messages: List[Dict], timeout: int = 90, max_retries: int = 3, rate_limit: float = 0.0, verbose: bool = False, expect_json: bool = True, limiter: Optional[TokenBucket] = None) -> Optional[str]:
+    requests = load_requests()
     if requests is None:
         print("⚠️ 缺少 requests 库，请先安装：pip install requests")
         return None
@@ -889,7 +1262,9 @@ def call_openai_chat(base_url: str, api_key: str, model: str, messages: List[Dic
     last_err = None
     for attempt in range(max_retries + 1):
         try:
-            if rate_limit > 0:
+            if limiter is not None:
+                limiter.acquire()
+            elif rate_limit > 0:
                 time.sleep(rate_limit)
             resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
             resp.raise_for_status()
@@ -1051,13 +1426,12 @@ def build_ai_messages(
     explicit_c = ", ".join(explicit_refs[:5]) if explicit_refs else ""
     alt_c = alt or ""
     title_c = title or ""
-    sentence_split_re = re.compile(r"[。！？!?；;]+|\n+")
 
     def make_priority_list(text: str, prefer_tail: bool) -> List[Dict[str, object]]:
         text = (text or "").strip()
         if not text:
             return []
-        segments = [seg.strip() for seg in sentence_split_re.split(text) if seg.strip()]
+        segments = [seg.strip() for seg in SENTENCE_SPLIT_RE.split(text) if seg.strip()]
         if not segments:
             return []
         limit = 6
@@ -1385,6 +1759,38 @@ def validate_ai_result(d: Optional[Dict], intent_language: str = DEFAULT_INTENT_
 # 命名方案与模板
 # -----------------------------
 
+# 命名模板占位符：数字类 {block:02d}/{idx}/{index}/{dup}，文本类 {title}/{intent:.16}
+NAME_TEMPLATE_FIELD_RE = re.compile(
+    r"\{(?:(?P<num>block|idx|index|dup):(?P<width>\d+)d"
+    r"|(?P<text>title|intent)(?::\.?(?P<limit>\d+))?"
+    r"|(?P<bare>block|idx|index|dup))\}"
+)
+IMAGE_EXT_SUFFIX_RE = re.compile(r"(?i)\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b")
+IMAGE_EXT_TAIL_RE = re.compile(r"(?i)\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)$")
+
+
+@lru_cache(maxsize=16)
+def compile_name_template(template: str) -> Tuple[Tuple[str, str, Optional[int], Optional[int]], ...]:
+    """
+    将命名模板预解析为 (前置字面量, 占位符, 宽度, 截断长度) 片段序列；
+    同一模板在整篇文档的逐图命名中只解析一次。最后一个片段的占位符为空串。
+    """
+    parts: List[Tuple[str, str, Optional[int], Optional[int]]] = []
+    pos = 0
+    for m in NAME_TEMPLATE_FIELD_RE.finditer(template):
+        literal = template[pos:m.start()]
+        pos = m.end()
+        if m.group("num"):
+            parts.append((literal, m.group("num"), int(m.group("width")), None))
+        elif m.group("text"):
+            limit = m.group("limit")
+            parts.append((literal, m.group("text"), None, int(limit) if limit else None))
+        else:
+            parts.append((literal, m.group("bare"), None, None))
+    parts.append((template[pos:], "", None, None))
+    return tuple(parts)
+
+
 def name_with_template(
     template: str,
     title: str,
@@ -1398,61 +1804,31 @@ def name_with_template(
     dup_index: Optional[int] = None,
 ) -> str:
     # 支持 {title}、{block}、{idx}、{intent}、{index}、{dup}，其中数字类占位符支持宽度控制
-    def fmt_num(n: int, w: int) -> str:
-        return f"{n:0{w}d}"
-    # 兼容旧模板中 {block:02d}/{idx:02d}/{index:02d} 风格
-    def replace_num_fields(tmpl: str) -> str:
-        tmpl = re.sub(r"\{block:(\d+)d\}", lambda m: fmt_num(block_idx, int(m.group(1))), tmpl)
-        tmpl = re.sub(r"\{idx:(\d+)d\}", lambda m: fmt_num(img_idx, int(m.group(1))), tmpl)
-        if global_index is not None:
-            tmpl = re.sub(r"\{index:(\d+)d\}", lambda m: fmt_num(global_index, int(m.group(1))), tmpl)
-        else:
-            tmpl = re.sub(r"\{index:(\d+)d\}", lambda m: fmt_num(img_idx, int(m.group(1))), tmpl)
-        if dup_index is not None:
-            tmpl = re.sub(r"\{dup:(\d+)d\}", lambda m: fmt_num(dup_index, int(m.group(1))), tmpl)
-        else:
-            tmpl = re.sub(r"\{dup:(\d+)d\}", lambda m: fmt_num(img_idx, int(m.group(1))), tmpl)
-        return tmpl
-    tmpl = replace_num_fields(template)
-    # 若模板包含裸 {index}，在映射中提供格式化后的值
-    index_formatted = fmt_num(global_index if global_index is not None else img_idx, seq_width)
-    dup_formatted = fmt_num(dup_index if dup_index is not None else img_idx, seq_width)
+    # 兼容旧模板中 {block:02d}/{idx:02d}/{index:02d} 风格；未写宽度时使用 seq_width
+    numbers = {
+        "block": block_idx,
+        "idx": img_idx,
+        "index": global_index if global_index is not None else img_idx,
+        "dup": dup_index if dup_index is not None else img_idx,
+    }
     # 清理意图短语中可能混入的图片扩展名，避免出现 “...png.png”
-    intent_clean = re.sub(r"(?i)\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b", "", intent_phrase)
-    mapping = {
+    texts = {
         "title": title,
-        "intent": intent_clean,
-        "block": fmt_num(block_idx, seq_width),
-        "idx": fmt_num(img_idx, seq_width),
-        "index": index_formatted,
-        "dup": dup_formatted,
+        "intent": IMAGE_EXT_SUFFIX_RE.sub("", intent_phrase),
     }
-
-    text_field_pattern = re.compile(r"\{(?P<key>title|intent)(?::\.?(?P<limit>\d+))?\}")
-
-    def replace_text_fields(tmpl: str) -> str:
-        def repl(match: re.Match) -> str:
-            key = match.group("key")
-            limit = match.group("limit")
-            value = mapping.get(key, "")
-            if limit:
-                try:
-                    n = max(0, int(limit))
-                    value = value[:n]
-                except Exception:
-                    pass
-            return value
-
-        return text_field_pattern.sub(repl, tmpl)
-
-    out = replace_text_fields(tmpl)
-    for k, v in mapping.items():
-        if k in ("title", "intent"):
+    pieces: List[str] = []
+    for literal, key, width, limit in compile_name_template(template):
+        pieces.append(literal)
+        if not key:
             continue
-        out = out.replace("{" + k + "}", v)
-    out = sanitize_intent_for_language(out, intent_language)
+        if key in texts:
+            value = texts[key]
+            pieces.append(value[:limit] if limit is not None else value)
+        else:
+            pieces.append(f"{numbers[key]:0{width if width is not None else seq_width}d}")
+    out = sanitize_intent_for_language("".join(pieces), intent_language)
     # 如模板或意图末尾仍出现扩展名，去除以防重复扩展
-    out = re.sub(r"(?i)\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)$", "", out)
+    out = IMAGE_EXT_TAIL_RE.sub("", out)
     return out[:max_len].rstrip(" ._")
 
 # -----------------------------
@@ -1479,14 +1855,84 @@ def guess_ext_from_url_or_headers(url: str, content_type: Optional[str]) -> str:
             return ct_map[ct]
     return ".img"
 
-def download_image(url: str, dest_dir: Path, timeout: int) -> Optional[Path]:
+HTTP_POOL_CONNECTIONS = 16       # 连接池缓存的主机数
+HTTP_POOL_MAXSIZE = 64           # 单主机最大保活连接数
+DOWNLOAD_MAX_RETRIES = 2
+DOWNLOAD_RETRY_BACKOFF = 0.5
+DOWNLOAD_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+PREVIEW_FETCH_LIMIT = 5          # 界面预览同时在途的远程请求数
+PREVIEW_TIMEOUT = 12
+
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+_PREVIEW_SEM = threading.BoundedSemaphore(PREVIEW_FETCH_LIMIT)
+
+def get_http_session():
+    """
+    返回进程内共享的 requests.Session（懒创建）。
+    同一 CDN 的多张图片复用 keep-alive 连接，失败时按指数退避重试。
+    """
+    global _HTTP_SESSION
+    requests = load_requests()
     if requests is None:
+        return None
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            sess = requests.Session()
+            sess.headers.update({"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER})
+            try:
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retry = Retry(
+                    total=DOWNLOAD_MAX_RETRIES,
+                    backoff_factor=DOWNLOAD_RETRY_BACKOFF,
+                    status_forcelist=DOWNLOAD_RETRY_STATUS,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=retry,
+                )
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+            except Exception:
+                pass
+            _HTTP_SESSION = sess
+        return _HTTP_SESSION
+
+def close_http_session() -> None:
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        sess, _HTTP_SESSION = _HTTP_SESSION, None
+    if sess is not None:
+        try:
+            sess.close()
+        except Exception:
+            pass
+
+def fetch_preview_bytes(url: str, timeout: int = PREVIEW_TIMEOUT) -> bytes:
+    """
+    供 GUI 预览读取远程图片：复用共享连接池，并用信号量限制同时在途的请求，
+    用户快速连续打开多个预览时不会同时压向远端。失败时抛出异常由调用方提示。
+    """
+    sess = get_http_session()
+    if sess is None:
+        raise RuntimeError("缺少 requests 库（pip install requests）")
+    with _PREVIEW_SEM:
+        r = sess.get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.content
+
+def download_image(url: str, dest_dir: Path, timeout: int) -> Optional[Path]:
+    sess = get_http_session()
+    if sess is None:
         print("❌ 缺少 requests 库，请先安装：pip install requests")
         return None
     dest_dir.mkdir(parents=True, exist_ok=True)
-    headers = {"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER}
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
+        r = sess.get(url, timeout=timeout)
         r.raise_for_status()
         ext = guess_ext_from_url_or_headers(url, r.headers.get("Content-Type"))
         name = sanitize_intent_for_language(Path(url).stem) + ext
@@ -1571,8 +2017,7 @@ def ensure_attachment_for_src(
         moved = _try_move_file(src_path, target_path)
     if not moved:
         try:
-            data = src_path.read_bytes()
-            target_path.write_bytes(data)
+            shutil.copyfile(src_path, target_path)
             try:
                 src_path.unlink()
             except Exception:
@@ -1626,28 +2071,8 @@ def build_attachment_plan(
     img_idx = 0
     for i, ref in enumerate(refs):
         above, below, between, explicit_refs = find_neighbor_text(md_text, refs, i)
-        visible_above = re.findall(r"[一-鿿A-Za-z0-9]", above)
-        is_new_block = len(visible_above) >= 4
-        if is_new_block:
-            above_wo_refs = above
-            try:
-                for pat in EXPLICIT_REF_PATTERNS:
-                    above_wo_refs = re.sub(pat, "", above_wo_refs)
-            except Exception:
-                pass
-            try:
-                above_wo_refs = re.sub(r"(?m)^\s*#+\s+.*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", "", above_wo_refs, flags=re.IGNORECASE)
-            except Exception:
-                pass
-            letters_only = re.sub(r"[\d\W_]+", "", above_wo_refs, flags=re.UNICODE)
-            if len(letters_only) < 8:
-                is_new_block = False
         prev_end = refs[i - 1].end if i > 0 else 0
-        gap = max(0, ref.start - prev_end)
-        if gap <= 3 or explicit_refs:
-            is_new_block = False
+        is_new_block = above_starts_block(above, max(0, ref.start - prev_end), explicit_refs)
         if is_new_block:
             block_idx += 1
             img_idx = 1
@@ -1933,7 +2358,7 @@ def collect_images_to_attachment(
         if backup:
             backup_path = md_path.with_suffix(md_path.suffix + ".bak")
             try:
-                backup_path.write_text(text, encoding="utf-8", newline="\n")
+                write_text_utf8(backup_path, text)
             except Exception as exc:
                 stats.setdefault("errors", []).append(f"backup -> {exc}")
         try:
@@ -2066,6 +2491,10 @@ class Config:
     batch_confirm_cb: Optional[Callable[[List[Dict]], bool]] = None
     batch_result_cb: Optional[Callable[[Dict], None]] = None
     llm_event_cb: Optional[Callable[[Dict], None]] = None
+    rate_limiter: Optional[TokenBucket] = None  # 设置后以令牌桶限速，取代 rate_limit 固定延时
+    intent_cache: Optional[IntentCache] = None    # 设置后复用已缓存的图意结果
+    concurrency: int = 1                          # 同时在途的 AI 请求数（>1 时批次并发请求）
+    vision_max_side: int = 0                      # VLM 图片最长边（像素），0 表示发送原图
 
 def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str, between: str, *, context: Optional[Dict] = None) -> Tuple[str, str]:
     """返回 (intent_phrase, used_strategy)"""
@@ -2075,8 +2504,8 @@ def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str
         if not s.strip():
             return "图意"
         # 简单截取中文术语片段
-        s = re.sub(r"[『』「」【】《》()（）\*\-\+\=\[\]{}|\\]", "", s)
-        sentences = re.split(r"[。！？；.]", s)
+        s = TERM_NOISE_RE.sub("", s)
+        sentences = TERM_SENTENCE_END_RE.split(s)
         sentences = [x.strip() for x in sentences if x.strip()]
         if not sentences:
             return "图意"
@@ -2089,7 +2518,7 @@ def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str
                 break
         sel = sel or sentences[0]
         # 截取名词短语（粗略）
-        sel = re.sub(r"\s+", "", sel)
+        sel = WHITESPACE_RE.sub("", sel)
         sel = sel[:16]
         return sel or "图意"
     if strategy == "seq":
@@ -2179,7 +2608,7 @@ def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str
 
         figure_id: Optional[str] = None
         if figure:
-            figure_id = re.sub(r"[^0-9A-Za-z\-]+", "", str(figure)).upper()
+            figure_id = FIG_ID_NOISE_RE.sub("", str(figure)).upper()
             if not figure_id:
                 figure_id = None
 
@@ -2189,11 +2618,11 @@ def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str
 
         panel_letter = panel
         if panel_letter:
-            panel_letter = re.sub(r"[^A-Za-z]", "", str(panel_letter).upper())[:1]
+            panel_letter = NON_ASCII_LETTER_RE.sub("", str(panel_letter).upper())[:1]
         elif panel_sequence and len(panel_sequence) > 1:
             seq_idx = image_idx - 1
             if 0 <= seq_idx < len(panel_sequence):
-                seq_letter = re.sub(r"[^A-Za-z]", "", str(panel_sequence[seq_idx]).upper())
+                seq_letter = NON_ASCII_LETTER_RE.sub("", str(panel_sequence[seq_idx]).upper())
                 if seq_letter:
                     panel_letter = seq_letter[:1]
 
@@ -2238,8 +2667,10 @@ def pick_intent_phrase(strategy: str, ai: Optional[Dict], above: str, below: str
     if strategy == "between":
         return simple_terms(between), "between"
     return simple_terms(above or below or between), "seq"
-def process_document(md_path: Path, cfg: Config) -> Dict:
-    text = read_text(md_path)
+def process_document(md_path: Path, cfg: Config, text: Optional[str] = None) -> Dict:
+    # 调用方已读过文档时可直接传入 text，省去重复读取与解码
+    if text is None:
+        text = read_text(md_path)
     title = extract_doc_title(text, md_path)
     refs = collect_images(text)
     total_images = len(refs)
@@ -2257,13 +2688,14 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
 
     block_idx = 0
     img_idx = 0
-    current_block_intent: Optional[str] = None
+    # 按块记录首图图意：并发时后续块的上下文可能先于本块结果构建，不能共用单个变量
+    block_intents: Dict[int, str] = {}
 
     backup_path = None
     if cfg.mode in ("apply", "interactive") and cfg.backup:
         backup_path = md_path.with_suffix(md_path.suffix + ".bak")
         try:
-            backup_path.write_text(text, encoding="utf-8", newline="\n")
+            write_text_utf8(backup_path, text)
             if cfg.verbose:
                 print(f"🗂 已备份原文件 -> {backup_path}")
         except Exception as e:
@@ -2277,6 +2709,16 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
         chunk_size = max(1, total_images)
     pending: List[Dict] = []
     cancelled = False
+    # 并发模式：各批次的 AI 请求提交到线程池，按原顺序依次落定结果（命名计数依赖顺序）
+    workers = max(1, int(getattr(cfg, "concurrency", 1) or 1))
+    executor: Optional[ThreadPoolExecutor] = None
+    if workers > 1 and cfg.strategy != "seq":
+        executor = ThreadPoolExecutor(max_workers=workers)
+        if cfg.rate_limiter is None and cfg.rate_limit > 0:
+            # 未设 RPM 时 rate_limit 是每次调用前的固定延时，各线程各睡各的，并发 N 时实际速率约为 N 倍；
+            # 改用按同一间隔补充的共享令牌桶，整体仍是每 rate_limit 秒一次请求
+            cfg = replace(cfg, rate_limiter=TokenBucket(60.0 / cfg.rate_limit))
+    in_flight: List[Tuple[List[Dict], Future]] = []
     attach_dir = md_path.parent / (cfg.attach_dir_name or "attachment")
     mapping: Dict[str, Dict] = {}
     mapping_changed = False
@@ -2358,9 +2800,54 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
     def make_ai_result(error: Optional[str] = None, raw: Optional[str] = None, req_mode: Optional[str] = None, ai_json: Optional[Dict] = None) -> Dict:
         return {"ai_json": ai_json, "ai_error": error, "ai_raw": raw, "req_mode": req_mode}
 
+    def cache_key_for(context: Dict) -> str:
+        vision = bool(context.get("vision_src"))
+        limit = INTENT_CACHE_TEXT_LIMIT
+        return IntentCache.make_key(
+            cfg.model or "gpt-4o-mini",
+            cfg.strategy,
+            vision,
+            image_fingerprint(md_path, context["ref"].src),
+            context["above_focus"],
+            context["below_focus"],
+            cfg.intent_language,
+            cfg.reason_language,
+            # 同名模型在不同服务商处结果不同；缩放边长改变模型看到的图；提示词改动后旧结果作废
+            (cfg.base_url or "").rstrip("/"),
+            str(cfg.vision_max_side if vision else 0),
+            INTENT_PROMPT_VERSION,
+            # 其余写进提示词的输入：文档标题、图间文字、显式引用、alt/title 与实际采用的策略
+            title or "",
+            (context["between"] or "")[:limit],
+            "\x1f".join(context["explicit_refs"] or []),
+            context.get("alt") or "",
+            context.get("title_attr") or "",
+            context["effective_strategy"] or "",
+        )
+
+    def lookup_cached(context: Dict, mode: str) -> Optional[Dict]:
+        if cfg.intent_cache is None:
+            return None
+        cached = cfg.intent_cache.get(context["cache_key"])
+        if cached is None:
+            return None
+        emit_llm_event(
+            {
+                "event": "cache_hit",
+                "mode": mode,
+                "strategy": cfg.strategy,
+                "indexes": [context["index"]],
+                "note": "命中本地缓存，跳过 LLM 请求",
+            }
+        )
+        return make_ai_result(None, None, "cache", cached)
+
     def call_single(context: Dict) -> Dict:
         if cfg.strategy == "seq":
             return make_ai_result(req_mode="seq")
+        hit = lookup_cached(context, "single")
+        if hit is not None:
+            return hit
         vision_src = context.get("vision_src")
         is_sf = is_siliconflow(cfg.base_url or "")
         req_mode = "sf_vlm" if (is_sf and vision_src) else ("sf_text" if is_sf else "openai_text")
@@ -2395,6 +2882,7 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
             timeout=cfg.timeout,
             max_retries=cfg.max_retries,
             rate_limit=cfg.rate_limit,
+            limiter=cfg.rate_limiter,
             verbose=cfg.verbose,
         )
         if ai_out is None:
@@ -2426,6 +2914,8 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
         validated = validate_ai_result(parsed, intent_language=cfg.intent_language)
         if validated is None:
             return make_ai_result("llm_validate_failed", (ai_out or "")[:400], req_mode)
+        if cfg.intent_cache is not None:
+            cfg.intent_cache.put(context["cache_key"], validated)
         return make_ai_result(None, None, req_mode, validated)
 
     def call_batch(contexts: List[Dict]) -> Dict[int, Dict]:
@@ -2436,6 +2926,15 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
         if cfg.vision:
             # 视觉模式暂不支持批量聚合，依次调用单图
             return {ctx["index"]: call_single(ctx) for ctx in contexts}
+        cached_map: Dict[int, Dict] = {}
+        for ctx in contexts:
+            hit = lookup_cached(ctx, "batch")
+            if hit is not None:
+                cached_map[ctx["index"]] = hit
+        if cached_map:
+            contexts = [ctx for ctx in contexts if ctx["index"] not in cached_map]
+            if not contexts:
+                return cached_map
         msgs = build_ai_batch_messages(
             title,
             contexts,
@@ -2463,9 +2962,12 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
             timeout=cfg.timeout,
             max_retries=cfg.max_retries,
             rate_limit=cfg.rate_limit,
+            limiter=cfg.rate_limiter,
             verbose=cfg.verbose,
         )
         result_map = {ctx["index"]: make_ai_result("llm_call_failed", (get_last_llm_error() or "")[:400], req_mode) for ctx in contexts}
+        result_map.update(cached_map)
+        key_by_index = {ctx["index"]: ctx["cache_key"] for ctx in contexts if "cache_key" in ctx}
         if ai_out is None:
             emit_llm_event(
                 {
@@ -2509,10 +3011,12 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
                     result_map[idx]["ai_raw"] = snippet
                 continue
             result_map[idx] = make_ai_result(None, None, req_mode, validated)
+            if cfg.intent_cache is not None and idx in key_by_index:
+                cfg.intent_cache.put(key_by_index[idx], validated)
         return result_map
 
     def finalize_context(context: Dict, ai_info: Dict) -> None:
-        nonlocal cursor, current_block_intent, last_intent
+        nonlocal cursor, last_intent
 
         ref = context["ref"]
         ai_json = ai_info.get("ai_json") if ai_info else None
@@ -2536,9 +3040,9 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
             else:
                 normalized_for_item = "图意"
         if context["image_index"] == 1:
-            current_block_intent = normalized_for_item
-        elif current_block_intent:
-            normalized_for_item = current_block_intent
+            block_intents[context["block_index"]] = normalized_for_item
+        elif block_intents.get(context["block_index"]):
+            normalized_for_item = block_intents[context["block_index"]]
             used_strategy = "block_same"
         last_intent = normalized_for_item
 
@@ -2643,7 +3147,7 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
                 if m2:
                     alt_raw = m2.group(1)
                     title_text = (ref.title or "").strip().strip('"').strip("'")
-                    alt_clean = re.sub(r"<[^>]+>", "", alt_raw or "")
+                    alt_clean = HTML_TAG_RE.sub("", alt_raw or "")
                     alt_clean = alt_clean.replace("|", " ").strip()
                     alt_clean = WHITESPACE_RE.sub(" ", alt_clean).strip()
                     trailing_title = f' "{title_text}"' if title_text else ""
@@ -2651,47 +3155,37 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
             new_parts.append(new_seg)
             cursor = ref.end
 
+    def request_batch(batch_contexts: List[Dict]) -> Dict[int, Dict]:
+        if len(batch_contexts) == 1:
+            return {batch_contexts[0]["index"]: call_single(batch_contexts[0])}
+        ord_contexts = list(reversed(batch_contexts)) if cfg.strategy == "sci" else batch_contexts
+        return call_batch(ord_contexts)
+
+    def finalize_batch(batch_contexts: List[Dict], ai_map: Dict[int, Dict]) -> None:
+        for ctx in batch_contexts:
+            finalize_context(ctx, ai_map.get(ctx["index"]))
+
+    neighbors = find_all_neighbor_texts(text, refs)
     for i, ref in enumerate(refs):
-        above, below, between, explicit_refs = find_neighbor_text(text, refs, i)
+        above, below, between, explicit_refs = neighbors[i]
         override_side, above_focus, below_focus = explicit_override_and_focus(cfg.strategy, above, below)
         effective_strategy = cfg.strategy
         if cfg.strategy in ("above", "below") and override_side in ("above", "below"):
             effective_strategy = override_side
         elif cfg.strategy == "sci" and override_side == "above":
             effective_strategy = "above"
-        visible_above = re.findall(r"[一-鿿A-Za-z0-9]", above)
-        is_new_block = False
-        if len(visible_above) >= 4:
-            above_wo_refs = above
-            try:
-                for pat in EXPLICIT_REF_PATTERNS:
-                    above_wo_refs = re.sub(pat, "", above_wo_refs)
-            except Exception:
-                pass
-            try:
-                above_wo_refs = re.sub(r"(?m)^\s*#+\s+.*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", "", above_wo_refs, flags=re.IGNORECASE)
-            except Exception:
-                pass
-            letters_only = re.sub(r"[\d\W_]+", "", above_wo_refs, flags=re.UNICODE)
-            if len(letters_only) >= 8:
-                is_new_block = True
         prev_end = refs[i - 1].end if i > 0 else 0
-        gap = max(0, ref.start - prev_end)
-        if gap <= 3 or explicit_refs:
-            is_new_block = False
+        is_new_block = above_starts_block(above, max(0, ref.start - prev_end), explicit_refs)
 
         if is_new_block:
             block_idx += 1
             img_idx = 1
-            current_block_intent = None
         else:
             if block_idx == 0:
                 block_idx = 1
             img_idx += 1
 
-        vision_src = build_vision_src(md_path, ref.src) if cfg.vision else None
+        vision_src = build_vision_src(md_path, ref.src, cfg.vision_max_side) if cfg.vision else None
 
         sci_meta = build_sci_metadata(
             ref.src,
@@ -2722,6 +3216,8 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
             "sci_meta": sci_meta,
             "sci_override": override_side,
         }
+        if cfg.intent_cache is not None and cfg.strategy != "seq":
+            context["cache_key"] = cache_key_for(context)
         pending.append(context)
         if cfg.strategy == "sci":
             _propagate_sci_within_block(pending, block_idx)
@@ -2739,21 +3235,32 @@ def process_document(md_path: Path, cfg: Config) -> Dict:
                 if not proceed:
                     cancelled = True
                     break
-            if len(batch_contexts) == 1:
-                ai_map = {batch_contexts[0]["index"]: call_single(batch_contexts[0])}
+            if executor is not None:
+                in_flight.append((batch_contexts, executor.submit(request_batch, batch_contexts)))
+                # 已完成的前缀批次立即落定，保证进度回调尽早到达
+                while in_flight and in_flight[0][1].done():
+                    done_contexts, fut = in_flight.pop(0)
+                    finalize_batch(done_contexts, fut.result())
             else:
-                ord_contexts = list(reversed(batch_contexts)) if cfg.strategy == "sci" else batch_contexts
-                ai_map = call_batch(ord_contexts)
-            for ctx in batch_contexts:
-                finalize_context(ctx, ai_map.get(ctx["index"]))
+                finalize_batch(batch_contexts, request_batch(batch_contexts))
             pending.clear()
 
         if cancelled:
             break
 
+    if executor is not None:
+        try:
+            for done_contexts, fut in in_flight:
+                finalize_batch(done_contexts, fut.result())
+        finally:
+            executor.shutdown(wait=True)
+
     if cancelled:
         results["cancelled"] = True
 
+    if cfg.intent_cache is not None:
+        cfg.intent_cache.flush()
+
     if cfg.mode in ("apply", "interactive"):
         new_parts.append(text[cursor:])
         new_text = "".join(new_parts)
@@ -2813,31 +3320,11 @@ def process_document_pick_one(md_path: Path, cfg: Config, target_index: int) ->
     for i, ref in enumerate(refs):
         above, below, between, explicit_refs = find_neighbor_text(text, refs, i)
         # 分块判定（与主流程一致）
-        visible_above = re.findall(r"[\u4e00-\u9fffA-Za-z0-9]", above)
-        is_new_block = False
-        if len(visible_above) >= 4:
-            above_wo_refs = above
-            try:
-                for pat in EXPLICIT_REF_PATTERNS:
-                    above_wo_refs = re.sub(pat, "", above_wo_refs)
-            except Exception:
-                pass
-            try:
-                above_wo_refs = re.sub(r"(?m)^\s*#+\s+.*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$", "", above_wo_refs)
-                above_wo_refs = re.sub(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", "", above_wo_refs, flags=re.IGNORECASE)
-            except Exception:
-                pass
-            letters_only = re.sub(r"[\d\W_]+", "", above_wo_refs, flags=re.UNICODE)
-            if len(letters_only) >= 8:
-                is_new_block = True
         try:
             prev_end_local = refs[i - 1].end if i > 0 else 0
         except Exception:
             prev_end_local = 0
-        gap = max(0, ref.start - prev_end_local)
-        if gap <= 3 or explicit_refs:
-            is_new_block = False
+        is_new_block = above_starts_block(above, max(0, ref.start - prev_end_local), explicit_refs)
 
         if is_new_block:
             block_idx += 1
@@ -2863,7 +3350,7 @@ def process_document_pick_one(md_path: Path, cfg: Config, target_index: int) ->
     ai_json = None
     vision_src = None
     if cfg.vision:
-        vision_src = build_vision_src(md_path, target_ref.src)
+        vision_src = build_vision_src(md_path, target_ref.src, cfg.vision_max_side)
     if cfg.strategy != "seq":
         # 识图/融合：仅对目标图进行一次调用
         is_sf = is_siliconflow(cfg.base_url or "")
@@ -2888,6 +3375,7 @@ def process_document_pick_one(md_path: Path, cfg: Config, target_index: int) ->
             timeout=cfg.timeout,
             max_retries=cfg.max_retries,
             rate_limit=cfg.rate_limit,
+            limiter=cfg.rate_limiter,
             verbose=cfg.verbose
         )
         if ai_out:
@@ -2995,7 +3483,7 @@ def process_document_pick_one(md_path: Path, cfg: Config, target_index: int) ->
         if cfg.backup:
             backup_path = md_path.with_suffix(md_path.suffix + ".bak")
             try:
-                backup_path.write_text(text, encoding="utf-8", newline="\n")
+                write_text_utf8(backup_path, text)
                 print(f"🗂 已备份原文件 -> {backup_path}")
             except Exception as e:
                 print(f"⚠️ 备份失败：{e}")
@@ -3046,6 +3534,9 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--timeout", type=int, default=90, help="HTTP 超时秒数")
     p.add_argument("--max-retries", type=int, default=3, help="AI 调用最大重试次数")
     p.add_argument("--rate-limit", type=float, default=0.3, help="每次 AI 调用之间的延时（秒）")
+    p.add_argument("--rpm", type=float, default=0.0, help="每分钟最多 AI 请求数（令牌桶限速，>0 时取代 --rate-limit）")
+    p.add_argument("--burst", type=int, default=1, help="令牌桶允许的突发请求数（配合 --rpm）")
+    p.add_argument("--concurrency", type=int, default=1, help="同时在途的 AI 请求数（>1 时各批次并发请求）")
     p.add_argument("--verbose", action="store_true", help="详细日志")
     p.add_argument("--backup", action="store_true", help="写回前备份原文件并支持回滚")
     p.add_argument("--save-report", type=Path, default=None, help="保存完整命名报告的 JSON 路径")
@@ -3055,6 +3546,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--model", default=getenv_default("OPENAI_MODEL", "gpt-4o-mini"), help="模型名称（可读 OPENAI_MODEL）")
     # 视觉理解（SiliconFlow VLM）
     p.add_argument("--vision", action="store_true", help="启用视觉理解（为 SiliconFlow VLM 构造 image_url 消息内容）")
+    p.add_argument("--vision-max-side", type=int, default=DEFAULT_VISION_MAX_SIDE, help="发送给 VLM 前将本地图片缩到的最长边像素（默认 0 发送原图；缩放需要 Pillow，图中小字可能因此难以辨认）")
     p.add_argument(
         "--intent-language",
         choices=list(LANGUAGE_LOCALES.keys()),
@@ -3098,7 +3590,7 @@ def main() -> None:
 
     api_key = prompt_for_api_key_if_missing(args.api_key) if args.strategy != "seq" else (args.api_key or "")
     if args.strategy != "seq":
-        if not requests:
+        if load_requests() is None:
             print("❌ 需要 requests 库：pip install requests")
             sys.exit(1)
         if not args.base_url:
@@ -3129,6 +3621,9 @@ def main() -> None:
         chunk_size=max(1, int(args.chunk_size or 5)),
         intent_language=getattr(args, "intent_language", DEFAULT_INTENT_LANGUAGE),
         reason_language=getattr(args, "reason_language", DEFAULT_REASON_LANGUAGE),
+        rate_limiter=make_rate_limiter(args.rpm, args.burst),
+        concurrency=max(1, int(args.concurrency or 1)),
+        vision_max_side=max(0, int(args.vision_max_side or 0)),
     )
 
     try:
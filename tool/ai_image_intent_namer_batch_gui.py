@@ -6,15 +6,18 @@ AI 图片“图意”命名器 - 批量 GUI（串行调度，分标签页独立
 
 from __future__ import annotations
 
+import bisect
 import json
 import os
+import queue
 import random
 import re
+import shutil
 import threading
 import time
 import copy
-from dataclasses import dataclass
-from io import BytesIO
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 
@@ -22,15 +25,9 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 
 try:
-    from PIL import Image, ImageTk  # type: ignore
+    import orjson  # type: ignore
 except Exception:  # pragma: no cover - optional dependency
-    Image = None
-    ImageTk = None
-
-try:
-    import requests  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    requests = None
+    orjson = None
 
 import sys
 
@@ -55,6 +52,8 @@ try:
         is_remote_url,
         build_ai_messages,
         call_openai_chat,
+        TokenBucket,
+        make_rate_limiter,
         safe_parse_json,
         validate_ai_result,
         normalize_base_url,
@@ -73,6 +72,7 @@ try:
         plan_file_path,
         normalize_embedded_html_images,
         MD_IMAGE_RE,
+        HTML_TAG_RE,
         WHITESPACE_RE,
     )
 except Exception as e:  # pragma: no cover - bootstrap failure
@@ -87,6 +87,15 @@ except Exception:  # pragma: no cover - optional dependency
     mil = None
     MILFileProcessor = None
 
+# Pillow 只在图片预览时用到，首次预览才导入，打开窗口不必等待加载
+@lru_cache(maxsize=None)
+def _load_pil() -> Tuple[Optional[object], Optional[object]]:
+    try:
+        from PIL import Image, ImageTk  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        return None, None
+    return Image, ImageTk
+
 try:  # pragma: no cover - platform specific
     sys.stdout.reconfigure(encoding="utf-8")  # type: ignore[attr-defined]
 except Exception:
@@ -139,6 +148,19 @@ TEMPLATE_PLACEHOLDERS = [
     ("{index}", "全局累计序号，可写 {index:03d} 等格式化。"),
     ("{dup}", "当文件名重复时的去重序号，可写 {dup:02d} 控制宽度。"),
 ]
+# 命名模板向导的说明文字与实时预览使用的示例上下文
+TEMPLATE_HELPER_HINT = "双击或选中后点击“插入”将占位符写入命名模板。"
+TEMPLATE_HELPER_FORMAT_HINT = "支持 {title:.20} / {intent:.16} 之类的格式用于截取前N个字符。"
+TEMPLATE_SAMPLE_TITLE = "示例文章"
+TEMPLATE_SAMPLE_INTENT = "森林日落"
+TEMPLATE_SAMPLE_BLOCK = 1
+TEMPLATE_SAMPLE_IDX = 2
+TEMPLATE_SAMPLE_INDEX = 2
+TEMPLATE_SAMPLE_DUP = 1
+TEMPLATE_SAMPLE_TEXT = (
+    f"标题=《{TEMPLATE_SAMPLE_TITLE}》  块号={TEMPLATE_SAMPLE_BLOCK}  图片序号={TEMPLATE_SAMPLE_IDX}  "
+    f"全局序号={TEMPLATE_SAMPLE_INDEX}  去重序号={TEMPLATE_SAMPLE_DUP}  图意=“{TEMPLATE_SAMPLE_INTENT}”"
+)
 
 VISION_TEST_ASSETS = [
     {
@@ -155,6 +177,7 @@ VISION_TEST_ASSETS = [
 
 MD_INLINE_RE = re.compile(r"(\*\*|__)(.+?)\1|`([^`]+)`")
 MD_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+FLOAT_TEXT_RE = re.compile(r"\d*\.?\d*")
 
 CONTEXT_FONT_FAMILY = "Microsoft YaHei"
 CONTEXT_FONT_SIZE = 12
@@ -163,10 +186,85 @@ CONTEXT_HEADING_FONT_1 = (CONTEXT_FONT_FAMILY, CONTEXT_FONT_SIZE + 2, "bold")
 CONTEXT_HEADING_FONT_2 = (CONTEXT_FONT_FAMILY, CONTEXT_FONT_SIZE + 1, "bold")
 CONTEXT_HEADING_FONT_3 = (CONTEXT_FONT_FAMILY, CONTEXT_FONT_SIZE, "bold")
 CONTEXT_BOLD_FONT = (CONTEXT_FONT_FAMILY, CONTEXT_FONT_SIZE, "bold")
+HEADING_FONT = (CONTEXT_FONT_FAMILY, 14, "bold")
+DIALOG_TITLE_FONT = (CONTEXT_FONT_FAMILY, 11, "bold")
+ITEM_TITLE_FONT = (CONTEXT_FONT_FAMILY, 10, "bold")
+LOG_FONT = (CONTEXT_FONT_FAMILY, 10)
+# 界面常用的灰阶文字颜色
+SECONDARY_FG = "#555555"
+MODEL_SUMMARY_FG = "#575757"
+MUTED_FG = "#666666"
+PLACEHOLDER_FG = "#777777"
+SUCCESS_FG = "#1a7f37"
+ACCENT_COLOR = "#1e88e5"
 CONTEXT_CHAR_PER_LINE = 35
 CONTEXT_MIN_LINES = 3
 CONTEXT_MAX_LINES = 10
 CONTEXT_EMPTY_LINES = 2
+UI_DRAIN_INTERVAL_MS = 16
+UI_DRAIN_BATCH = 256
+
+# 配置档 / 模板预设 JSON 的内存缓存：键为 (路径, st_mtime_ns)，文件未变时免去重复解析
+_PROFILES_CACHE: Dict[Tuple[str, int], Dict] = {}
+_TEMPLATE_PRESETS_CACHE: Dict[Tuple[str, int], Dict] = {}
+
+
+def _json_dumps_bytes(obj: object) -> bytes:
+    """紧凑序列化为 UTF-8 bytes；装有 orjson 时优先使用。"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads_bytes(data: bytes) -> object:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _write_json_atomic(path: Path, obj: object) -> None:
+    # 一次序列化为 bytes，写临时文件后原子替换，避免中途退出导致文件损坏
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_bytes(_json_dumps_bytes(obj))
+    os.replace(tmp, path)
+
+
+def _json_cache_key(path: Path) -> Optional[Tuple[str, int]]:
+    try:
+        return (str(path), os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _load_json_cached(path: Path, cache: Dict[Tuple[str, int], Dict]) -> Optional[Dict]:
+    """读取 JSON 对象；mtime 未变化时直接返回缓存副本。文件不存在返回 None。"""
+    key = _json_cache_key(path)
+    if key is None:
+        return None
+    cached = cache.get(key)
+    if cached is None:
+        data = _json_loads_bytes(path.read_bytes())
+        if not isinstance(data, dict):
+            return None
+        cache.clear()
+        cache[key] = data
+        cached = data
+    return copy.deepcopy(cached)
+
+
+def _remember_json_cache(path: Path, cache: Dict[Tuple[str, int], Dict], data: Dict) -> None:
+    """写盘成功后以新 mtime 更新缓存，避免下次载入时重新读取。"""
+    key = _json_cache_key(path)
+    cache.clear()
+    if key is not None:
+        cache[key] = copy.deepcopy(data)
+
+
+@dataclass
+class TemplatePreset:
+    __slots__ = ("template", "description")
+    template: str
+    description: str
 
 
 @dataclass
@@ -224,14 +322,27 @@ class BatchApp(tk.Tk):
         self._todo_window: Optional[tk.Toplevel] = None
         self._todo_listbox: Optional[tk.Listbox] = None
         self._template_helper_window: Optional[tk.Toplevel] = None
+        self._notice_window: Optional[tk.Toplevel] = None
+        self._notice_var = tk.StringVar(value="")
+        self._notice_prev_grab: Optional[tk.Misc] = None
         self._template_helper_tree: Optional[ttk.Treeview] = None
         self._template_preview_var = tk.StringVar(value="")
+        self._template_preview_pending = False
         self.template_entry: Optional[ttk.Entry] = None
         self.template_combo: Optional[ttk.Combobox] = None
         self.template_preset_var = tk.StringVar(value=DEFAULT_TEMPLATE_PRESET_NAME)
         self.template_desc_var = tk.StringVar(value="")
-        self.template_presets: Dict[str, Dict[str, str]] = {}
+        self.template_presets: Dict[str, TemplatePreset] = {}
+        # 下拉框使用的名称列表：载入/增删时维护有序，刷新下拉框时不再重复排序
+        self._preset_names_sorted: Tuple[str, ...] = ()
         self._template_listbox: Optional[tk.Listbox] = None
+        # 数值输入框按键校验：非法字符不会进入 Tk 变量，_gather_config 只需转换一次
+        self._int_vcmd = (self.register(self._validate_int_text), "%P")
+        self._float_vcmd = (self.register(self._validate_float_text), "%P")
+        self._last_numeric_values: Dict[str, float] = {}
+        self._config_dirty = True
+        self._cached_config: Optional[Config] = None
+        self._cached_config_mode: Optional[str] = None
         self._init_styles()
         self.title(APP_TITLE)
         self.geometry("1100x720")
@@ -241,11 +352,54 @@ class BatchApp(tk.Tk):
         self.stop_flag = False
         self.tabs: Dict[str, TabState] = {}
         self.profiles: Dict[str, Dict] = {}
+        self._profile_names_sorted: List[str] = []
+        # 工作线程 -> 主线程的 UI 更新队列，由 _drain_ui 定时批量消费
+        self._ui_queue: "queue.Queue[Tuple[object, tuple]]" = queue.Queue()
+        self._save_profiles_job: Optional[str] = None
         self._add_todo_item("界面语言切换支持完整英文化（待实现）")
 
         self._load_template_presets()
         self._build_widgets()
+        self._watch_config_vars()
         self._load_profiles()
+        self.after(UI_DRAIN_INTERVAL_MS, self._drain_ui)
+        self.protocol("WM_DELETE_WINDOW", self._on_app_close)
+
+    def _on_app_close(self) -> None:
+        # 退出前落盘尚未写入的配置档
+        if self._save_profiles_job is not None:
+            self._save_profiles_now()
+        core.close_http_session()
+        self.destroy()
+
+    def _drain_ui(self) -> None:
+        for _ in range(UI_DRAIN_BATCH):
+            try:
+                fn, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                self._log(f"⚠️ 界面更新失败：{e}")
+        self.after(UI_DRAIN_INTERVAL_MS, self._drain_ui)
+
+    @staticmethod
+    def _validate_int_text(text: str) -> bool:
+        return text == "" or text.isdigit()
+
+    @staticmethod
+    def _validate_float_text(text: str) -> bool:
+        return FLOAT_TEXT_RE.fullmatch(text) is not None
+
+    def _read_number_var(self, var: tk.Variable, key: str, default: float) -> float:
+        # 输入框暂时为空等无法解析时，沿用上一次的有效值
+        try:
+            value = var.get()
+        except (tk.TclError, ValueError):
+            return self._last_numeric_values.get(key, default)
+        self._last_numeric_values[key] = value
+        return value
 
     def _language_label(self, category: str, code: str, ui_lang: Optional[str] = None) -> str:
         table = LANGUAGE_DISPLAY.get(category, {})
@@ -269,6 +423,59 @@ class BatchApp(tk.Tk):
             self.intent_lang_combo.configure(values=intent_labels)
         self._intent_language_display_var.set(self._language_label("intent", intent_lang, ui_lang))
 
+    def _show_notice(self, title: str, message: str) -> None:
+        """轻量提示框：首次创建后隐藏复用，避免每次保存/载入都新建 messagebox。"""
+        win = self._notice_window
+        if not (win and tk.Toplevel.winfo_exists(win)):
+            win = tk.Toplevel(self)
+            win.resizable(False, False)
+            win.withdraw()
+            body = ttk.Frame(win, padding=16)
+            body.pack(fill=tk.BOTH, expand=True)
+            ttk.Label(body, textvariable=self._notice_var, wraplength=360, justify=tk.LEFT).pack(fill=tk.X, pady=(0, 12))
+            ok_btn = ttk.Button(body, text="确定", command=self._hide_notice)
+            ok_btn.pack(side=tk.RIGHT)
+            win.protocol("WM_DELETE_WINDOW", self._hide_notice)
+            win.bind("<Return>", lambda _e: self._hide_notice())
+            win.bind("<Escape>", lambda _e: self._hide_notice())
+            self._notice_window = win
+        # 对话框打开时（如 API 配置窗口持有 grab）临时接管 grab，关闭后归还
+        prev = self.grab_current()
+        self._notice_prev_grab = prev if prev is not win else self._notice_prev_grab
+        parent = prev if prev is not None and prev is not win else self
+        try:
+            win.transient(parent)
+        except Exception:
+            pass
+        win.title(title)
+        self._notice_var.set(message)
+        win.deiconify()
+        win.lift()
+        win.focus_set()
+        try:
+            win.grab_set()
+        except Exception:
+            pass
+
+    def _hide_notice(self) -> None:
+        win = self._notice_window
+        if not (win and tk.Toplevel.winfo_exists(win)):
+            return
+        try:
+            win.grab_release()
+        except Exception:
+            pass
+        win.withdraw()
+        prev = self._notice_prev_grab
+        self._notice_prev_grab = None
+        if prev is not None:
+            try:
+                if prev.winfo_exists():
+                    prev.grab_set()
+                    prev.focus_set()
+            except Exception:
+                pass
+
     def _add_todo_item(self, text: str) -> None:
         item = (text or "").strip()
         if not item:
@@ -306,7 +513,7 @@ class BatchApp(tk.Tk):
         ttk.Label(
             container,
             text="提示：双击待办可以复制到剪贴板。",
-            foreground="#666",
+            foreground=MUTED_FG,
             anchor="w",
         ).pack(fill=tk.X, pady=(0, 8))
 
@@ -372,14 +579,14 @@ class BatchApp(tk.Tk):
 
         ttk.Label(
             container,
-            text="双击或选中后点击“插入”将占位符写入命名模板。",
+            text=TEMPLATE_HELPER_HINT,
             anchor="w",
         ).pack(fill=tk.X)
         ttk.Label(
             container,
-            text="支持 {title:.20} / {intent:.16} 之类的格式用于截取前N个字符。",
+            text=TEMPLATE_HELPER_FORMAT_HINT,
             anchor="w",
-            foreground="#555",
+            foreground=SECONDARY_FG,
         ).pack(fill=tk.X, pady=(2, 0))
 
         columns = ("token", "desc")
@@ -414,7 +621,7 @@ class BatchApp(tk.Tk):
         sample_info.pack(fill=tk.X, pady=(0, 8))
         ttk.Label(
             sample_info,
-            text="标题=《示例文章》  块号=1  图片序号=2  全局序号=2  去重序号=1  图意=“森林日落”",
+            text=TEMPLATE_SAMPLE_TEXT,
             anchor="w",
         ).pack(fill=tk.X, padx=8, pady=6)
 
@@ -423,7 +630,7 @@ class BatchApp(tk.Tk):
         ttk.Label(
             preview_box,
             textvariable=self._template_preview_var,
-            foreground="#1a7f37",
+            foreground=SUCCESS_FG,
             anchor="w",
         ).pack(fill=tk.X, padx=8, pady=6)
 
@@ -457,27 +664,40 @@ class BatchApp(tk.Tk):
         try:
             preview = core.name_with_template(
                 template=template,
-                title="示例文章",
-                block_idx=1,
-                img_idx=2,
-                intent_phrase="森林日落",
+                title=TEMPLATE_SAMPLE_TITLE,
+                block_idx=TEMPLATE_SAMPLE_BLOCK,
+                img_idx=TEMPLATE_SAMPLE_IDX,
+                intent_phrase=TEMPLATE_SAMPLE_INTENT,
                 seq_width=seq_width,
                 max_len=max_len,
                 intent_language=intent_lang,
-                global_index=2,
-                dup_index=1,
+                global_index=TEMPLATE_SAMPLE_INDEX,
+                dup_index=TEMPLATE_SAMPLE_DUP,
             )
         except Exception as exc:
             preview = f"(生成预览失败: {exc})"
-        self._template_preview_var.set(preview.strip())
+        preview = preview.strip()
+        if self._template_preview_var.get() != preview:
+            self._template_preview_var.set(preview)
+
+    def _schedule_template_preview(self) -> None:
+        # 连续输入/调节时合并为一次空闲刷新
+        if self._template_preview_pending:
+            return
+        self._template_preview_pending = True
+        self.after_idle(self._flush_template_preview)
+
+    def _flush_template_preview(self) -> None:
+        self._template_preview_pending = False
+        self._update_template_preview()
 
 
     def _template_description(self, name: str) -> str:
         if not name or name == CUSTOM_TEMPLATE_NAME:
             return "当前模板未保存"
         info = self.template_presets.get(name)
-        if isinstance(info, dict):
-            desc = str(info.get("description", "") or "").strip()
+        if info is not None:
+            desc = info.description.strip()
             if desc:
                 return desc
         return "当前模板未保存"
@@ -486,8 +706,7 @@ class BatchApp(tk.Tk):
         current = (self.template_var.get() or "").strip()
         matched = None
         for preset_name, info in self.template_presets.items():
-            template = str(info.get("template", "") or "").strip()
-            if current == template:
+            if current == info.template.strip():
                 matched = preset_name
                 break
         if matched:
@@ -500,8 +719,7 @@ class BatchApp(tk.Tk):
     def _refresh_template_presets_ui(self, select: Optional[str] = None, apply_template: bool = False) -> None:
         if not self.template_combo:
             return
-        names = sorted(self.template_presets.keys())
-        values = [CUSTOM_TEMPLATE_NAME] + names
+        values = [CUSTOM_TEMPLATE_NAME, *self._preset_names_sorted]
         self.template_combo.configure(values=values)
         if select is None:
             self._match_template_to_preset()
@@ -510,10 +728,8 @@ class BatchApp(tk.Tk):
             self.template_preset_var.set(target)
             if apply_template and target != CUSTOM_TEMPLATE_NAME:
                 info = self.template_presets.get(target)
-                if isinstance(info, dict):
-                    template = str(info.get("template", "") or "")
-                    if template:
-                        self.template_var.set(template)
+                if info is not None and info.template:
+                    self.template_var.set(info.template)
             self.template_desc_var.set(self._template_description(target))
         self.after(10, self._ensure_template_listbox_binding)
 
@@ -571,12 +787,11 @@ class BatchApp(tk.Tk):
             self.template_desc_var.set(self._template_description(name))
             return
         info = self.template_presets.get(name)
-        if not isinstance(info, dict):
+        if info is None:
             self.template_desc_var.set(self._template_description(name))
             return
-        template = str(info.get("template", "") or "")
-        if template:
-            self.template_var.set(template)
+        if info.template:
+            self.template_var.set(info.template)
         self.template_desc_var.set(self._template_description(name))
 
     def _on_template_preset_save(self) -> None:
@@ -594,19 +809,17 @@ class BatchApp(tk.Tk):
         if not name:
             messagebox.showinfo("提示", "模板名称不能为空。")
             return
-        existing_desc = self.template_presets.get(name, {}).get("description", "")
+        existing = self.template_presets.get(name)
+        existing_desc = existing.description if existing is not None else ""
         if not existing_desc:
             existing_desc = self.template_desc_var.get() if self.template_preset_var.get() == name else ""
         desc = simpledialog.askstring("模板说明", "为模板写一个简单说明：", initialvalue=existing_desc or "")
         if desc is None:
             desc = ""
-        self.template_presets[name] = {
-            "template": template,
-            "description": (desc or "").strip(),
-        }
+        self.template_presets[name] = TemplatePreset(template=template, description=(desc or "").strip())
         self._save_template_presets()
         self._refresh_template_presets_ui(select=name)
-        messagebox.showinfo("提示", f"已保存模板“{name}”。")
+        self._show_notice("提示", f"已保存模板“{name}”。")
 
     def _on_template_preset_delete(self) -> None:
         name = (self.template_preset_var.get() or "").strip()
@@ -629,7 +842,7 @@ class BatchApp(tk.Tk):
 
     def _on_name_rule_changed(self, *_args: object) -> None:
         self._recalc_all_tabs()
-        self._update_template_preview()
+        self._schedule_template_preview()
 
     def _on_ui_language_selected(self, _event: Optional[tk.Event] = None) -> None:
         code = self._ui_lang_value_to_code.get(self._ui_language_display_var.get())
@@ -670,9 +883,9 @@ class BatchApp(tk.Tk):
                 style.theme_use("clam")
         except Exception:
             pass
-        style.configure("Heading.TLabel", font=("Microsoft YaHei", 14, "bold"))
-        style.configure("Subheading.TLabel", foreground="#666666")
-        style.configure("Accent.TButton", padding=(12, 6), foreground="#ffffff", background="#1e88e5")
+        style.configure("Heading.TLabel", font=HEADING_FONT)
+        style.configure("Subheading.TLabel", foreground=MUTED_FG)
+        style.configure("Accent.TButton", padding=(12, 6), foreground="#ffffff", background=ACCENT_COLOR)
         style.map("Accent.TButton", background=[("active", "#1565c0"), ("disabled", "#90caf9")], foreground=[("disabled", "#eeeeee")])
         style.configure("TLabelFrame", padding=(12, 8))
         style.configure("TNotebook.Tab", padding=(18, 8))
@@ -719,6 +932,11 @@ class BatchApp(tk.Tk):
         self.timeout_var = tk.IntVar(value=120)
         self.retries_var = tk.IntVar(value=3)
         self.rate_limit_var = tk.DoubleVar(value=0.4)
+        self.rpm_var = tk.DoubleVar(value=0.0)
+        self.burst_var = tk.IntVar(value=1)
+        self.concurrency_var = tk.IntVar(value=8)
+        self._rate_limiter: Optional[TokenBucket] = None
+        self._rate_limiter_key: Optional[Tuple[float, int]] = None
         self.batch_size_var = tk.IntVar(value=5)
 
         # 翻译/归纳 独立API与Prompt（默认回落到主模型配置）
@@ -747,7 +965,7 @@ class BatchApp(tk.Tk):
         ttk.Button(ai, text="API/模型配置...", style="Accent.TButton", command=self._open_api_config_dialog).grid(row=0, column=5, padx=(2, 6), pady=6, sticky="e")
 
         self.model_summary_var = tk.StringVar()
-        ttk.Label(ai, textvariable=self.model_summary_var, foreground="#575757").grid(row=1, column=0, columnspan=6, sticky="we", padx=(8, 4), pady=(0, 8))
+        ttk.Label(ai, textvariable=self.model_summary_var, foreground=MODEL_SUMMARY_FG).grid(row=1, column=0, columnspan=6, sticky="we", padx=(8, 4), pady=(0, 8))
 
         # 第二行：策略和模板
         ttk.Label(ai, text="策略:").grid(row=2, column=0, sticky="w", padx=(8, 4))
@@ -766,7 +984,7 @@ class BatchApp(tk.Tk):
         self.template_combo.bind("<ButtonPress-1>", lambda _e: self.after(10, self._ensure_template_listbox_binding))
         self.template_combo.bind("<KeyPress-Down>", lambda _e: self.after(10, self._ensure_template_listbox_binding))
         self.template_combo.bind("<KeyPress-Up>", lambda _e: self.after(10, self._ensure_template_listbox_binding))
-        ttk.Label(template_frame, textvariable=self.template_desc_var, foreground="#555555", anchor="w").grid(row=0, column=1, sticky="we", padx=(6, 0))
+        ttk.Label(template_frame, textvariable=self.template_desc_var, foreground=SECONDARY_FG, anchor="w").grid(row=0, column=1, sticky="we", padx=(6, 0))
         btn_frame = ttk.Frame(template_frame)
         btn_frame.grid(row=0, column=2, rowspan=2, sticky="ns", padx=(6, 0))
         ttk.Button(btn_frame, text="保存模板", command=self._on_template_preset_save).pack(fill=tk.X)
@@ -777,10 +995,10 @@ class BatchApp(tk.Tk):
 
         ttk.Label(ai, text="序号宽度:").grid(row=2, column=4, sticky="w", padx=(8, 4))
         self.seq_width_var = tk.IntVar(value=2)
-        ttk.Spinbox(ai, from_=1, to=4, textvariable=self.seq_width_var, width=5).grid(row=2, column=5, sticky="w")
+        ttk.Spinbox(ai, from_=1, to=4, textvariable=self.seq_width_var, width=5, validate="key", validatecommand=self._int_vcmd).grid(row=2, column=5, sticky="w")
 
         ttk.Label(ai, text="每批张数:").grid(row=3, column=0, sticky="w", padx=(8, 4), pady=6)
-        ttk.Spinbox(ai, from_=1, to=20, textvariable=self.batch_size_var, width=5).grid(row=3, column=1, sticky="w", padx=(0, 8), pady=6)
+        ttk.Spinbox(ai, from_=1, to=20, textvariable=self.batch_size_var, width=5, validate="key", validatecommand=self._int_vcmd).grid(row=3, column=1, sticky="w", padx=(0, 8), pady=6)
 
         ttk.Label(ai, text="界面语言:").grid(row=4, column=0, sticky="w", padx=(8, 4))
         self.ui_lang_combo = ttk.Combobox(ai, textvariable=self._ui_language_display_var, state="readonly", width=16)
@@ -801,6 +1019,7 @@ class BatchApp(tk.Tk):
         self.backup_var = tk.BooleanVar(value=True)
         self.pre_localize_var = tk.BooleanVar(value=False)
         self.vision_var = tk.BooleanVar(value=True)
+        self.vision_max_side_var = tk.IntVar(value=core.GUI_VISION_MAX_SIDE)
         self.attach_var = tk.StringVar(value=DEFAULT_ATTACH_DIR)
         self.max_len_var = tk.IntVar(value=80)
         self.normalize_html_var = tk.BooleanVar(value=True)
@@ -811,12 +1030,14 @@ class BatchApp(tk.Tk):
         ttk.Checkbutton(opts, text="详细日志", variable=self.verbose_var).pack(side=tk.LEFT, padx=(0, 12))
         ttk.Checkbutton(opts, text="写回前备份（推荐）", variable=self.backup_var).pack(side=tk.LEFT, padx=(0, 12))
         ttk.Checkbutton(opts, text="预先收集图片到附件目录", variable=self.pre_localize_var).pack(side=tk.LEFT, padx=(0, 12))
-        ttk.Checkbutton(opts, text="启用视觉理解(VLM)", variable=self.vision_var).pack(side=tk.LEFT, padx=(0, 12))
+        ttk.Checkbutton(opts, text="启用视觉理解(VLM)", variable=self.vision_var).pack(side=tk.LEFT, padx=(0, 4))
+        ttk.Label(opts, text="VLM 最长边(px):").pack(side=tk.LEFT, padx=(0, 4))
+        ttk.Spinbox(opts, from_=0, to=4096, increment=64, textvariable=self.vision_max_side_var, width=6, validate="key", validatecommand=self._int_vcmd).pack(side=tk.LEFT, padx=(0, 12))
         ttk.Checkbutton(opts, text="规范嵌套HTML图片", variable=self.normalize_html_var).pack(side=tk.LEFT, padx=(0, 12))
         ttk.Label(opts, text="附件目录:").pack(side=tk.LEFT, padx=(8, 4))
         ttk.Entry(opts, textvariable=self.attach_var, width=16).pack(side=tk.LEFT)
         ttk.Label(opts, text="文件名最大长度:").pack(side=tk.LEFT, padx=(12, 4))
-        ttk.Spinbox(opts, from_=30, to=200, textvariable=self.max_len_var, width=6).pack(side=tk.LEFT)
+        ttk.Spinbox(opts, from_=30, to=200, textvariable=self.max_len_var, width=6, validate="key", validatecommand=self._int_vcmd).pack(side=tk.LEFT)
 
         # 操作按钮
         actions = ttk.Frame(self, padding=(20, 8))
@@ -826,11 +1047,11 @@ class BatchApp(tk.Tk):
         ttk.Button(actions, text="待办事项", command=self._open_todo_list).pack(side=tk.LEFT, padx=6)
         ttk.Button(actions, text="导入图意...", command=self._on_import_intents).pack(side=tk.LEFT, padx=6)
         ttk.Button(actions, text="停止", command=self._on_stop).pack(side=tk.LEFT, padx=6)
-        ttk.Button(actions, text="退出", command=self.destroy).pack(side=tk.RIGHT, padx=6)
+        ttk.Button(actions, text="退出", command=self._on_app_close).pack(side=tk.RIGHT, padx=6)
         ttk.Label(
             actions,
             text="提示：SiliconFlow 上多模态建议使用 *VL-Instruct* 类模型（例 Qwen/Qwen2.5-VL-3B-Instruct）。",
-            foreground="#777",
+            foreground=PLACEHOLDER_FG,
         ).pack(side=tk.LEFT, padx=16)
 
         self.nb = ttk.Notebook(self)
@@ -838,7 +1059,7 @@ class BatchApp(tk.Tk):
 
         log_frame = ttk.LabelFrame(self, text="日志")
         log_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=False, padx=20, pady=(0, 16))
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=7, wrap=tk.WORD, relief=tk.FLAT, borderwidth=0, font=("Microsoft YaHei", 10))
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=7, wrap=tk.WORD, relief=tk.FLAT, borderwidth=0, font=LOG_FONT)
         self.log_text.pack(fill=tk.BOTH, expand=True)
         self._refresh_template_presets_ui()
         self._update_model_summary()
@@ -886,15 +1107,18 @@ class BatchApp(tk.Tk):
         self._set_tab_processing(tab, False)
 
     def _log(self, s: str) -> None:
+        # 非 Tk 线程调用时转交界面队列，避免跨线程操作控件
+        if threading.current_thread() is not threading.main_thread():
+            self._log_async(s)
+            return
         try:
             self.log_text.insert(tk.END, s + "\n")
             self.log_text.see(tk.END)
-            self.update_idletasks()
         except Exception:
             print(s)
 
     def _log_async(self, s: str) -> None:
-        self.after(0, lambda: self._log(s))
+        self._ui_queue.put((self._log, (s,)))
 
     @staticmethod
     def _shorten_text(text: Optional[str], limit: int = 160) -> str:
@@ -960,20 +1184,30 @@ class BatchApp(tk.Tk):
         ttk.Entry(wrapper, textvariable=self.model_var, width=44).grid(row=3, column=1, sticky="w", pady=6)
 
         ttk.Label(wrapper, text="Timeout:").grid(row=4, column=0, sticky="w", pady=6)
-        ttk.Spinbox(wrapper, from_=10, to=300, textvariable=self.timeout_var, width=10).grid(row=4, column=1, sticky="w", pady=6)
+        ttk.Spinbox(wrapper, from_=10, to=300, textvariable=self.timeout_var, width=10, validate="key", validatecommand=self._int_vcmd).grid(row=4, column=1, sticky="w", pady=6)
 
         ttk.Label(wrapper, text="Max Retries:").grid(row=5, column=0, sticky="w", pady=6)
-        ttk.Spinbox(wrapper, from_=0, to=10, textvariable=self.retries_var, width=10).grid(row=5, column=1, sticky="w", pady=6)
+        ttk.Spinbox(wrapper, from_=0, to=10, textvariable=self.retries_var, width=10, validate="key", validatecommand=self._int_vcmd).grid(row=5, column=1, sticky="w", pady=6)
 
         ttk.Label(wrapper, text="Rate Limit(s):").grid(row=6, column=0, sticky="w", pady=6)
-        ttk.Entry(wrapper, textvariable=self.rate_limit_var, width=12).grid(row=6, column=1, sticky="w", pady=6)
+        ttk.Entry(wrapper, textvariable=self.rate_limit_var, width=12, validate="key", validatecommand=self._float_vcmd).grid(row=6, column=1, sticky="w", pady=6)
+
+        # 令牌桶限速：RPM>0 时取代上面的固定延时；Concurrency 为同时在途的请求数
+        ttk.Label(wrapper, text="Requests/min:").grid(row=7, column=0, sticky="w", pady=6)
+        ttk.Entry(wrapper, textvariable=self.rpm_var, width=12, validate="key", validatecommand=self._float_vcmd).grid(row=7, column=1, sticky="w", pady=6)
+
+        ttk.Label(wrapper, text="Burst:").grid(row=8, column=0, sticky="w", pady=6)
+        ttk.Spinbox(wrapper, from_=1, to=32, textvariable=self.burst_var, width=10, validate="key", validatecommand=self._int_vcmd).grid(row=8, column=1, sticky="w", pady=6)
+
+        ttk.Label(wrapper, text="Concurrency:").grid(row=9, column=0, sticky="w", pady=6)
+        ttk.Spinbox(wrapper, from_=1, to=32, textvariable=self.concurrency_var, width=10, validate="key", validatecommand=self._int_vcmd).grid(row=9, column=1, sticky="w", pady=6)
 
         # 分隔线
-        ttk.Separator(wrapper, orient="horizontal").grid(row=7, column=0, columnspan=2, sticky="we", pady=(12, 10))
+        ttk.Separator(wrapper, orient="horizontal").grid(row=10, column=0, columnspan=2, sticky="we", pady=(12, 10))
 
         # 翻译 API
         trans_frame = ttk.LabelFrame(wrapper, text="翻译 API/模型与提示词")
-        trans_frame.grid(row=8, column=0, columnspan=2, sticky="we", pady=(0, 8))
+        trans_frame.grid(row=11, column=0, columnspan=2, sticky="we", pady=(0, 8))
         trans_frame.columnconfigure(1, weight=1)
 
         ttk.Label(trans_frame, text="翻译 Base URL:").grid(row=0, column=0, sticky="w", pady=4, padx=(8, 6))
@@ -987,7 +1221,7 @@ class BatchApp(tk.Tk):
 
         # 归纳 API
         sum_frame = ttk.LabelFrame(wrapper, text="归纳 API/模型与提示词")
-        sum_frame.grid(row=9, column=0, columnspan=2, sticky="we", pady=(0, 8))
+        sum_frame.grid(row=12, column=0, columnspan=2, sticky="we", pady=(0, 8))
         sum_frame.columnconfigure(1, weight=1)
 
         ttk.Label(sum_frame, text="归纳 Base URL:").grid(row=0, column=0, sticky="w", pady=4, padx=(8, 6))
@@ -1001,7 +1235,7 @@ class BatchApp(tk.Tk):
 
         # 操作按钮
         btns = ttk.Frame(wrapper)
-        btns.grid(row=10, column=0, columnspan=2, sticky="e", pady=(18, 0))
+        btns.grid(row=13, column=0, columnspan=2, sticky="e", pady=(18, 0))
 
         def on_save() -> None:
             self._on_profile_save()
@@ -1033,8 +1267,8 @@ class BatchApp(tk.Tk):
         self.template_presets = {}
         try:
             p = self._templates_path()
-            if p.exists():
-                data = json.load(p.open("r", encoding="utf-8"))
+            data = _load_json_cached(p, _TEMPLATE_PRESETS_CACHE)
+            if data:
                 if isinstance(data, dict):
                     for name, info in data.items():
                         if not isinstance(name, str) or not isinstance(info, dict):
@@ -1043,16 +1277,20 @@ class BatchApp(tk.Tk):
                         if not template:
                             continue
                         desc = str(info.get("description", "")).strip()
-                        self.template_presets[name] = {"template": template, "description": desc}
+                        self.template_presets[name] = TemplatePreset(template=template, description=desc)
         except Exception:
             self.template_presets = {}
         self._ensure_default_template_presets()
+        self._preset_names_sorted = tuple(sorted(self.template_presets))
 
     def _save_template_presets(self, silent: bool = False) -> None:
+        self._preset_names_sorted = tuple(sorted(self.template_presets))
         try:
             p = self._templates_path()
             p.parent.mkdir(parents=True, exist_ok=True)
-            json.dump(self.template_presets, p.open("w", encoding="utf-8"), ensure_ascii=False, indent=2)
+            data = {name: asdict(info) for name, info in self.template_presets.items()}
+            _write_json_atomic(p, data)
+            _remember_json_cache(p, _TEMPLATE_PRESETS_CACHE, data)
         except Exception as exc:
             if not silent:
                 messagebox.showerror("错误", f"保存命名模板失败: {exc}")
@@ -1061,7 +1299,7 @@ class BatchApp(tk.Tk):
         changed = False
         for name, info in DEFAULT_TEMPLATE_PRESETS.items():
             if name not in self.template_presets:
-                self.template_presets[name] = dict(info)
+                self.template_presets[name] = TemplatePreset(template=info["template"], description=info["description"])
                 changed = True
         if changed:
             self._save_template_presets(silent=True)
@@ -1074,26 +1312,41 @@ class BatchApp(tk.Tk):
 
     def _load_profiles(self) -> None:
         try:
-            p = self._profiles_path()
-            if p.exists():
-                self.profiles = json.load(p.open("r", encoding="utf-8"))
-            else:
-                self.profiles = {}
+            self.profiles = _load_json_cached(self._profiles_path(), _PROFILES_CACHE) or {}
         except Exception:
             self.profiles = {}
-        names = sorted(self.profiles.keys())
+        self._profile_names_sorted = sorted(self.profiles)
+        names = self._profile_names_sorted
         self.profile_combo.configure(values=names)
         if names and not self.profile_name_var.get():
             self.profile_name_var.set(names[0])
         self._update_model_summary()
 
-    def _save_profiles(self) -> None:
+    def _save_profiles(self, immediate: bool = False) -> bool:
+        # 隐式的自动保存合并短时间内的多次请求，只在最后一次后 500ms 写盘；
+        # 用户点击保存/删除时 immediate=True 立即写盘，失败当场提示。返回是否写盘成功（延后写入时为 True）
+        if self._save_profiles_job is not None:
+            try:
+                self.after_cancel(self._save_profiles_job)
+            except Exception:
+                pass
+            self._save_profiles_job = None
+        if immediate:
+            return self._save_profiles_now()
+        self._save_profiles_job = self.after(500, self._save_profiles_now)
+        return True
+
+    def _save_profiles_now(self) -> bool:
+        self._save_profiles_job = None
         try:
             p = self._profiles_path()
             p.parent.mkdir(parents=True, exist_ok=True)
-            json.dump(self.profiles, p.open("w", encoding="utf-8"), ensure_ascii=False, indent=2)
+            _write_json_atomic(p, self.profiles)
+            _remember_json_cache(p, _PROFILES_CACHE, self.profiles)
+            return True
         except Exception as e:
             messagebox.showerror("错误", f"保存配置档失败：{e}")
+            return False
 
     def _collect_current_settings(self) -> Dict:
         return {
@@ -1104,6 +1357,9 @@ class BatchApp(tk.Tk):
             "timeout": int(self.timeout_var.get()),
             "max_retries": int(self.retries_var.get()),
             "rate_limit": float(self.rate_limit_var.get()),
+            "rpm": float(self.rpm_var.get()),
+            "burst": int(self.burst_var.get()),
+            "concurrency": int(self.concurrency_var.get()),
             "template": self.template_var.get().strip(),
             "seq_width": int(self.seq_width_var.get()),
             "max_name_len": int(self.max_len_var.get()),
@@ -1111,6 +1367,7 @@ class BatchApp(tk.Tk):
             "verbose": bool(self.verbose_var.get()),
             "backup": bool(self.backup_var.get()),
             "vision": bool(self.vision_var.get()),
+            "vision_max_side": int(self.vision_max_side_var.get()),
             "batch_size": int(self.batch_size_var.get()),
             "normalize_html": bool(self.normalize_html_var.get()),
             "ui_language": self.ui_language_var.get().strip() or DEFAULT_UI_LANGUAGE,
@@ -1138,6 +1395,9 @@ class BatchApp(tk.Tk):
             self.timeout_var.set(int(data.get("timeout", self.timeout_var.get())))
             self.retries_var.set(int(data.get("max_retries", self.retries_var.get())))
             self.rate_limit_var.set(float(data.get("rate_limit", self.rate_limit_var.get())))
+            self.rpm_var.set(float(data.get("rpm", self.rpm_var.get())))
+            self.burst_var.set(int(data.get("burst", self.burst_var.get())))
+            self.concurrency_var.set(int(data.get("concurrency", self.concurrency_var.get())))
             self.template_var.set(data.get("template", self.template_var.get()))
             self.seq_width_var.set(int(data.get("seq_width", self.seq_width_var.get())))
             self.max_len_var.set(int(data.get("max_name_len", self.max_len_var.get())))
@@ -1145,6 +1405,7 @@ class BatchApp(tk.Tk):
             self.verbose_var.set(bool(data.get("verbose", self.verbose_var.get())))
             self.backup_var.set(bool(data.get("backup", self.backup_var.get())))
             self.vision_var.set(bool(data.get("vision", self.vision_var.get())))
+            self.vision_max_side_var.set(int(data.get("vision_max_side", self.vision_max_side_var.get())))
             self.batch_size_var.set(int(data.get("batch_size", self.batch_size_var.get())))
             self.normalize_html_var.set(bool(data.get("normalize_html", self.normalize_html_var.get())))
             self.ui_language_var.set(data.get("ui_language", self.ui_language_var.get()))
@@ -1169,12 +1430,19 @@ class BatchApp(tk.Tk):
         if not name:
             messagebox.showinfo("提示", "请输入配置档名称后再保存。")
             return
-        self.profiles[name] = self._collect_current_settings()
-        self._save_profiles()
-        names = sorted(self.profiles.keys())
-        self.profile_combo.configure(values=names)
+        if name not in self.profiles:
+            bisect.insort(self._profile_names_sorted, name)
+        settings = self._collect_current_settings()
+        # 与已保存内容相同时不必重写配置档文件
+        if self.profiles.get(name) != settings:
+            self.profiles[name] = settings
+            saved = self._save_profiles(immediate=True)
+        else:
+            saved = True
+        self.profile_combo.configure(values=self._profile_names_sorted)
         self.profile_name_var.set(name)
-        messagebox.showinfo("提示", f"已保存/更新配置档：{name}")
+        if saved:
+            self._show_notice("提示", f"已保存/更新配置档：{name}")
         self._update_model_summary()
 
     def _on_profile_load(self) -> None:
@@ -1183,7 +1451,7 @@ class BatchApp(tk.Tk):
             messagebox.showinfo("提示", "未找到该配置档，请先保存或选择已有配置名。")
             return
         self._apply_profile(self.profiles[name])
-        messagebox.showinfo("提示", f"已载入配置档：{name}")
+        self._show_notice("提示", f"已载入配置档：{name}")
         self._update_model_summary()
 
     def _on_profile_delete(self) -> None:
@@ -1193,11 +1461,14 @@ class BatchApp(tk.Tk):
             return
         try:
             del self.profiles[name]
-            self._save_profiles()
-            names = sorted(self.profiles.keys())
+            saved = self._save_profiles(immediate=True)
+            if name in self._profile_names_sorted:
+                self._profile_names_sorted.remove(name)
+            names = self._profile_names_sorted
             self.profile_combo.configure(values=names)
             self.profile_name_var.set(names[0] if names else "")
-            messagebox.showinfo("提示", f"已删除配置档：{name}")
+            if saved:
+                self._show_notice("提示", f"已删除配置档：{name}")
             self._update_model_summary()
         except Exception as e:
             messagebox.showerror("错误", f"删除失败：{e}")
@@ -1237,8 +1508,45 @@ class BatchApp(tk.Tk):
         self.files_listbox.delete(0, tk.END)
         self._log("已清空文件列表。")
 
+    def _watch_config_vars(self) -> None:
+        # 参与 _gather_config 的变量任一改动即置脏，未改动时直接复用上次结果
+        for var in (
+            self.base_url_var, self.api_key_var, self.model_var, self.strategy_var,
+            self.timeout_var, self.retries_var, self.rate_limit_var, self.rpm_var, self.burst_var, self.concurrency_var, self.attach_var,
+            self.template_var, self.seq_width_var, self.max_len_var, self.verbose_var,
+            self.backup_var, self.vision_var, self.vision_max_side_var, self.batch_size_var,
+            self.intent_language_var, self.ui_language_var,
+        ):
+            var.trace_add("write", self._mark_config_dirty)
+
+    def _mark_config_dirty(self, *_args: object) -> None:
+        self._config_dirty = True
+
     def _gather_config(self, mode: str) -> Config:
+        cached = self._cached_config
+        if not self._config_dirty and cached is not None and self._cached_config_mode == mode:
+            # 调用方会挂接各自的回调，返回浅拷贝以免互相覆盖
+            return copy.copy(cached)
+        cfg = self._build_config(mode)
+        self._config_dirty = False
+        self._cached_config = cfg
+        self._cached_config_mode = mode
+        return copy.copy(cfg)
+
+    def _get_rate_limiter(self) -> Optional[TokenBucket]:
+        # RPM/并发不变时复用同一个令牌桶，保证各次调用共享配额
+        try:
+            key = (float(self._read_number_var(self.rpm_var, "rpm", 0.0)), int(self._read_number_var(self.burst_var, "burst", 1)))
+        except Exception:
+            return None
+        if key != self._rate_limiter_key:
+            self._rate_limiter_key = key
+            self._rate_limiter = make_rate_limiter(*key)
+        return self._rate_limiter
+
+    def _build_config(self, mode: str) -> Config:
         base = normalize_base_url(self.base_url_var.get().strip())
+        limiter = self._get_rate_limiter()
         intent_lang = (self.intent_language_var.get().strip() or DEFAULT_INTENT_LANGUAGE)
         ui_lang = (self.ui_language_var.get().strip() or DEFAULT_UI_LANGUAGE)
         reason_lang = 'en' if ui_lang == 'en' else 'zh'
@@ -1249,21 +1557,24 @@ class BatchApp(tk.Tk):
             base_url=base,
             api_key=self.api_key_var.get().strip(),
             model=self.model_var.get().strip(),
-            timeout=int(self.timeout_var.get()),
-            max_retries=int(self.retries_var.get()),
-            rate_limit=float(self.rate_limit_var.get()),
+            timeout=int(self._read_number_var(self.timeout_var, "timeout", 120)),
+            max_retries=int(self._read_number_var(self.retries_var, "max_retries", 3)),
+            rate_limit=0.0 if limiter is not None else float(self._read_number_var(self.rate_limit_var, "rate_limit", 0.4)),
             attach_dir_name=self.attach_var.get().strip() or DEFAULT_ATTACH_DIR,
             download=False,
             name_template=self.template_var.get().strip() or DEFAULT_NAME_TEMPLATE,
-            seq_width=int(self.seq_width_var.get()),
-            max_name_len=int(self.max_len_var.get()),
+            seq_width=int(self._read_number_var(self.seq_width_var, "seq_width", 2)),
+            max_name_len=int(self._read_number_var(self.max_len_var, "max_name_len", 80)),
             save_report=None,
             verbose=bool(self.verbose_var.get()),
             backup=bool(self.backup_var.get()),
             vision=bool(self.vision_var.get()),
-            chunk_size=max(1, int(self.batch_size_var.get())),
+            chunk_size=max(1, int(self._read_number_var(self.batch_size_var, "batch_size", 5))),
             intent_language=intent_lang,
             reason_language=reason_lang,
+            rate_limiter=limiter,
+            concurrency=max(1, int(self._read_number_var(self.concurrency_var, "concurrency", 8))),
+            vision_max_side=self._vision_max_side(),
         )
 
     # ------------------------------------------------------------------ #
@@ -1432,7 +1743,7 @@ class BatchApp(tk.Tk):
         ttk.Button(button_row, text="全部替换", command=replace_all).pack(side=tk.LEFT, padx=(0, 6))
         ttk.Button(button_row, text="关闭", command=close_dialog).pack(side=tk.LEFT)
 
-        ttk.Label(win, textvariable=status_var, foreground="#555555").grid(row=3, column=0, columnspan=2, sticky="w", padx=8, pady=(4, 10))
+        ttk.Label(win, textvariable=status_var, foreground=SECONDARY_FG).grid(row=3, column=0, columnspan=2, sticky="w", padx=8, pady=(4, 10))
 
         win.protocol("WM_DELETE_WINDOW", close_dialog)
         find_entry.focus_set()
@@ -1518,8 +1829,11 @@ class BatchApp(tk.Tk):
     def _batch_preview_worker(self) -> None:
         cfg = self._gather_config(mode="dry-run")
         total_files = len(self.files)
+        # 开关在循环外取一次快照，逐文件不再访问 Tk 变量
+        verbose = cfg.verbose
+        pre_localize = bool(self.pre_localize_var.get())
 
-        if self.verbose_var.get():
+        if verbose:
             self._log_async(f"🔄 开始批量预览串行处理，共 {total_files} 个文件")
 
         for i, md in enumerate(self.files, 1):
@@ -1527,22 +1841,27 @@ class BatchApp(tk.Tk):
                 self._log_async(f"⏹️ 用户停止处理（进度 {i-1}/{total_files}）")
                 break
 
-            if self.verbose_var.get():
+            if verbose:
                 self._log_async(f"📁 处理文件中... [{i}/{total_files}] {md.name}")
-            self._process_file_in_worker(md, cfg)
+            self._process_file_in_worker(md, cfg, pre_localize=pre_localize)
 
-        if self.verbose_var.get():
+        if verbose:
             self._log_async("✅ 批量预览完成。" if not self.stop_flag else "⚠️ 批量预览被用户中断。")
 
-    def _process_file_in_worker(self, md_path: Path, cfg: Config) -> None:
+    def _process_file_in_worker(self, md_path: Path, cfg: Config, pre_localize: Optional[bool] = None) -> None:
         if not md_path.exists():
             self._log_async(f"❌ 文件不存在：{md_path}")
             return
 
+        # 附件目录、超时、备份、详细日志均取自 cfg，不在工作线程里逐项读 Tk 变量
+        verbose = cfg.verbose
+        if pre_localize is None:
+            pre_localize = bool(self.pre_localize_var.get())
+
         def batch_confirm(batch_items: List[Dict]) -> bool:
             if self.stop_flag:
                 return False
-            if self.verbose_var.get():
+            if verbose:
                 names: List[str] = []
                 for item in batch_items:
                     display = (item.get("display_name") or item.get("src") or "").strip()
@@ -1563,13 +1882,13 @@ class BatchApp(tk.Tk):
         if text_data == "":
             return
 
-        if self.pre_localize_var.get():
+        if pre_localize:
             try:
                 stats = collect_images_to_attachment(
                     md_path,
-                    self.attach_var.get().strip() or DEFAULT_ATTACH_DIR,
-                    int(self.timeout_var.get()),
-                    backup=bool(self.backup_var.get()),
+                    cfg.attach_dir_name,
+                    cfg.timeout,
+                    backup=cfg.backup,
                 )
                 summary = (
                     f"🗂 图片收集完成：共{stats.get('total', 0)}，"
@@ -1585,17 +1904,12 @@ class BatchApp(tk.Tk):
             except Exception as exc:
                 self._log_async(f"⚠️ 图片收集失败：{exc}")
 
-        try:
-            text_data = read_text(md_path)
-        except Exception as e:
-            self._log_async(f"⚠️ 读取失败：{md_path} -> {e}")
-            return
-
+        # 读取失败时 _normalize_document_if_needed 自行记录并返回空串
         text_data = self._normalize_document_if_needed(md_path)
         if text_data == "":
             return
 
-        if self.verbose_var.get():
+        if verbose:
             # 统计图片数量
             try:
                 refs = collect_images(text_data)
@@ -1607,28 +1921,29 @@ class BatchApp(tk.Tk):
             self._log_async(f"▶️ 预览：{md_path}")
 
         doc_title = extract_doc_title(text_data, md_path)
-        self.after(0, lambda t=doc_title: self._prepare_processing_tab(md_path, t))
+        # 同一文件的标签页准备、逐条结果与 LLM 事件统一走 UI 队列，保证先后顺序
+        self._ui_queue.put((self._prepare_processing_tab, (md_path, doc_title)))
 
         def on_batch_result(payload: Dict) -> None:
             item = payload.get("item") or {}
             idx = payload.get("index")
             safe_item = copy.deepcopy(item)
-            self.after(0, lambda it=safe_item, index=idx: self._append_processing_item(md_path, doc_title, it, index))
+            self._ui_queue.put((self._append_processing_item, (md_path, doc_title, safe_item, idx)))
 
         def on_llm_event(event: Dict) -> None:
             safe_event = copy.deepcopy(event)
-            self.after(0, lambda e=safe_event: self._log_llm_event(md_path, e))
+            self._ui_queue.put((self._log_llm_event, (md_path, safe_event)))
 
         cfg.batch_result_cb = on_batch_result
         cfg.llm_event_cb = on_llm_event
 
         try:
-            results = process_document(md_path, cfg)
+            results = process_document(md_path, cfg, text=text_data)
         except Exception as e:
             self._log_async(f"❌ 预览失败：{md_path} -> {e}")
             return
 
-        self.after(0, lambda r=results, t=text_data: self._apply_preview_results(md_path, t, r))
+        self._ui_queue.put((self._apply_preview_results, (md_path, text_data, results)))
 
     def _prepare_processing_tab(self, md_path: Path, title: str) -> None:
         key = str(md_path)
@@ -1681,8 +1996,7 @@ class BatchApp(tk.Tk):
             return True
         except Exception:
             try:
-                data = src.read_bytes()
-                dest.write_bytes(data)
+                shutil.copyfile(src, dest)
                 try:
                     src.unlink()
                 except Exception:
@@ -1832,6 +2146,16 @@ class BatchApp(tk.Tk):
         tab.item_uis.clear()
 
     def _populate_items(self, tab: TabState) -> None:
+        # 构建期间关闭尺寸传播，避免每个 pack 都触发 inner_frame/canvas 的重新布局，
+        # 全部控件创建完成后再统一计算一次
+        tab.inner_frame.pack_propagate(False)
+        try:
+            self._build_item_rows(tab)
+        finally:
+            tab.inner_frame.pack_propagate(True)
+            tab.inner_frame.update_idletasks()
+
+    def _build_item_rows(self, tab: TabState) -> None:
         self._clear_inner(tab)
         items = tab.results.get("items", []) if isinstance(tab.results, dict) else []
         if tab.processing:
@@ -1842,13 +2166,13 @@ class BatchApp(tk.Tk):
         head = ttk.Label(
             tab.inner_frame,
             text=f"{tab.md_path}\n标题：{tab.title} | {status_text}",
-            font=("Microsoft YaHei", 10, "bold"),
+            font=ITEM_TITLE_FONT,
         )
         head.pack(fill=tk.X, padx=4, pady=(8, 8))
 
         if not items:
             placeholder = "正在调用模型，请稍候..." if tab.processing else "未发现图片。"
-            ttk.Label(tab.inner_frame, text=placeholder, foreground="#777").pack(fill=tk.X, padx=8, pady=8)
+            ttk.Label(tab.inner_frame, text=placeholder, foreground=PLACEHOLDER_FG).pack(fill=tk.X, padx=8, pady=8)
             return
 
         hdr = ttk.Frame(tab.inner_frame)
@@ -2023,6 +2347,7 @@ class BatchApp(tk.Tk):
             max_retries=int(self.retries_var.get()),
             rate_limit=float(self.rate_limit_var.get()),
             verbose=bool(self.verbose_var.get()),
+            limiter=self._get_rate_limiter(),
         )
         if not out:
             raise RuntimeError(get_last_llm_error() or "模型返回为空")
@@ -2032,33 +2357,12 @@ class BatchApp(tk.Tk):
             raise ValueError("模型返回不可解析")
         return result
 
+    def _vision_max_side(self) -> int:
+        return max(0, int(self._read_number_var(self.vision_max_side_var, "vision_max_side", core.GUI_VISION_MAX_SIDE)))
+
     def _build_vision_src_for_item(self, md_path: Path, img_src: str) -> Optional[str]:
-        try:
-            if core.is_remote_url(img_src):
-                return img_src
-            local_path = resolve_local_image(md_path.parent, img_src)
-            if not local_path or not local_path.exists():
-                return None
-            data = local_path.read_bytes()
-            import base64
-
-            b64 = base64.b64encode(data).decode("ascii")
-            mime = {
-                ".jpg": "image/jpeg",
-                ".jpeg": "image/jpeg",
-                ".png": "image/png",
-                ".gif": "image/gif",
-                ".webp": "image/webp",
-                ".bmp": "image/bmp",
-                ".svg": "image/svg+xml",
-                ".tif": "image/tiff",
-                ".tiff": "image/tiff",
-                ".ico": "image/x-icon",
-                ".heic": "image/heic",
-            }.get(local_path.suffix.lower(), "application/octet-stream")
-            return f"data:{mime};base64,{b64}"
-        except Exception:
-            return None
+        # 与后端一致：本地图片按“VLM 最长边”缩图后编码为 data URL
+        return core.build_vision_src(md_path, img_src, self._vision_max_side())
 
     def _on_regen_single(self, tab: TabState, item_pos: int) -> None:
         try:
@@ -2171,10 +2475,10 @@ class BatchApp(tk.Tk):
         left_frame = ttk.Frame(main_container)
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 6))
 
-        ttk.Label(left_frame, text=f"图片 #{item.index}", font=("Microsoft YaHei", 11, "bold")).pack(anchor="w", pady=(0, 4))
-        ttk.Label(left_frame, text=f"来源：{item.src}", wraplength=420, foreground="#555").pack(anchor="w", pady=(0, 2))
+        ttk.Label(left_frame, text=f"图片 #{item.index}", font=DIALOG_TITLE_FONT).pack(anchor="w", pady=(0, 4))
+        ttk.Label(left_frame, text=f"来源：{item.src}", wraplength=420, foreground=SECONDARY_FG).pack(anchor="w", pady=(0, 2))
         doc_display = (tab.title or "").strip() or tab.md_path.name
-        ttk.Label(left_frame, text=f"文档：{doc_display}", wraplength=420, foreground="#666").pack(anchor="w", pady=(0, 6))
+        ttk.Label(left_frame, text=f"文档：{doc_display}", wraplength=420, foreground=MUTED_FG).pack(anchor="w", pady=(0, 6))
 
         preview_frame = ttk.LabelFrame(left_frame, text="图片预览")
         preview_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 8))
@@ -2183,12 +2487,10 @@ class BatchApp(tk.Tk):
 
         def _fetch_image_bytes(src: str) -> Tuple[Optional[bytes], str]:
             if is_remote_url(src):
-                if requests is None:
+                if core.load_requests() is None:
                     return None, "预览需要 requests 库（pip install requests）"
                 try:
-                    resp = requests.get(src, timeout=12)
-                    resp.raise_for_status()
-                    return resp.content, ""
+                    return core.fetch_preview_bytes(src), ""
                 except Exception as exc:
                     return None, f"远程图片加载失败：{exc}"
             try:
@@ -2207,10 +2509,10 @@ class BatchApp(tk.Tk):
         def _load_preview() -> None:
             data, error = _fetch_image_bytes(item.src)
             if data:
-                img_label.after(0, lambda d=data: self._apply_preview_on_label(d, img_label))
+                img_label.after_idle(lambda d=data: self._apply_preview_on_label(d, img_label))
             else:
                 message = error or "无法加载图片预览"
-                img_label.after(0, lambda msg=message: img_label.configure(text=msg))
+                img_label.after_idle(lambda msg=message: img_label.configure(text=msg))
 
         threading.Thread(target=_load_preview, daemon=True).start()
 
@@ -2259,7 +2561,7 @@ class BatchApp(tk.Tk):
                             )
                         else:
                             message = error or "无法加载缩略图"
-                            target_label.after(0, lambda msg=message, lbl=target_label: lbl.configure(text=msg))
+                            target_label.after_idle(lambda msg=message, lbl=target_label: lbl.configure(text=msg))
 
                     threading.Thread(target=worker, daemon=True).start()
 
@@ -2389,7 +2691,7 @@ class BatchApp(tk.Tk):
             text_content = (content or "").strip()
             char_count = len(text_content)
             info_text = f"字数：{char_count}" if char_count else "暂无内容"
-            ttk.Label(header, text=info_text, foreground="#666").grid(row=0, column=0, sticky="w")
+            ttk.Label(header, text=info_text, foreground=MUTED_FG).grid(row=0, column=0, sticky="w")
 
             btn_bar = ttk.Frame(header)
             btn_bar.grid(row=0, column=1, sticky="e")
@@ -2459,7 +2761,7 @@ class BatchApp(tk.Tk):
                 ).pack(anchor="w", pady=2)
                 reason = cand.get("reason")
                 if reason:
-                    ttk.Label(cand_container, text=f"依据：{reason}", wraplength=580, foreground="#666").pack(anchor="w", padx=24, pady=(0, 4))
+                    ttk.Label(cand_container, text=f"依据：{reason}", wraplength=580, foreground=MUTED_FG).pack(anchor="w", padx=24, pady=(0, 4))
             ttk.Radiobutton(cand_container, text="自定义：", value="__custom__", variable=selected_var).pack(anchor="w", pady=(6, 2))
             custom_row = ttk.Frame(cand_container)
             custom_row.pack(anchor="w", fill=tk.X, padx=24, pady=(0, 6))
@@ -2577,7 +2879,7 @@ class BatchApp(tk.Tk):
             ordered_candidates = candidates_data if isinstance(candidates_data, list) else []
         current_title = sanitize_filename(item.intent_var.get() or "")
         render_candidates(ordered_candidates, preferred_title or current_title or None)
-        ttk.Label(cand_frame, textvariable=status_var, foreground="#666").pack(anchor="w", padx=6, pady=(0, 4))
+        ttk.Label(cand_frame, textvariable=status_var, foreground=MUTED_FG).pack(anchor="w", padx=6, pady=(0, 4))
 
         actions_row = ttk.Frame(cand_frame)
         actions_row.pack(fill=tk.X, padx=6, pady=(4, 8))
@@ -2811,7 +3113,7 @@ class BatchApp(tk.Tk):
                 if m2:
                     alt_raw = m2.group(1)
                     title_text = (ref.title or '').strip().strip('"').strip("'")
-                    alt_clean = re.sub(r'<[^>]+>', '', alt_raw or '')
+                    alt_clean = HTML_TAG_RE.sub('', alt_raw or '')
                     alt_clean = alt_clean.replace('|', ' ').strip()
                     alt_clean = WHITESPACE_RE.sub(' ', alt_clean).strip()
                     trailing_title = f' "{title_text}"' if title_text else ''
@@ -2824,7 +3126,7 @@ class BatchApp(tk.Tk):
         if bool(self.backup_var.get()):
             backup_path = md_path.with_suffix(md_path.suffix + '.bak')
             try:
-                backup_path.write_text(text, encoding="utf-8", newline="\n")
+                write_text_utf8(backup_path, text)
                 self._log_async(f'🗂 已备份原文件 -> {backup_path}')
             except Exception as e:
                 self._log_async(f'⚠️ 备份失败：{e}')
@@ -2882,14 +3184,10 @@ class BatchApp(tk.Tk):
         threading.Thread(target=worker, daemon=True).start()
 
     def _apply_preview_on_label(self, data: bytes, label: ttk.Label, max_size: Tuple[int, int] = (780, 440)) -> None:
+        Image, ImageTk = _load_pil()
         if Image is not None and ImageTk is not None:
             try:
-                im = Image.open(BytesIO(data))
-                try:
-                    im = im.convert("RGB")
-                except Exception:
-                    pass
-                im.thumbnail(max_size)
+                im = core.decode_preview_image(data, max_size)
                 tk_img = ImageTk.PhotoImage(im)
                 label.configure(image=tk_img, text="")
                 label.image = tk_img
@@ -2939,7 +3237,7 @@ class BatchApp(tk.Tk):
         widget.tag_configure("md_heading_3", font=CONTEXT_HEADING_FONT_3)
         widget.tag_configure("md_bold", font=CONTEXT_BOLD_FONT)
         widget.tag_configure("md_bullet", lmargin1=18, lmargin2=34)
-        widget.tag_configure("md_quote", lmargin1=18, lmargin2=30, foreground="#1e88e5")
+        widget.tag_configure("md_quote", lmargin1=18, lmargin2=30, foreground=ACCENT_COLOR)
         widget.tag_configure("md_code", background="#f5f5f5", foreground="#d6336c")
         widget.tag_configure("md_placeholder", foreground="#888888")
         setattr(widget, "_md_tags_ready", True)
@@ -3095,6 +3393,7 @@ class BatchApp(tk.Tk):
                 max_retries=int(self.retries_var.get()),
                 rate_limit=float(self.rate_limit_var.get()),
                 verbose=bool(self.verbose_var.get()),
+                limiter=self._get_rate_limiter(),
             )
             data = safe_parse_json(out) if out else None
             if isinstance(data, dict):
@@ -25,14 +25,21 @@ AI 图片“图意”命名器 - 窗口版（Tkinter）
 
 from __future__ import annotations
 
+import heapq
 import json
 import os
+import queue
 import re
+import shutil
 import sys
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 # 确保可从 `tool` 目录导入后端模块
 THIS_FILE = Path(__file__).resolve()
@@ -51,7 +58,6 @@ try:
         write_text_utf8,
         extract_doc_title,
         collect_images,
-        find_neighbor_text,
         name_with_template,
         sanitize_filename,
         ensure_unique_path,
@@ -67,29 +73,32 @@ except Exception as e:
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 
-# 可选依赖：requests（远程图片预览）、Pillow（更多格式预览）
+# 可选依赖：Pillow（更多格式预览）、md_image_localizer（远程图片本地化）
+# 均在首次用到时才导入，打开窗口不必等待这些模块加载；远程请求统一走 core.get_http_session()
+@lru_cache(maxsize=None)
+def _load_pil() -> Tuple[Optional[object], Optional[object]]:
+    try:
+        from PIL import Image, ImageTk  # type: ignore
+    except Exception:
+        return None, None
+    return Image, ImageTk
+
+@lru_cache(maxsize=None)
+def _load_mil():
+    try:
+        import md_image_localizer as mil  # type: ignore
+    except Exception:
+        return None
+    return mil
+
+# 可选依赖：orjson（配置档/报告序列化更快），缺失时回落到标准库 json
 try:
-    import requests  # type: ignore
+    import orjson  # type: ignore
 except Exception:
-    requests = None
+    orjson = None
 
-try:
-    from PIL import Image, ImageTk  # type: ignore
-except Exception:
-    Image = None
-    ImageTk = None
-
-from io import BytesIO
 from urllib.parse import unquote
 
-# 可选：Markdown 远程图片本地化工具
-try:
-    import md_image_localizer as mil  # type: ignore
-    from md_image_localizer import FileProcessor as MILFileProcessor  # type: ignore
-except Exception:
-    mil = None
-    MILFileProcessor = None
-
 # 控制台编码
 try:
     sys.stdout.reconfigure(encoding="utf-8")
@@ -100,6 +109,108 @@ APP_TITLE = "AI 图片“图意”命名器（GUI）"
 PROFILES_PATH = TOOL_DIR / "ai_image_intent_namer_gui.profiles.json"
 
 DEFAULT_NAME_TEMPLATE = "{title}_{index:02d}"  # 例：文档标题_01（全局顺序编号，避免重复）
+LOCALIZE_CONCURRENCY = 8  # 远程图片本地化时的并发下载数
+PREVIEW_BOX = (760, 420)  # 单图选择对话框中的预览尺寸上限
+PREVIEW_CACHE_MAX = 32    # 已解码预览图（PhotoImage）的缓存张数
+LOG_DRAIN_INTERVAL_MS = 50  # 日志队列刷新间隔：多行日志合并成一次插入
+DOC_CACHE_MAX = 16  # 单图选择复用的预览结果份数（按文档内容 + 配置区分）
+INTENT_CACHE = core.IntentCache(TOOL_DIR / core.INTENT_CACHE_FILENAME)  # 重复预览时复用图意结果
+
+# 分块判定等热循环里用到的正则/集合，模块加载时编译一次
+_RE_STRIP_SYMBOLS = re.compile(r"[\d\W_]+", re.UNICODE)
+_RE_HEADING_LINE = re.compile(r"(?m)^\s*#+\s+.*$")
+_RE_LIST_LINE = re.compile(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$")
+_RE_FIGURE_LABEL = re.compile(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", re.IGNORECASE)
+# 预检只需统计远程图片数量：一次正则扫描代替 collect_images 的完整解析
+_RE_REMOTE_IMG = re.compile(r"""(?:!\[[^\]]*\]\(\s*<?|<img\b[^>]*?\bsrc=["'])\s*https?://""", re.IGNORECASE)
+_IMG_EXTS = frozenset({".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg", ".tif", ".tiff", ".ico", ".heic"})
+
+def _json_dumps_bytes(obj: object) -> bytes:
+    """缩进两格序列化为 UTF-8 bytes；装有 orjson 时优先使用，遇到其不支持的类型再回落到 json。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _json_loads_bytes(data: bytes) -> object:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+def _quick_remote_count(text: str) -> int:
+    return sum(1 for _ in _RE_REMOTE_IMG.finditer(text or ""))
+
+def _compute_block_positions(refs: List, neighbors: List, strict: bool) -> List[Tuple[int, int]]:
+    """
+    按“上一图到当前图之间的文字”划分块序与块内序号，返回每张图片的 (块序, 块内序号)。
+    - strict=False（交互式应用）：有效文字 >=4，剔除显式引用后仍有 >=4 个字母/汉字即视为新块
+    - strict=True（单图选择，与后端一致）：另剔除标题/列表/图号，需 >=8 个字母/汉字，
+      且与上一图间隔 <=3 或存在显式引用时不分块
+    """
+    positions: List[Tuple[int, int]] = []
+    block_idx = 0
+    img_idx = 0
+    need = 8 if strict else 4
+    for i, ref in enumerate(refs):
+        above, below, between, explicit_refs = neighbors[i]
+        is_new_block = False
+        # 先做廉价判断：strict 下紧邻上一图或存在显式引用时必然不分块；
+        # 各步剥离只会删字，原文长度（strict 下为原文字母数）不足阈值时无需再跑正则
+        if strict:
+            prev_end = refs[i - 1].end if i > 0 else 0
+            blocked = ref.start - prev_end <= 3 or bool(explicit_refs)
+        else:
+            blocked = False
+        if (
+            not blocked
+            and len(above) >= need
+            and _count_visible(above) >= 4
+            and not (strict and len(_RE_STRIP_SYMBOLS.sub("", above)) < need)
+        ):
+            above_wo_refs = above
+            try:
+                # 剥离显式引用短语
+                above_wo_refs = core.EXPLICIT_REF_RE.sub("", above_wo_refs)
+            except Exception:
+                pass
+            if strict:
+                try:
+                    above_wo_refs = _RE_HEADING_LINE.sub("", above_wo_refs)
+                    above_wo_refs = _RE_LIST_LINE.sub("", above_wo_refs)
+                    above_wo_refs = _RE_FIGURE_LABEL.sub("", above_wo_refs)
+                except Exception:
+                    pass
+            # 去掉数字与符号，仅保留字母/汉字，再判断长度阈值
+            letters_only = _RE_STRIP_SYMBOLS.sub("", above_wo_refs)
+            if len(letters_only) >= need:
+                is_new_block = True
+
+        if is_new_block:
+            block_idx += 1
+            img_idx = 1
+        else:
+            if block_idx == 0:
+                block_idx = 1
+            img_idx += 1
+        positions.append((block_idx, img_idx))
+    return positions
+
+def _splice_ref(text: str, ref, new_src: str) -> str:
+    """只在该图片标记段内把 src 换成 new_src，一次 join 拼出新文本（不再多次切片整篇）。"""
+    seg = text[ref.start:ref.end]
+    return "".join((text[:ref.start], seg.replace(ref.src, new_src), text[ref.end:]))
+
+def _count_visible(s: str, cap: int = 4) -> int:
+    """统计汉字/ASCII 字母数字个数（等价于 [\u4e00-\u9fffA-Za-z0-9]），数到 cap 即返回。"""
+    n = 0
+    for c in s:
+        if ("a" <= c <= "z") or ("A" <= c <= "Z") or ("0" <= c <= "9") or ("\u4e00" <= c <= "\u9fff"):
+            n += 1
+            if n >= cap:
+                break
+    return n
 
 # 规范化 Base URL（用户若误填入 /v1 结尾，避免形成 /v1/v1/chat/completions）
 def _normalize_base_url(url: str) -> str:
@@ -116,6 +227,120 @@ def _normalize_base_url(url: str) -> str:
 def getenv_default(name: str, default: str | None = None) -> Optional[str]:
     return os.environ.get(name) if os.environ.get(name) else default
 
+class CandidateWizard(tk.Toplevel):
+    """交互式应用的逐图选择窗口：整个流程只创建一次，翻页时原地刷新内容。"""
+
+    MAX_CANDIDATES = 6
+
+    def __init__(self, master: tk.Misc, total: int):
+        super().__init__(master)
+        self.total = total
+        self._top_cands: Dict[int, List[Dict]] = {}
+        self.geometry("720x520")
+        self.transient(master)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", lambda: self.done_var.set("cancel"))
+
+        self.done_var = tk.StringVar(master=self, value="")
+        self.choice_var = tk.StringVar(master=self)
+        self.custom_var = tk.StringVar(master=self)
+        self.heading_var = tk.StringVar(master=self)
+        self.src_var = tk.StringVar(master=self)
+
+        # 标题
+        ttk.Label(self, textvariable=self.heading_var, font=("Microsoft YaHei", 11, "bold")).pack(pady=(10, 6))
+        ttk.Label(self, textvariable=self.src_var, wraplength=680, foreground="#555").pack(pady=(0, 8))
+
+        # 上下文展示
+        ctx_frame = ttk.LabelFrame(self, text="上下文")
+        ctx_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
+        self.ctx_text = scrolledtext.ScrolledText(ctx_frame, wrap=tk.WORD, height=10)
+        self.ctx_text.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+
+        # 候选区：预先建好固定数量的单选行，翻页时只改文字与显隐
+        self.cand_frame = ttk.LabelFrame(self, text="候选（选择一项，或在下方自定义）")
+        self.cand_frame.pack(fill=tk.X, padx=10, pady=6)
+        self._cand_rows: List[Tuple[ttk.Radiobutton, ttk.Label]] = []
+        for _ in range(self.MAX_CANDIDATES):
+            rb = ttk.Radiobutton(self.cand_frame, variable=self.choice_var)
+            meta = ttk.Label(self.cand_frame, foreground="#777")
+            self._cand_rows.append((rb, meta))
+
+        # 自定义输入
+        custom_frame = ttk.Frame(self)
+        custom_frame.pack(fill=tk.X, padx=10, pady=6)
+        ttk.Label(custom_frame, text="自定义图意：").pack(side=tk.LEFT)
+        ttk.Entry(custom_frame, textvariable=self.custom_var, width=48).pack(side=tk.LEFT, padx=6)
+
+        # 按钮
+        btns = ttk.Frame(self)
+        btns.pack(fill=tk.X, padx=10, pady=10)
+        self.next_btn = ttk.Button(btns, text="下一张", command=lambda: self.done_var.set("next"))
+        self.next_btn.pack(side=tk.RIGHT, padx=6)
+        self.prev_btn = ttk.Button(btns, text="上一张", command=lambda: self.done_var.set("prev"))
+        self.prev_btn.pack(side=tk.RIGHT)
+        ttk.Button(btns, text="取消", command=lambda: self.done_var.set("cancel")).pack(side=tk.LEFT)
+
+    def show_item(self, pos: int, index: int, src: str, above: str, below: str, candidates: List[Dict], default_title: str, current: Optional[str] = None) -> None:
+        self.title(f"选择图意 - 图片 #{index}（{pos + 1}/{self.total}）")
+        self.heading_var.set(f"图片 #{index}")
+        self.src_var.set(f"源: {src}")
+
+        self.ctx_text.configure(state=tk.NORMAL)
+        self.ctx_text.delete("1.0", tk.END)
+        self.ctx_text.insert(tk.END, f"[上文]\n{above.strip()}\n\n[下文]\n{below.strip()}\n")
+        self.ctx_text.configure(state=tk.DISABLED)
+
+        show_cands = self._top_cands.get(index)
+        if show_cands is None:
+            show_cands = self._pick_top(candidates or [])
+            self._top_cands[index] = show_cands
+        if not show_cands:
+            show_cands = [{"strategy": "intent", "title": default_title, "reason": "默认", "confidence": 0.6}]
+        titles = set()
+        for i, (rb, meta) in enumerate(self._cand_rows):
+            rb.pack_forget()
+            meta.pack_forget()
+            if i >= len(show_cands):
+                continue
+            c = show_cands[i]
+            title = c.get("title") or ""
+            titles.add(title)
+            rb.configure(text=title, value=title)
+            meta.configure(text=f"[{c.get('strategy')}] conf={c.get('confidence',0)} {c.get('reason','')}")
+            rb.pack(anchor="w", padx=8, pady=2)
+            meta.pack(anchor="w", padx=28)
+
+        # 回到已选过的图片时恢复上次的选择
+        if current and current not in titles:
+            self.choice_var.set(default_title)
+            self.custom_var.set(current)
+        else:
+            self.choice_var.set(current or default_title)
+            self.custom_var.set("")
+
+        self.prev_btn.configure(state=tk.NORMAL if pos > 0 else tk.DISABLED)
+        self.next_btn.configure(text="完成" if pos + 1 >= self.total else "下一张")
+
+    def _pick_top(self, candidates: List[Dict]) -> List[Dict]:
+        """候选不超过上限时保持模型给出的顺序；超出时按 confidence 取前 N（O(n log N)，同分保持原序）。"""
+        if len(candidates) <= self.MAX_CANDIDATES:
+            return list(candidates)
+
+        def _conf(c: Dict) -> float:
+            try:
+                return float(c.get("confidence", 0) or 0)
+            except Exception:
+                return 0.0
+        return heapq.nlargest(self.MAX_CANDIDATES, candidates, key=_conf)
+
+    def wait_choice(self) -> Tuple[str, str]:
+        """阻塞到用户点击按钮，返回 (动作, 选择的图意)；动作为 next/prev/cancel。"""
+        self.done_var.set("")
+        self.wait_variable(self.done_var)
+        chosen = self.custom_var.get().strip() or self.choice_var.get().strip()
+        return self.done_var.get(), chosen
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -127,9 +352,28 @@ class App(tk.Tk):
         self.last_results: Optional[Dict] = None
         self.overrides: Dict[int, str] = {}  # 交互式选择：index -> chosen intent
         self.profiles: Dict[str, Dict] = {}  # 多套 API/策略/模板配置
+        self._profiles_stamp: Optional[int] = None  # 上次读/写配置档文件时的 mtime_ns
+        # 文档目录下的文件索引（小写文件名/主名 -> 路径），每次应用前重建
+        self._fs_index: Optional[Dict[str, List[Path]]] = None
+        self._fs_stem_index: Optional[Dict[str, List[Path]]] = None
+        self._fs_index_root: Optional[Path] = None
+        # 图片引用解析结果：(文档目录, src) -> 路径/None；切换文档时清空，重命名后逐条作废
+        self._resolve_cache: Dict[Tuple[str, str], Optional[Path]] = {}
+        # 已解码的 Markdown 文本：path -> ((mtime_ns, size), text)，同一轮流程内多处预检共用
+        self._text_cache: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+        # 单图选择的预览结果：(文档路径, 内容摘要, 配置摘要) -> results，LRU 淘汰
+        self._doc_cache: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        # 分块序号：(内容摘要, 图片数, 规则) -> [(块序, 块内序号), ...]
+        self._block_pos_cache: Dict[Tuple[str, int, bool], List[Tuple[int, int]]] = {}
+        # 已解码的预览图：本地 (路径, mtime_ns, size, 尺寸) / 远程 (src, 尺寸) -> PhotoImage，LRU 淘汰
+        self._preview_cache: "OrderedDict[tuple, object]" = OrderedDict()
+        self._preview_lock = threading.Lock()
+        # 日志先入队，由 Tk 主线程定时合并写入，工作线程不直接触碰控件
+        self._log_q: "queue.Queue[str]" = queue.Queue()
 
         # 构建 UI
         self._build_widgets()
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
         # 加载配置档并刷新下拉
         self._load_profiles()
         # 将窗口置顶显示，避免被遮挡或未前置导致“看不到”
@@ -146,6 +390,7 @@ class App(tk.Tk):
         # 文件选择
         ttk.Label(top, text="Markdown 文件:").grid(row=0, column=0, sticky="w")
         self.path_var = tk.StringVar()
+        self.path_var.trace_add("write", lambda *_: self._resolve_cache.clear())
         entry_path = ttk.Entry(top, textvariable=self.path_var, width=70)
         entry_path.grid(row=0, column=1, sticky="we", padx=4)
         btn_browse = ttk.Button(top, text="浏览...", command=self._on_browse)
@@ -204,16 +449,32 @@ class App(tk.Tk):
         self.rate_limit_var = tk.DoubleVar(value=0.3)
         ttk.Entry(ai, textvariable=self.rate_limit_var, width=8).grid(row=1, column=5, sticky="w", pady=(6, 0))
 
+        # 令牌桶限速：RPM>0 时取代上面的固定延时；Concurrency 为同时在途的请求数
+        ttk.Label(ai, text="Requests/min:").grid(row=2, column=0, sticky="w", pady=(6, 0))
+        self.rpm_var = tk.DoubleVar(value=0.0)
+        ttk.Entry(ai, textvariable=self.rpm_var, width=8).grid(row=2, column=1, sticky="w", pady=(6, 0))
+
+        ttk.Label(ai, text="Burst:").grid(row=2, column=2, sticky="e", padx=(18, 2), pady=(6, 0))
+        self.burst_var = tk.IntVar(value=1)
+        ttk.Spinbox(ai, from_=1, to=32, textvariable=self.burst_var, width=6).grid(row=2, column=3, sticky="w", pady=(6, 0))
+
+        ttk.Label(ai, text="Concurrency:").grid(row=2, column=4, sticky="e", padx=(18, 2), pady=(6, 0))
+        self.concurrency_var = tk.IntVar(value=8)
+        self._rate_limiter: Optional["core.TokenBucket"] = None
+        self._rate_limiter_key: Optional[Tuple[float, int]] = None
+        ttk.Spinbox(ai, from_=1, to=32, textvariable=self.concurrency_var, width=6).grid(row=2, column=5, sticky="w", pady=(6, 0))
+
         # 配置档（可保存/选择多套 API + 策略 + 模板参数）
-        ttk.Label(ai, text="配置档:").grid(row=2, column=0, sticky="w", pady=(6, 0))
+        ttk.Label(ai, text="配置档:").grid(row=3, column=0, sticky="w", pady=(6, 0))
         self.profile_name_var = tk.StringVar()
         self.profile_combo = ttk.Combobox(ai, textvariable=self.profile_name_var, values=[], width=28)
-        self.profile_combo.grid(row=2, column=1, sticky="w", pady=(6, 0))
-        ttk.Button(ai, text="保存/更新", command=self._on_profile_save).grid(row=2, column=2, padx=(12, 2), pady=(6, 0), sticky="w")
-        ttk.Button(ai, text="载入", command=self._on_profile_load).grid(row=2, column=3, padx=(6, 2), pady=(6, 0), sticky="w")
-        ttk.Button(ai, text="删除", command=self._on_profile_delete).grid(row=2, column=4, padx=(6, 2), pady=(6, 0), sticky="w")
-        ttk.Button(ai, text="测试API", command=self._on_test_api).grid(row=2, column=5, padx=(6, 2), pady=(6, 0), sticky="w")
-        ttk.Label(ai, text="提示：Base URL 不要包含 /v1；超时可适当调大", foreground="#777").grid(row=3, column=0, columnspan=6, sticky="w", pady=(4, 0))
+        self.profile_combo.grid(row=3, column=1, sticky="w", pady=(6, 0))
+        ttk.Button(ai, text="保存/更新", command=self._on_profile_save).grid(row=3, column=2, padx=(12, 2), pady=(6, 0), sticky="w")
+        ttk.Button(ai, text="载入", command=self._on_profile_load).grid(row=3, column=3, padx=(6, 2), pady=(6, 0), sticky="w")
+        ttk.Button(ai, text="删除", command=self._on_profile_delete).grid(row=3, column=4, padx=(6, 2), pady=(6, 0), sticky="w")
+        ttk.Button(ai, text="测试API", command=self._on_test_api).grid(row=3, column=5, padx=(6, 2), pady=(6, 0), sticky="w")
+        ttk.Button(ai, text="清除缓存", command=self._on_clear_intent_cache).grid(row=3, column=6, padx=(6, 2), pady=(6, 0), sticky="w")
+        ttk.Label(ai, text="提示：Base URL 不要包含 /v1；超时可适当调大", foreground="#777").grid(row=4, column=0, columnspan=6, sticky="w", pady=(4, 0))
 
 
         # 选项
@@ -222,11 +483,14 @@ class App(tk.Tk):
         self.verbose_var = tk.BooleanVar(value=False)
         self.backup_var = tk.BooleanVar(value=True)
         self.vision_var = tk.BooleanVar(value=False)
+        self.vision_max_side_var = tk.IntVar(value=core.GUI_VISION_MAX_SIDE)
         self.pre_localize_var = tk.BooleanVar(value=True)
         self.rename_md_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(opt, text="详细日志", variable=self.verbose_var).pack(side=tk.LEFT, padx=(0, 16))
         ttk.Checkbutton(opt, text="写回前备份（推荐）", variable=self.backup_var).pack(side=tk.LEFT)
         ttk.Checkbutton(opt, text="启用视觉理解(VLM)", variable=self.vision_var).pack(side=tk.LEFT, padx=(16, 0))
+        ttk.Label(opt, text="VLM 最长边(px):").pack(side=tk.LEFT, padx=(8, 2))
+        ttk.Spinbox(opt, from_=0, to=4096, increment=64, textvariable=self.vision_max_side_var, width=6).pack(side=tk.LEFT)
         ttk.Checkbutton(opt, text="先本地化远程图片（md_image_localizer）", variable=self.pre_localize_var).pack(side=tk.LEFT, padx=(16, 0))
         ttk.Checkbutton(opt, text="按标题重命名 Markdown", variable=self.rename_md_var).pack(side=tk.LEFT, padx=(16, 0))
 
@@ -246,9 +510,28 @@ class App(tk.Tk):
         self.text.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True, padx=8, pady=8)
 
     def _log(self, s: str):
-        self.text.insert(tk.END, s + "\n")
-        self.text.see(tk.END)
-        self.update_idletasks()
+        # 工作线程只入队，不碰 Tk；主线程直接写入（先冲掉队列中更早的行以保持顺序）
+        if threading.current_thread() is threading.main_thread():
+            self._flush_log(s)
+        else:
+            self._log_q.put(s)
+
+    def _flush_log(self, extra: Optional[str] = None):
+        lines: List[str] = []
+        while True:
+            try:
+                lines.append(self._log_q.get_nowait())
+            except queue.Empty:
+                break
+        if extra is not None:
+            lines.append(extra)
+        if lines:
+            self.text.insert(tk.END, "\n".join(lines) + "\n")
+            self.text.see(tk.END)
+
+    def _drain_log(self):
+        self._flush_log()
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
 
     def _on_browse(self):
         p = filedialog.askopenfilename(
@@ -260,6 +543,7 @@ class App(tk.Tk):
 
     def _build_config(self, mode: str) -> Config:
         """从 UI 收集配置，构建后端 Config"""
+        limiter = self._get_rate_limiter()
         return Config(
             mode=mode,
             strategy=self.strategy_var.get(),
@@ -268,7 +552,7 @@ class App(tk.Tk):
             model=self.model_var.get() or getenv_default("OPENAI_MODEL", "gpt-4o-mini"),
             timeout=int(self.timeout_var.get()),
             max_retries=int(self.retries_var.get()),
-            rate_limit=float(self.rate_limit_var.get()),
+            rate_limit=0.0 if limiter is not None else float(self.rate_limit_var.get()),
             attach_dir_name=self.attach_var.get() or "attachments",
             download=bool(self.download_var.get()),
             name_template=self.template_var.get() or DEFAULT_NAME_TEMPLATE,
@@ -279,14 +563,158 @@ class App(tk.Tk):
             backup=bool(self.backup_var.get()),
             vision=bool(self.vision_var.get()),
             chunk_size=5,
+            rate_limiter=limiter,
+            concurrency=self._read_concurrency(),
+            vision_max_side=self._read_vision_max_side(),
+            intent_cache=INTENT_CACHE,
         )
 
+    def _read_vision_max_side(self) -> int:
+        try:
+            return max(0, int(self.vision_max_side_var.get()))
+        except Exception:
+            return 0
+
+    def _read_concurrency(self) -> int:
+        try:
+            return max(1, int(self.concurrency_var.get()))
+        except Exception:
+            return 1
+
+    def _get_rate_limiter(self) -> Optional["core.TokenBucket"]:
+        # RPM/Burst 不变时复用同一个令牌桶：连续多次运行与测试 API 共享配额，不会每次都从满桶突发
+        try:
+            key = (float(self.rpm_var.get()), int(self.burst_var.get()))
+        except Exception:
+            return None
+        if key != self._rate_limiter_key:
+            self._rate_limiter_key = key
+            self._rate_limiter = core.make_rate_limiter(*key)
+        return self._rate_limiter
+
     def _run_in_thread(self, target, *args, **kwargs):
         t = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
         t.start()
 
 
+    def _read_text_cached(self, md_path: Path) -> str:
+        """按 (mtime_ns, size) 复用已解码文本，文件变化后自动重新读取。"""
+        try:
+            st = os.stat(md_path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return read_text(md_path)
+        cached = self._text_cache.get(md_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        text = read_text(md_path)
+        self._text_cache[md_path] = (stamp, text)
+        return text
+
+    def _remember_text(self, md_path: Path, text: str) -> None:
+        # 刚写回的内容直接放入缓存，后续预检不必重新读取
+        try:
+            st = os.stat(md_path)
+        except OSError:
+            return
+        self._text_cache[md_path] = ((st.st_mtime_ns, st.st_size), text)
+
+    def _forget_text(self, md_path: Path) -> None:
+        self._text_cache.pop(md_path, None)
+        for key in [k for k in self._doc_cache if k[0] == str(md_path)]:
+            del self._doc_cache[key]
+
+    @staticmethod
+    def _config_digest(cfg: Config) -> str:
+        # 只取标量字段（回调、限速器、缓存对象不影响结果）
+        parts = {}
+        for f in fields(cfg):
+            v = getattr(cfg, f.name)
+            if v is None or isinstance(v, (str, int, float, bool)):
+                parts[f.name] = v
+        return core._cache_digest(json.dumps(parts, sort_keys=True).encode("utf-8"))
+
+    @staticmethod
+    def _is_complete_result(results: Dict) -> bool:
+        if results.get("cancelled"):
+            return False
+        return not any(isinstance(item, dict) and item.get("ai_error") for item in results.get("items") or [])
+
+    def _cached_process_document(self, md_path: Path, text: str, cfg: Config) -> Dict:
+        """
+        dry-run 结果按 (文档, 内容, 配置) 缓存：连续单图选择同一文档时不再重跑整套流程。
+        有图片的模型调用失败（回退到启发式命名）或流程被取消时不缓存，下次仍会重试模型。
+        """
+        key = (str(md_path), core._cache_digest(text.encode("utf-8")), self._config_digest(cfg))
+        hit = self._doc_cache.get(key)
+        if hit is not None:
+            self._doc_cache.move_to_end(key)
+            self._log("ℹ️ 复用本文档上次的候选结果。")
+            return hit
+        results = process_document(md_path, cfg, text=text)
+        if isinstance(results, dict) and self._is_complete_result(results):
+            self._doc_cache[key] = results
+            while len(self._doc_cache) > DOC_CACHE_MAX:
+                self._doc_cache.popitem(last=False)
+        return results
+
+    def _invalidate_fs_index(self) -> None:
+        self._fs_index = None
+        self._fs_stem_index = None
+        self._fs_index_root = None
+        # 未命中的结果可能因用户补齐文件而过期，随索引一起丢弃；命中的结果在取用时校验
+        for key in [k for k, v in self._resolve_cache.items() if v is None]:
+            del self._resolve_cache[key]
+
+    def _build_fs_index(self, md_dir: Path) -> None:
+        """用 os.scandir 遍历一次文档目录，建立文件名/主名索引，替代逐图 rglob。"""
+        names: Dict[str, List[Path]] = {}
+        stems: Dict[str, List[Path]] = {}
+        for entry in core._iter_files(md_dir):
+            path = Path(entry.path)
+            lower = entry.name.lower()
+            names.setdefault(lower, []).append(path)
+            stems.setdefault(os.path.splitext(lower)[0], []).append(path)
+        self._fs_index = names
+        self._fs_stem_index = stems
+        self._fs_index_root = md_dir
+
+    def _lookup_fs_index(self, md_dir: Path, basename: str) -> Optional[Path]:
+        if self._fs_index is None or self._fs_index_root != md_dir:
+            self._build_fs_index(md_dir)
+        names = self._fs_index or {}
+        stems = self._fs_stem_index or {}
+        lower = basename.lower()
+        hits = names.get(lower)
+        if hits:
+            return hits[0]
+        stem = os.path.splitext(lower)[0]
+        for cand in stems.get(stem, ()):
+            if cand.suffix.lower() in _IMG_EXTS:
+                return cand
+        # 兜底：主名前缀匹配（与原 rglob(f"{stem}*") 一致），只在内存索引中查找
+        for key, paths in stems.items():
+            if key.startswith(stem):
+                for cand in paths:
+                    if cand.suffix.lower() in _IMG_EXTS:
+                        return cand
+        return None
+
     def _resolve_local_image(self, md_dir: Path, src: str) -> Optional[Path]:
+        """带缓存的 _locate_local_image：同一文档目录下重复引用/多次流程直接复用结果。"""
+        key = (str(md_dir), src)
+        if key in self._resolve_cache:
+            p = self._resolve_cache[key]
+            if p is None or p.exists():
+                return p
+        p = self._locate_local_image(md_dir, src)
+        self._resolve_cache[key] = p
+        return p
+
+    def _forget_resolved(self, md_dir: Path, src: str) -> None:
+        self._resolve_cache.pop((str(md_dir), src), None)
+
+    def _locate_local_image(self, md_dir: Path, src: str) -> Optional[Path]:
         """
         尝试解析/定位本地图片路径，容错以下情况：
         - 链接含引号、反斜杠或 URL 编码（空格等）
@@ -308,17 +736,10 @@ class App(tk.Tk):
             p2 = (md_dir / Path(s2)).resolve()
             if p2.exists():
                 return p2
-            # 3) 基于文件名递归搜索（先精确名称，再前缀匹配）
+            # 3) 基于文件名在目录索引中查找（先精确名称，再主名/前缀匹配）
             basename = Path(s2).name or Path(s).name
             if basename:
-                for cand in md_dir.rglob(basename):
-                    if cand.is_file():
-                        return cand
-                stem = Path(basename).stem
-                exts = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg", ".tif", ".tiff", ".ico", ".heic"}
-                for cand in md_dir.rglob(f"{stem}*"):
-                    if cand.is_file() and cand.suffix.lower() in exts:
-                        return cand
+                return self._lookup_fs_index(md_dir, basename)
             return None
         except Exception:
             return None
@@ -339,7 +760,7 @@ class App(tk.Tk):
                     return
             cfg = self._build_config(mode="dry-run")
             self._log(f"▶ 预览：{md_path}")
-            self.last_results = process_document(md_path, cfg)
+            self.last_results = process_document(md_path, cfg, text=self._read_text_cached(md_path))
             # 在窗口打印摘要
             self._log("—— 预览结果 ——")
             if self.last_results and isinstance(self.last_results, dict):
@@ -372,7 +793,7 @@ class App(tk.Tk):
                         self._log(f"🩺 失败诊断：mode={rm} err={ae}")
                         if raw:
                             self._log(f"   ai_raw: {raw}")
-                        self._log(f"   API: base={base} model={model} vision={vision_on} timeout={self.timeout_var.get()} retries={self.retries_var.get()} rate_limit={self.rate_limit_var.get()}")
+                        self._log(f"   API: base={base} model={model} vision={vision_on} timeout={self.timeout_var.get()} retries={self.retries_var.get()} rate_limit={self.rate_limit_var.get()} rpm={self.rpm_var.get()}")
                         self._log("   建议：点击“测试API”验证连通性；确认 Base URL 不含 /v1；模型名称与是否启用视觉理解(VLM)匹配；检查余额与权限。")
             self._log("✅ 预览完成\n")
         except Exception as e:
@@ -383,6 +804,7 @@ class App(tk.Tk):
         self._run_in_thread(self._preview_impl)
 
     def _apply_impl(self):
+        self._invalidate_fs_index()
         try:
             md_path = Path(self.path_var.get()).expanduser()
             if not md_path.exists():
@@ -397,22 +819,18 @@ class App(tk.Tk):
                     self._log("⚠️ 未提供 Base URL 或 API Key，已取消应用。")
                     return
             # 预检远程图片并提示下载选项影响
+            remote_tmp = 0
             try:
-                txt_preview = read_text(md_path)
-                refs_preview = collect_images(txt_preview)
-                remote_count = sum(1 for r in refs_preview if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
-                if remote_count > 0 and not bool(self.download_var.get()):
-                    self._log(f"ℹ️ 检测到远程图片 {remote_count} 张，且未勾选“下载远程图片”。这些图片的链接将不会改写为本地路径；仅对本地图片执行重命名/搬移。")
+                remote_tmp = _quick_remote_count(self._read_text_cached(md_path))
+                if remote_tmp > 0 and not bool(self.download_var.get()):
+                    self._log(f"ℹ️ 检测到远程图片 {remote_tmp} 张，且未勾选“下载远程图片”。这些图片的链接将不会改写为本地路径；仅对本地图片执行重命名/搬移。")
             except Exception:
                 pass
             # 预处理：本地化远程图片（可选）
             try:
                 if bool(self.pre_localize_var.get()):
-                    txt_tmp = read_text(md_path)
-                    refs_tmp = collect_images(txt_tmp)
-                    remote_tmp = sum(1 for r in refs_tmp if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
                     if remote_tmp > 0:
-                        if MILFileProcessor is None:
+                        if _load_mil() is None:
                             self._log("⚠️ 缺少 md_image_localizer 模块，无法本地化远程图片。")
                         else:
                             self._log(f"▶ 先本地化远程图片：检测到 {remote_tmp} 张远程图片，开始下载...")
@@ -421,7 +839,8 @@ class App(tk.Tk):
                 pass
             cfg = self._build_config(mode="apply")
             self._log(f"▶ 直接应用：{md_path}")
-            self.last_results = process_document(md_path, cfg)
+            self.last_results = process_document(md_path, cfg, text=self._read_text_cached(md_path))
+            self._forget_text(md_path)
             # 应用后如 LLM 失败项较多给出提示
             try:
                 items = (self.last_results or {}).get("items", [])
@@ -456,33 +875,61 @@ class App(tk.Tk):
         except Exception as e:
             self._log(f"❌ 本地化失败：{e}")
 
-    def _pre_localize_remote_impl(self, md_path: Path):
+    def _pre_localize_remote_impl(self, md_path: Path, refs: Optional[List] = None) -> Optional[Tuple[str, List]]:
+        """
+        本地化远程图片。refs 为调用方已解析好的引用（省去再次解析）。
+        文档被改写时返回 (新文本, 新引用)，并写入文本缓存；未改动或失败返回 None。
+        """
         try:
-            if MILFileProcessor is None:
+            if _load_mil() is None:
                 self._log("⚠️ 缺少 md_image_localizer 模块，无法执行本地化。")
-                return
+                return None
             attach = self.attach_var.get() or "attachments"
             timeout = int(self.timeout_var.get())
             # 预估远程数
+            remote_urls: List[str] = []
             try:
-                txt = read_text(md_path)
-                refs = collect_images(txt)
-                remote_count = sum(1 for r in refs if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
+                if refs is None:
+                    refs = collect_images(self._read_text_cached(md_path))
+                remote_urls = [r.src for r in refs if is_remote_url(r.src)]
+                remote_count = len(remote_urls)
             except Exception:
                 remote_count = -1
             self._log(f"▶ 执行远程图片本地化（到 {attach}/）...")
-            proc = MILFileProcessor(md_path, attach, timeout, dry_run=False, rename_images=False)
+            prefetched: Dict[str, Path] = {}
+            if remote_urls:
+                try:
+                    prefetched = self._prefetch_remote_images(remote_urls, md_path.parent / attach, timeout)
+                except Exception as e:
+                    self._log(f"⚠️ 并发下载失败，改为逐张下载：{e}")
+            proc = _load_mil().FileProcessor(md_path, attach, timeout, dry_run=False, rename_images=False, prefetched=prefetched)
             dl, repl, ref = proc.process()
+            self._forget_text(md_path)
             if remote_count >= 0:
                 self._log(f"✅ 本地化完成：下载 {dl} 张，改写 {repl} 处，更新引用式 {ref} 处（预计远程 {remote_count}）")
             else:
                 self._log(f"✅ 本地化完成：下载 {dl} 张，改写 {repl} 处，更新引用式 {ref} 处")
+            new_text = getattr(proc, "written_text", None)
+            if new_text is None:
+                return None
+            self._remember_text(md_path, new_text)
+            return new_text, collect_images(new_text)
         except Exception as e:
             self._log(f"❌ 本地化失败：{e}")
+            return None
+
+    def _prefetch_remote_images(self, urls: List[str], attach_dir: Path, timeout: int) -> Dict[str, Path]:
+        """
+        并发预下载远程图片（md_image_localizer.prefetch_images），返回 url -> 本地路径，交给 md_image_localizer 只做改链。
+        """
+        result = _load_mil().prefetch_images(urls, attach_dir, timeout, workers=LOCALIZE_CONCURRENCY)
+        if self.verbose_var.get():
+            self._log(f"   并发下载完成：{len(result)}/{len(set(urls))} 张")
+        return result
 
     def _maybe_rename_md(self, md_path: Path) -> Path:
         try:
-            text = read_text(md_path)
+            text = self._read_text_cached(md_path)
             title = extract_doc_title(text, md_path)
             safe = sanitize_filename(title)
             if not safe:
@@ -493,6 +940,7 @@ class App(tk.Tk):
             if target.exists():
                 target = ensure_unique_path(md_path.parent, f"{safe}{md_path.suffix}")
             md_path.rename(target)
+            self._forget_text(md_path)
             self.path_var.set(str(target))
             self._log(f"📝 已重命名 Markdown：{md_path.name} -> {target.name}")
             return target
@@ -508,6 +956,7 @@ class App(tk.Tk):
         2) 弹出逐图对话框选择候选或自定义短语
         3) 用选择的短语按模板计算目标文件名，执行重命名/回链（本函数内实现）
         """
+        self._invalidate_fs_index()
         try:
             md_path = Path(self.path_var.get()).expanduser()
             if not md_path.exists():
@@ -522,22 +971,18 @@ class App(tk.Tk):
                     self._log("⚠️ 未提供 Base URL 或 API Key，将无法生成 AI 候选。")
                     return
             # 预检远程图片下载影响
+            remote_tmp = 0
             try:
-                txt_preview = read_text(md_path)
-                refs_preview = collect_images(txt_preview)
-                remote_count = sum(1 for r in refs_preview if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
-                if remote_count > 0 and not bool(self.download_var.get()):
-                    self._log(f"ℹ️ 检测到远程图片 {remote_count} 张，且未勾选“下载远程图片”。交互式应用阶段将不会改写远程链接。")
+                remote_tmp = _quick_remote_count(self._read_text_cached(md_path))
+                if remote_tmp > 0 and not bool(self.download_var.get()):
+                    self._log(f"ℹ️ 检测到远程图片 {remote_tmp} 张，且未勾选“下载远程图片”。交互式应用阶段将不会改写远程链接。")
             except Exception:
                 pass
             # 预处理：本地化远程图片（可选）
             try:
                 if bool(self.pre_localize_var.get()):
-                    txt_tmp = read_text(md_path)
-                    refs_tmp = collect_images(txt_tmp)
-                    remote_tmp = sum(1 for r in refs_tmp if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
                     if remote_tmp > 0:
-                        if MILFileProcessor is None:
+                        if _load_mil() is None:
                             self._log("⚠️ 缺少 md_image_localizer 模块，无法本地化远程图片。")
                         else:
                             self._log(f"▶ 先本地化远程图片：检测到 {remote_tmp} 张远程图片，开始下载...")
@@ -546,24 +991,36 @@ class App(tk.Tk):
                 pass
             cfg_preview = self._build_config(mode="dry-run")
             self._log(f"▶ 获取候选：{md_path}")
-            results = process_document(md_path, cfg_preview)
+            results = process_document(md_path, cfg_preview, text=self._read_text_cached(md_path))
             self.last_results = results
             if not results or "items" not in results:
                 self._log("⚠️ 未获取到候选。")
                 return
             items = results["items"]
-            title = results.get("title", extract_doc_title(read_text(md_path), md_path))
-            # 逐图对话框
+            title = results.get("title", extract_doc_title(self._read_text_cached(md_path), md_path))
+            # 逐图选择：复用同一个窗口，支持上一张/下一张
             chosen_map: Dict[int, str] = {}
-            for it in items:
-                idx = it["index"]
-                candidates = it.get("candidates", [])
-                default_title = it.get("normalized_title") or (candidates[0]["title"] if candidates else "图意")
-                chosen = self._choose_candidate_dialog(idx, it["src"], it.get("above_text",""), it.get("below_text",""), candidates, default_title)
-                if chosen is None:  # 用户取消
-                    self._log("ℹ️ 已取消交互式应用。")
-                    return
-                chosen_map[idx] = sanitize_filename(chosen) if chosen else sanitize_filename(default_title)
+            if items:
+                wizard = CandidateWizard(self, len(items))
+                try:
+                    pos = 0
+                    while pos < len(items):
+                        it = items[pos]
+                        idx = it["index"]
+                        candidates = it.get("candidates", [])
+                        default_title = it.get("normalized_title") or (candidates[0]["title"] if candidates else "图意")
+                        wizard.show_item(pos, idx, it["src"], it.get("above_text", ""), it.get("below_text", ""), candidates, default_title, chosen_map.get(idx))
+                        action, chosen = wizard.wait_choice()
+                        if action == "cancel":  # 用户取消
+                            self._log("ℹ️ 已取消交互式应用。")
+                            return
+                        chosen_map[idx] = sanitize_filename(chosen) if chosen else sanitize_filename(default_title)
+                        pos = max(0, pos - 1) if action == "prev" else pos + 1
+                finally:
+                    try:
+                        wizard.destroy()
+                    except Exception:
+                        pass
 
             # 应用选择：执行重命名与回链
             self._log("▶ 按选择应用重命名与回链...")
@@ -578,85 +1035,68 @@ class App(tk.Tk):
         except Exception as e:
             self._log(f"❌ 交互式应用失败：{e}")
 
-    def _choose_candidate_dialog(self, index: int, src: str, above: str, below: str, candidates: List[Dict], default_title: str) -> Optional[str]:
-        """弹出一个模式对话框，让用户为第 index 张图片选择候选或自定义"""
-        dlg = tk.Toplevel(self)
-        dlg.title(f"选择图意 - 图片 #{index}")
-        dlg.geometry("720x520")
-        dlg.transient(self)
-        dlg.grab_set()
-
-        # 标题
-        ttk.Label(dlg, text=f"图片 #{index}", font=("Microsoft YaHei", 11, "bold")).pack(pady=(10, 6))
-        ttk.Label(dlg, text=f"源: {src}", wraplength=680, foreground="#555").pack(pady=(0, 8))
-
-        # 上下文展示（可折叠简化，此处直接显示）
-        ctx_frame = ttk.LabelFrame(dlg, text="上下文")
-        ctx_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
-        txt = scrolledtext.ScrolledText(ctx_frame, wrap=tk.WORD, height=10)
-        txt.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
-        txt.insert(tk.END, f"[上文]\n{above.strip()}\n\n[下文]\n{below.strip()}\n")
-        txt.configure(state=tk.DISABLED)
-
-        # 候选区
-        cand_frame = ttk.LabelFrame(dlg, text="候选（选择一项，或在下方自定义）")
-        cand_frame.pack(fill=tk.X, padx=10, pady=6)
-        var_choice = tk.StringVar(value=default_title)
-        # 展示前 6 个候选
-        show_cands = candidates[:6] if candidates else []
-        if not show_cands:
-            show_cands = [{"strategy":"intent","title":default_title,"reason":"默认","confidence":0.6}]
-        for i, c in enumerate(show_cands, start=1):
-            title = c.get("title") or ""
-            meta = f"[{c.get('strategy')}] conf={c.get('confidence',0)} {c.get('reason','')}"
-            rb = ttk.Radiobutton(cand_frame, text=title, value=title, variable=var_choice)
-            rb.pack(anchor="w", padx=8, pady=2)
-            ttk.Label(cand_frame, text=meta, foreground="#777").pack(anchor="w", padx=28)
-
-        # 自定义输入
-        custom_frame = ttk.Frame(dlg)
-        custom_frame.pack(fill=tk.X, padx=10, pady=6)
-        ttk.Label(custom_frame, text="自定义图意：").pack(side=tk.LEFT)
-        custom_var = tk.StringVar()
-        ttk.Entry(custom_frame, textvariable=custom_var, width=48).pack(side=tk.LEFT, padx=6)
-
-        # 按钮
-        btns = ttk.Frame(dlg)
-        btns.pack(fill=tk.X, padx=10, pady=10)
-        ret: Dict[str, Optional[str]] = {"val": None}
-
-        def on_ok():
-            chosen = custom_var.get().strip() or var_choice.get().strip()
-            ret["val"] = sanitize_filename(chosen) if chosen else None
-            dlg.destroy()
-
-        def on_cancel():
-            ret["val"] = None
-            dlg.destroy()
-
-        ttk.Button(btns, text="确定", command=on_ok).pack(side=tk.RIGHT, padx=6)
-        ttk.Button(btns, text="取消", command=on_cancel).pack(side=tk.RIGHT)
+    @staticmethod
+    def _list_taken_names(attach_dir: Path) -> Set[str]:
+        try:
+            return {name.lower() for name in os.listdir(attach_dir)}
+        except OSError:
+            return set()
+
+    @staticmethod
+    def _claim_unique_path(dest_dir: Path, filename: str, taken: Set[str]) -> Path:
+        """与 ensure_unique_path 相同的 “name (n).ext” 规则，但只查内存集合；选中的名字随即占用。"""
+        base = Path(filename).stem
+        ext = Path(filename).suffix
+        name = base + ext
+        idx = 1
+        while name.lower() in taken:
+            name = f"{base} ({idx}){ext}"
+            idx += 1
+        taken.add(name.lower())
+        return dest_dir / name
+
+    @staticmethod
+    def _download_remote_refs(refs, attach_dir: Path, timeout: int) -> Dict[int, Optional[Path]]:
+        """
+        并发下载远程图片，返回 图片下标 -> 本地路径（失败为 None）。
+        落盘文件名主干相同的归为一组串行下载，避免 ensure_unique_path 并发撞名；同一 URL 多次出现时各下一份，与逐图下载一致。
+        """
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for i, ref in enumerate(refs):
+            if is_remote_url(ref.src):
+                stem = core.sanitize_intent_for_language(Path(ref.src).stem).lower()
+                groups.setdefault(stem, []).append((i, ref.src))
+        if not groups:
+            return {}
+
+        def fetch_group(group: List[Tuple[int, str]]) -> List[Tuple[int, Optional[Path]]]:
+            out: List[Tuple[int, Optional[Path]]] = []
+            for i, url in group:
+                try:
+                    out.append((i, download_image(url, attach_dir, timeout)))
+                except Exception:
+                    out.append((i, None))
+            return out
 
-        dlg.wait_window()
-        return ret["val"]
+        saved: Dict[int, Optional[Path]] = {}
+        workers = max(1, min(LOCALIZE_CONCURRENCY, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(fetch_group, groups.values()):
+                saved.update(part)
+        return saved
 
     def _apply_with_overrides(self, md_path: Path, title: str, chosen_map: Dict[int, str]):
         """
         根据用户选择的每图“图意”短语执行改名与回链。
         逻辑与后端一致： block/idx 采用“上一图到当前图的区间文本是否存在”来划分块序与块内序号。
         """
-        text = read_text(md_path)
+        text = self._read_text_cached(md_path)
         refs = collect_images(text)
 
-        # 准备输出文本（以偏移切片方式构建）
-        new_parts: List[str] = []
+        # 准备输出文本（以偏移切片方式构建）：每图固定占“前段 + 标记段”两格，外加尾部一格，预先分配好
+        new_parts: List[str] = [""] * (2 * len(refs) + 1)
         cursor = 0
 
-        # 计数器
-        block_idx = 0
-        img_idx = 0
-        last_end = 0
-
         # 附件目录
         attach_dir = md_path.parent / (self.attach_var.get() or "attachments")
         seq_width = int(self.seq_width_var.get())
@@ -664,36 +1104,31 @@ class App(tk.Tk):
         name_tmpl = self.template_var.get() or DEFAULT_NAME_TEMPLATE
         timeout = int(self.timeout_var.get())
         download_opt = bool(self.download_var.get())
+        # 附件目录已有文件名只列一次，之后的查重都在内存集合中完成
+        taken = self._list_taken_names(attach_dir)
+
+        # 一次性算出全部图片的上下文，避免逐图重复清洗相邻区间
+        neighbors = core.find_all_neighbor_texts(text, refs)
+
+        positions = self._block_positions(text, refs, strict=False, neighbors=neighbors)
 
+        # 远程图片先并发下载完，再进入逐图改名；已落盘的名字预先占用，避免被本地图片的目标名覆盖
+        downloaded: Dict[int, Optional[Path]] = {}
+        if download_opt:
+            downloaded = self._download_remote_refs(refs, attach_dir, timeout)
+            for path in downloaded.values():
+                if path is not None:
+                    taken.add(path.name.lower())
+
+        # 逐段记录是否真有改动，写回前不必再整篇比较新旧文本
+        modified = False
         for i, ref in enumerate(refs):
             # 上一图到当前图之间的文字
-            above, below, between, _ = core.find_neighbor_text(text, refs, i)
-            # 与后端一致的分块判定：
-            # 仅当“上一图到当前图之间”的有效文字 >=4，且剔除“如上/如下/上图/下图/见图X”等显式引用后仍有足够字母/汉字，才视为新块
-            visible_above = re.findall(r"[\u4e00-\u9fffA-Za-z0-9]", above)
-            is_new_block = False
-            if len(visible_above) >= 4:
-                above_wo_refs = above
-                try:
-                    # 剥离显式引用短语
-                    for pat in core.EXPLICIT_REF_PATTERNS:
-                        above_wo_refs = re.sub(pat, "", above_wo_refs)
-                except Exception:
-                    pass
-                # 去掉数字与符号，仅保留字母/汉字，再判断长度阈值
-                letters_only = re.sub(r"[\d\W_]+", "", above_wo_refs, flags=re.UNICODE)
-                if len(letters_only) >= 4:
-                    is_new_block = True
-            if is_new_block:
-                block_idx += 1
-                img_idx = 1
-            else:
-                if block_idx == 0:
-                    block_idx = 1
-                img_idx += 1
+            above, below, between, _ = neighbors[i]
+            block_idx, img_idx = positions[i]
 
             # 拼接原文前段
-            new_parts.append(text[cursor:ref.start])
+            new_parts[2 * i] = text[cursor:ref.start]
 
             # 最终图意短语
             chosen = chosen_map.get(ref["index"] if isinstance(ref, dict) else (i + 1))
@@ -714,18 +1149,12 @@ class App(tk.Tk):
             new_rel = ref.src  # 默认保留
             try:
                 if download_opt and is_remote_url(ref.src):
-                    saved = download_image(ref.src, attach_dir, timeout)
+                    saved = downloaded.get(i)
                     if saved:
                         ext = saved.suffix or ".img"
-                        target = ensure_unique_path(attach_dir, f"{final_base}{ext}")
-                        try:
-                            saved.rename(target)
-                        except Exception:
-                            target.write_bytes(saved.read_bytes())
-                            try:
-                                saved.unlink(missing_ok=True)  # type: ignore
-                            except Exception:
-                                pass
+                        target = self._claim_unique_path(attach_dir, f"{final_base}{ext}", taken)
+                        core.move_file(saved, target)
+                        taken.discard(saved.name.lower())
                         new_rel = os.path.relpath(target, md_path.parent).replace("\\", "/")
                 else:
                     # 本地：搬移/重命名到附件目录（带鲁棒解析）
@@ -733,12 +1162,14 @@ class App(tk.Tk):
                         src_path = self._resolve_local_image(md_path.parent, ref.src)
                         if src_path and src_path.exists():
                             ext = src_path.suffix or ".img"
-                            target = ensure_unique_path(attach_dir, f"{final_base}{ext}")
+                            target = self._claim_unique_path(attach_dir, f"{final_base}{ext}", taken)
                             attach_dir.mkdir(parents=True, exist_ok=True)
                             if src_path.parent == attach_dir:
-                                src_path.rename(target)
+                                core.move_file(src_path, target)
+                                taken.discard(src_path.name.lower())
+                                self._forget_resolved(md_path.parent, ref.src)
                             else:
-                                target.write_bytes(src_path.read_bytes())
+                                shutil.copyfile(src_path, target)
                             new_rel = os.path.relpath(target, md_path.parent).replace("\\", "/")
                         else:
                             self._log(f"⚠️ 本地图片不存在或无法定位：{ref.src}")
@@ -749,28 +1180,34 @@ class App(tk.Tk):
 
             # 在该图片标记段内替换 src -> new_rel
             original_seg = text[ref.start:ref.end]
-            new_seg = original_seg.replace(ref.src, new_rel)
-            new_parts.append(new_seg)
+            if new_rel != ref.src:
+                new_seg = original_seg.replace(ref.src, new_rel)
+                modified = modified or (new_seg != original_seg)
+                new_parts[2 * i + 1] = new_seg
+            else:
+                new_parts[2 * i + 1] = original_seg
 
             # 游标推进
             cursor = ref.end
 
-        # 追加尾部
-        new_parts.append(text[cursor:])
-        new_text = "".join(new_parts)
+        # 追加尾部；没有任何改动时直接沿用原文，不再拼出一份相同的副本
+        new_parts[-1] = text[cursor:]
+        new_text = "".join(new_parts) if modified else text
+        new_parts = []  # 写回前释放各段切片，峰值内存只剩原文与新文本
 
         # 备份与写回
         if bool(self.backup_var.get()):
             backup_path = md_path.with_suffix(md_path.suffix + ".bak")
             try:
-                backup_path.write_text(text, encoding="utf-8", newline="\n")
+                write_text_utf8(backup_path, text)
                 self._log(f"🗂 已备份原文件 -> {backup_path}")
             except Exception as e:
                 self._log(f"⚠️ 备份失败：{e}")
 
-        if new_text != text:
+        if modified:
             try:
                 write_text_utf8(md_path, new_text)
+                self._forget_text(md_path)
                 self._log(f"✅ 已写回：{md_path}")
             except Exception as e:
                 self._log(f"❌ 写回失败：{e}")
@@ -798,7 +1235,7 @@ class App(tk.Tk):
                     self._log("⚠️ 未提供 Base URL 或 API Key，单图选择将无法生成 AI 候选。")
                     return
             # 在主线程中解析文档并获取图片数量（避免后台线程里弹 simpledialog）
-            text = read_text(md_path)
+            text = self._read_text_cached(md_path)
             refs = collect_images(text)
             if not refs:
                 messagebox.showinfo("提示", "未发现图片。")
@@ -808,13 +1245,13 @@ class App(tk.Tk):
                 if bool(self.pre_localize_var.get()):
                     remote_count = sum(1 for r in refs if is_remote_url(r.src if hasattr(r, "src") else r.get("src", "")))
                     if remote_count > 0:
-                        if MILFileProcessor is None:
+                        if _load_mil() is None:
                             self._log("⚠️ 缺少 md_image_localizer 模块，无法本地化远程图片。")
                         else:
                             self._log(f"▶ 先本地化远程图片：检测到 {remote_count} 张远程图片，开始下载...")
-                            self._pre_localize_remote_impl(md_path)
-                            text = read_text(md_path)
-                            refs = collect_images(text)
+                            res = self._pre_localize_remote_impl(md_path, refs)
+                            if res is not None:
+                                text, refs = res
             except Exception:
                 pass
             idx = simpledialog.askinteger("单图选择", f"输入图片序号（1~{len(refs)}）：", minvalue=1, maxvalue=len(refs), parent=self)
@@ -827,11 +1264,12 @@ class App(tk.Tk):
             self._log(f"❌ 单图选择失败：{e}")
 
     def _pick_one_impl(self, md_path: Path, text: str, refs: List, idx: int):
+        self._invalidate_fs_index()
         try:
             # 预览候选（只取该序号的项展示）
             cfg_preview = self._build_config(mode="dry-run")
             self._log(f"▶ 获取单图候选：{md_path} | index={idx}")
-            results = process_document(md_path, cfg_preview)
+            results = self._cached_process_document(md_path, text, cfg_preview)
             items = results.get("items", []) if isinstance(results, dict) else []
             if not items or idx - 1 >= len(items):
                 self._log("⚠️ 未获取到候选或序号超出范围。")
@@ -867,7 +1305,7 @@ class App(tk.Tk):
                 )
                 chosen_holder["val"] = chosen
                 done.set()
-            self.after(0, _open_dialog_on_main)
+            self.after_idle(_open_dialog_on_main)
             done.wait()
             if chosen_holder["val"] is None:
                 self._log("ℹ️ 已取消单图选择。")
@@ -875,56 +1313,12 @@ class App(tk.Tk):
             chosen = sanitize_filename(chosen_holder["val"] or default_nt)
 
             # 计算该图的块序与块内序号（与后端一致规则）
-            block_idx = 0
-            img_idx = 0
-            target_ref = None
-            target_block = 0
-            target_img = 0
-            for i, ref in enumerate(refs):
-                above, below, between, explicit_refs = find_neighbor_text(text, refs, i)
-                visible_above = re.findall(r"[\u4e00-\u9fffA-Za-z0-9]", above)
-                is_new_block = False
-                if len(visible_above) >= 4:
-                    above_wo_refs = above
-                    try:
-                        for pat in core.EXPLICIT_REF_PATTERNS:
-                            above_wo_refs = re.sub(pat, "", above_wo_refs)
-                    except Exception:
-                        pass
-                    try:
-                        above_wo_refs = re.sub(r"(?m)^\s*#+\s+.*$", "", above_wo_refs)
-                        above_wo_refs = re.sub(r"(?m)^\s*(?:[-*+]\s+|\d+\.\s+).*$", "", above_wo_refs)
-                        above_wo_refs = re.sub(r"(?:图\s*\d+|Figure\s*\d+|Fig\.\s*\d+)", "", above_wo_refs, flags=re.IGNORECASE)
-                    except Exception:
-                        pass
-                    letters_only = re.sub(r"[\d\W_]+", "", above_wo_refs, flags=re.UNICODE)
-                    if len(letters_only) >= 8:
-                        is_new_block = True
-                try:
-                    prev_end_local = refs[i - 1].end if i > 0 else 0
-                except Exception:
-                    prev_end_local = 0
-                gap = max(0, ref.start - prev_end_local)
-                if gap <= 3 or explicit_refs:
-                    is_new_block = False
-
-                if is_new_block:
-                    block_idx += 1
-                    img_idx = 1
-                else:
-                    if block_idx == 0:
-                        block_idx = 1
-                    img_idx += 1
-
-                if (i + 1) == idx:
-                    target_ref = ref
-                    target_block = block_idx
-                    target_img = img_idx
-                    break
-
-            if target_ref is None:
+            positions = self._block_positions(text, refs, strict=True)
+            if not (1 <= idx <= len(positions)):
                 self._log("❌ 迭代失败：未定位到目标图片。")
                 return
+            target_ref = refs[idx - 1]
+            target_block, target_img = positions[idx - 1]
 
             # 生成最终文件名
             final_name = name_with_template(
@@ -938,8 +1332,9 @@ class App(tk.Tk):
                 global_index=idx
             )
 
-            # 执行下载/搬移与改链（仅该图）
+            # 执行下载/搬移与改链（仅该图）；只改一处，据新旧 src 是否不同即可判断有无改动
             new_text = text
+            modified = False
             attach_dir = md_path.parent / (self.attach_var.get() or "attachments")
             timeout = int(self.timeout_var.get())
             download_opt = bool(self.download_var.get())
@@ -949,16 +1344,10 @@ class App(tk.Tk):
                     if saved:
                         ext = saved.suffix or ".img"
                         target_path = ensure_unique_path(attach_dir, f"{final_name}{ext}")
-                        try:
-                            saved.rename(target_path)
-                        except Exception:
-                            target_path.write_bytes(saved.read_bytes())
-                            try:
-                                saved.unlink(missing_ok=True)  # type: ignore
-                            except Exception:
-                                pass
+                        core.move_file(saved, target_path)
                         new_rel = os.path.relpath(target_path, md_path.parent).replace("\\", "/")
-                        new_text = new_text[:target_ref.start] + new_text[target_ref.start:target_ref.end].replace(target_ref.src, new_rel) + new_text[target_ref.end:]
+                        modified = new_rel != target_ref.src
+                        new_text = _splice_ref(text, target_ref, new_rel)
                 else:
                     # 本地：搬移/重命名到附件目录
                     src_path = self._resolve_local_image(md_path.parent, target_ref.src)
@@ -967,11 +1356,13 @@ class App(tk.Tk):
                         target_path = ensure_unique_path(attach_dir, f"{final_name}{ext}")
                         attach_dir.mkdir(parents=True, exist_ok=True)
                         if src_path.parent == attach_dir:
-                            src_path.rename(target_path)
+                            core.move_file(src_path, target_path)
+                            self._forget_resolved(md_path.parent, target_ref.src)
                         else:
-                            target_path.write_bytes(src_path.read_bytes())
+                            shutil.copyfile(src_path, target_path)
                         new_rel = os.path.relpath(target_path, md_path.parent).replace("\\", "/")
-                        new_text = new_text[:target_ref.start] + new_text[target_ref.start:target_ref.end].replace(target_ref.src, new_rel) + new_text[target_ref.end:]
+                        modified = new_rel != target_ref.src
+                        new_text = _splice_ref(text, target_ref, new_rel)
                     else:
                         self._log(f"⚠️ 本地图片不存在或无法定位：{target_ref.src}")
             except Exception as e:
@@ -981,14 +1372,15 @@ class App(tk.Tk):
             if bool(self.backup_var.get()):
                 backup_path = md_path.with_suffix(md_path.suffix + ".bak")
                 try:
-                    backup_path.write_text(text, encoding="utf-8", newline="\n")
+                    write_text_utf8(backup_path, text)
                     self._log(f"🗂 已备份原文件 -> {backup_path}")
                 except Exception as e:
                     self._log(f"⚠️ 备份失败：{e}")
 
-            if new_text != text:
+            if modified:
                 try:
                     write_text_utf8(md_path, new_text)
+                    self._forget_text(md_path)
                     self._log(f"✅ 已写回（单图）：{md_path}\n  • #{idx} block={target_block} idx={target_img} -> {final_name}")
                     try:
                         if bool(self.rename_md_var.get()):
@@ -1004,6 +1396,37 @@ class App(tk.Tk):
         except Exception as e:
             self._log(f"❌ 单图选择失败：{e}")
 
+    def _block_positions(self, text: str, refs: List, strict: bool, neighbors: Optional[List] = None) -> List[Tuple[int, int]]:
+        """
+        全部图片的 (块序, 块内序号)，按 (内容摘要, 图片数, 规则) 缓存；
+        预览后再单图选择、或连续单图选择同一文档时直接取用，不再逐图重跑分块判定。
+        """
+        key = (core._cache_digest(text.encode("utf-8")), len(refs), strict)
+        cached = self._block_pos_cache.get(key)
+        if cached is not None:
+            return cached
+        if neighbors is None:
+            neighbors = core.find_all_neighbor_texts(text, refs)
+        positions = _compute_block_positions(refs, neighbors, strict)
+        if len(self._block_pos_cache) >= DOC_CACHE_MAX:
+            self._block_pos_cache.clear()
+        self._block_pos_cache[key] = positions
+        return positions
+
+    def _preview_cache_get(self, key: tuple):
+        with self._preview_lock:
+            img = self._preview_cache.get(key)
+            if img is not None:
+                self._preview_cache.move_to_end(key)
+            return img
+
+    def _preview_cache_put(self, key: tuple, img) -> None:
+        with self._preview_lock:
+            self._preview_cache[key] = img
+            self._preview_cache.move_to_end(key)
+            while len(self._preview_cache) > PREVIEW_CACHE_MAX:
+                self._preview_cache.popitem(last=False)
+
     def _choose_pick_one_dialog(self, index: int, md_path: Path, src: str, above: str, below: str, above_phrase: str, below_phrase: str, intent_phrase: str) -> Optional[str]:
         """弹出单图选择对话框，并直接显示图片预览与三选一候选"""
         dlg = tk.Toplevel(self)
@@ -1025,55 +1448,60 @@ class App(tk.Tk):
             """
             在后台线程加载字节数据，在主线程中创建 PhotoImage/ImageTk 并更新 UI，避免跨线程操作 Tk。
             """
+            Image, ImageTk = _load_pil()
+
+            def show_image(tk_img):
+                img_label.configure(image=tk_img, text="")
+                img_label.image = tk_img  # 防 GC
+
             try:
                 if core.is_remote_url(src):
-                    if requests is None or Image is None or ImageTk is None:
-                        img_label.after(0, lambda: img_label.configure(text="远程图片预览需要 requests + Pillow（PIL）。请安装后重试：pip install requests pillow"))
+                    cache_key: tuple = (src, PREVIEW_BOX)
+                    cached = self._preview_cache_get(cache_key)
+                    if cached is not None:
+                        img_label.after_idle(lambda: show_image(cached))
+                        return
+                    if core.load_requests() is None or Image is None or ImageTk is None:
+                        img_label.after_idle(lambda: img_label.configure(text="远程图片预览需要 requests + Pillow（PIL）。请安装后重试：pip install requests pillow"))
                         return
-                    r = requests.get(src, timeout=12)
-                    r.raise_for_status()
-                    data = r.content
+                    data = core.fetch_preview_bytes(src)
 
                     def apply_remote():
                         try:
-                            im = Image.open(BytesIO(data))
-                            try:
-                                im = im.convert("RGB")
-                            except Exception:
-                                pass
-                            im.thumbnail((760, 420))
+                            im = core.decode_preview_image(data, PREVIEW_BOX)
                             tk_img = ImageTk.PhotoImage(im)
-                            img_label.configure(image=tk_img, text="")
-                            img_label.image = tk_img  # 防 GC
+                            self._preview_cache_put(cache_key, tk_img)
+                            show_image(tk_img)
                         except Exception as e2:
                             img_label.configure(text=f"预览加载失败：{e2}")
-                    img_label.after(0, apply_remote)
+                    img_label.after_idle(apply_remote)
                 else:
                     p = self._resolve_local_image(md_path.parent, src) or (md_path.parent / Path(src)).resolve()
                     if not p.exists():
-                        img_label.after(0, lambda: img_label.configure(text=f"文件不存在或无法定位：{p}"))
+                        img_label.after_idle(lambda: img_label.configure(text=f"文件不存在或无法定位：{p}"))
                         return
                     if Image is not None and ImageTk is not None:
                         try:
+                            st = p.stat()
+                            cache_key = (str(p), st.st_mtime_ns, st.st_size, PREVIEW_BOX)
+                            cached = self._preview_cache_get(cache_key)
+                            if cached is not None:
+                                img_label.after_idle(lambda: show_image(cached))
+                                return
                             data = p.read_bytes()
                         except Exception as e:
-                            img_label.after(0, lambda: img_label.configure(text=f"读取失败：{e}"))
+                            img_label.after_idle(lambda msg=f"读取失败：{e}": img_label.configure(text=msg))
                             return
 
                         def apply_local_pillow():
                             try:
-                                im = Image.open(BytesIO(data))
-                                try:
-                                    im = im.convert("RGB")
-                                except Exception:
-                                    pass
-                                im.thumbnail((760, 420))
+                                im = core.decode_preview_image(data, PREVIEW_BOX)
                                 tk_img = ImageTk.PhotoImage(im)
-                                img_label.configure(image=tk_img, text="")
-                                img_label.image = tk_img  # 防 GC
+                                self._preview_cache_put(cache_key, tk_img)
+                                show_image(tk_img)
                             except Exception as e2:
                                 img_label.configure(text=f"预览加载失败：{e2}")
-                        img_label.after(0, apply_local_pillow)
+                        img_label.after_idle(apply_local_pillow)
                     else:
                         # 无 Pillow：仅支持 PNG/GIF 的 Tk PhotoImage，且必须在主线程执行
                         if p.suffix.lower() in (".png", ".gif"):
@@ -1084,11 +1512,11 @@ class App(tk.Tk):
                                     img_label.image = tk_img2  # 防 GC
                                 except Exception as e3:
                                     img_label.configure(text=f"加载失败：{e3}")
-                            img_label.after(0, apply_photoimage)
+                            img_label.after_idle(apply_photoimage)
                         else:
-                            img_label.after(0, lambda: img_label.configure(text="缺少 Pillow（PIL），无法预览非 PNG/GIF。请安装：pip install pillow"))
+                            img_label.after_idle(lambda: img_label.configure(text="缺少 Pillow（PIL），无法预览非 PNG/GIF。请安装：pip install pillow"))
             except Exception as e:
-                img_label.after(0, lambda: img_label.configure(text=f"预览加载失败：{e}"))
+                img_label.after_idle(lambda msg=f"预览加载失败：{e}": img_label.configure(text=msg))
 
         # 异步加载，避免卡 UI
         try:
@@ -1151,7 +1579,7 @@ class App(tk.Tk):
             return
         try:
             Path(p).parent.mkdir(parents=True, exist_ok=True)
-            Path(p).write_text(json.dumps(self.last_results, ensure_ascii=False, indent=2), encoding="utf-8")
+            Path(p).write_bytes(_json_dumps_bytes(self.last_results))
             messagebox.showinfo("提示", f"已保存：{p}")
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{e}")
@@ -1159,15 +1587,31 @@ class App(tk.Tk):
     def _profiles_path(self) -> Path:
         return PROFILES_PATH
 
-    def _load_profiles(self):
+    def _profiles_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._profiles_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_profiles_file(self) -> None:
         try:
             p = self._profiles_path()
             if p.exists():
-                self.profiles = json.load(p.open("r", encoding="utf-8"))
+                data = _json_loads_bytes(p.read_bytes())
+                self.profiles = data if isinstance(data, dict) else {}
             else:
                 self.profiles = {}
         except Exception:
             self.profiles = {}
+        self._profiles_stamp = self._profiles_mtime()
+
+    def _refresh_profiles_if_changed(self) -> None:
+        # 配置档文件与批量版 GUI 共用：对方写过后先合并磁盘上的最新内容
+        if self._profiles_mtime() != self._profiles_stamp:
+            self._read_profiles_file()
+
+    def _load_profiles(self):
+        self._read_profiles_file()
         # 更新下拉
         names = sorted(list(self.profiles.keys()))
         try:
@@ -1182,10 +1626,27 @@ class App(tk.Tk):
         try:
             p = self._profiles_path()
             p.parent.mkdir(parents=True, exist_ok=True)
-            json.dump(self.profiles, p.open("w", encoding="utf-8"), ensure_ascii=False, indent=2)
+            # 写临时文件后原子替换，中途退出也不会留下半截 JSON
+            tmp = p.with_suffix(".json.tmp")
+            tmp.write_bytes(_json_dumps_bytes(self.profiles))
+            os.replace(tmp, p)
+            self._profiles_stamp = self._profiles_mtime()
         except Exception as e:
             messagebox.showerror("错误", f"保存配置档失败：{e}")
 
+    def _update_profile(self, name: str, payload: Optional[Dict]):
+        """只改动一条配置档（payload 为 None 表示删除），其余条目以磁盘上的最新内容为准。"""
+        self._refresh_profiles_if_changed()
+        if payload is None:
+            if name not in self.profiles:
+                return
+            self.profiles.pop(name, None)
+        else:
+            if self.profiles.get(name) == payload:
+                return  # 内容未变，不重写文件
+            self.profiles[name] = payload
+        self._save_profiles()
+
     def _collect_current_settings(self) -> Dict:
         # 收集当前 UI 参数，便于保存为配置档
         return {
@@ -1195,6 +1656,9 @@ class App(tk.Tk):
             "timeout": int(self.timeout_var.get()),
             "max_retries": int(self.retries_var.get()),
             "rate_limit": float(self.rate_limit_var.get()),
+            "rpm": float(self.rpm_var.get()),
+            "burst": int(self.burst_var.get()),
+            "concurrency": int(self.concurrency_var.get()),
             "strategy": self.strategy_var.get().strip(),
             "template": self.template_var.get().strip(),
             "seq_width": int(self.seq_width_var.get()),
@@ -1202,6 +1666,7 @@ class App(tk.Tk):
             "attach_dir_name": self.attach_var.get().strip(),
             "download": bool(self.download_var.get()),
             "vision": bool(self.vision_var.get()),
+            "vision_max_side": int(self.vision_max_side_var.get()),
             "pre_localize": bool(self.pre_localize_var.get()),
             "rename_md": bool(self.rename_md_var.get()),
         }
@@ -1215,6 +1680,9 @@ class App(tk.Tk):
             self.timeout_var.set(int(d.get("timeout", self.timeout_var.get())))
             self.retries_var.set(int(d.get("max_retries", self.retries_var.get())))
             self.rate_limit_var.set(float(d.get("rate_limit", self.rate_limit_var.get())))
+            self.rpm_var.set(float(d.get("rpm", self.rpm_var.get())))
+            self.burst_var.set(int(d.get("burst", self.burst_var.get())))
+            self.concurrency_var.set(int(d.get("concurrency", self.concurrency_var.get())))
             self.strategy_var.set(d.get("strategy", self.strategy_var.get()))
             self.template_var.set(d.get("template", self.template_var.get()))
             self.seq_width_var.set(int(d.get("seq_width", self.seq_width_var.get())))
@@ -1222,6 +1690,7 @@ class App(tk.Tk):
             self.attach_var.set(d.get("attach_dir_name", self.attach_var.get()))
             self.download_var.set(bool(d.get("download", self.download_var.get())))
             self.vision_var.set(bool(d.get("vision", self.vision_var.get())))
+            self.vision_max_side_var.set(int(d.get("vision_max_side", self.vision_max_side_var.get())))
             self.pre_localize_var.set(bool(d.get("pre_localize", self.pre_localize_var.get())))
             self.rename_md_var.set(bool(d.get("rename_md", self.rename_md_var.get())))
         except Exception as e:
@@ -1233,8 +1702,7 @@ class App(tk.Tk):
             messagebox.showinfo("提示", "请输入配置档名称后再保存。")
             return
         d = self._collect_current_settings()
-        self.profiles[name] = d
-        self._save_profiles()
+        self._update_profile(name, d)
         # 刷新下拉
         try:
             names = sorted(list(self.profiles.keys()))
@@ -1247,6 +1715,7 @@ class App(tk.Tk):
 
     def _on_profile_load(self):
         name = (self.profile_name_var.get() or "").strip()
+        self._refresh_profiles_if_changed()
         if not name or name not in self.profiles:
             messagebox.showinfo("提示", "未找到该配置档，请先保存或选择已有配置名。")
             return
@@ -1259,8 +1728,7 @@ class App(tk.Tk):
             messagebox.showinfo("提示", "未找到该配置档。")
             return
         try:
-            del self.profiles[name]
-            self._save_profiles()
+            self._update_profile(name, None)
             names = sorted(list(self.profiles.keys()))
             self.profile_combo["values"] = names
             self.profile_name_var.set(names[0] if names else "")
@@ -1268,6 +1736,10 @@ class App(tk.Tk):
         except Exception as e:
             messagebox.showerror("错误", f"删除失败：{e}")
 
+    def _on_clear_intent_cache(self):
+        INTENT_CACHE.clear()
+        self._log("🧹 已清除图意缓存，下次预览将重新请求模型。")
+
     def _on_test_api(self):
         """测试当前 Base URL / API Key / Model 是否可用（兼容 SiliconFlow / OpenAI 格式）"""
         try:
@@ -1286,7 +1758,8 @@ class App(tk.Tk):
                 timeout=int(self.timeout_var.get()),
                 max_retries=int(self.retries_var.get()),
                 rate_limit=float(self.rate_limit_var.get()),
-                verbose=True
+                verbose=True,
+                limiter=self._get_rate_limiter(),
             )
             d = core.safe_parse_json(out) if out else None
             if isinstance(d, dict):
@@ -1311,7 +1784,10 @@ class App(tk.Tk):
 
 def main():
     app = App()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        core.close_http_session()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -18,18 +18,54 @@
 from __future__ import annotations
 
 import argparse
+import bisect
+import hashlib
 import os
 import re
+import shutil
+import socket
 import sys
+import threading
 import time
 import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.error import HTTPError
 from urllib.parse import urlparse, unquote
-from urllib.request import Request, urlopen
+from urllib.request import Request, getproxies, proxy_bypass, urlopen
+
+try:
+    import urllib3  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    urllib3 = None
+
+try:
+    import orjson  # type: ignore  # 可选：--report 序列化更快，直接产出 UTF-8 字节
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import re2  # type: ignore  # google-re2 / pyre2：线性时间匹配，不回溯
+except Exception:  # pragma: no cover - optional dependency
+    re2 = None
 
 ATTACH_DIR_NAME_DEFAULT = "attachment"
 DEFAULT_TIMEOUT = 25
+DOWNLOAD_WORKERS = 8  # 同一文件内远程图片的并发下载数
+FILE_JOBS = 4  # CLI 同时处理的附件目录数（同一附件目录内的文件仍逐个处理）
+HTTP_POOL_HOSTS = 16  # 连接池缓存的主机数
+HTTP_POOL_MAXSIZE = 16  # 每个主机保留的 keep-alive 连接数下限（main 按 --workers + --jobs 放大）
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # 边收边写的块大小（复用同一缓冲区），图片不必整张读入内存
+DISK_CACHE_DIR = Path.home() / ".cache" / "md-image-localizer"  # 跨次运行的下载缓存目录
+DISK_CACHE_MAX_BYTES = 1 << 30  # 缓存上限 1 GiB，超出按最近使用时间淘汰
+DNS_WARM_TTL = 300  # 同一主机名在此秒数内只预解析一次（批量处理多个文件时）
+DIR_LISTING_TTL = 30  # ensure_unique_path 缓存目录列表的秒数
+REPORT_WRITE_BUFFER = 1 << 20  # --report 写文件的缓冲区大小
+# 报告每条记录的字段；运行期间按元组保存，写出时才组装成对象
+REPORT_FIELDS = ("md", "downloaded", "replaced_blocks", "updated_ref_defs", "remote_expected", "remaining_remote_count", "remaining_remote")
+ETAG_XATTR = "user.md_image_etag"  # 下载文件上记录服务器 ETag 的扩展属性（Linux）
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) md-image-localizer/1.0"
 ACCEPT_HEADER = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
 
@@ -59,6 +95,105 @@ WIKILINK_EMBED_RE = re.compile(r"!\[\[(.*?)\]\]")
 # Markdown 引用式定义，如: [id]: https://example.com/img.png "title"
 REF_DEF_RE = re.compile(r'^\s*\[([^\]]+)\]:\s*(\S+)(?:\s+(".*?"|\'.*?\'|\(.*?\)))?\s*$', re.MULTILINE)
 
+# re 的 \s 认全部 Unicode 空白（即 str.isspace），RE2 只认 ASCII；交给 RE2 前把 \s/\S 展开成同样的字符集，
+# 否则用全角空格（U+3000）或不换行空格缩进的引用式定义会被 RE2 漏掉
+_UNICODE_SPACES = "".join("\\x{%x}" % cp for cp in range(0x3001) if chr(cp).isspace())
+
+def _re2_unicode_spaces(pattern: str) -> str:
+    """把模式里的 \\s / \\S 改写为与 re 一致的显式 Unicode 空白集合（RE2 语法）；其它转义原样保留。"""
+    out: List[str] = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            esc = pattern[i + 1]
+            if esc == "s":
+                out.append(_UNICODE_SPACES if in_class else f"[{_UNICODE_SPACES}]")
+            elif esc == "S" and not in_class:
+                out.append(f"[^{_UNICODE_SPACES}]")
+            else:
+                out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if ch == "[" and not in_class:
+            in_class = True
+            out.append(ch)
+            # 紧跟 [ 或 [^ 的 ] 是字面量，不结束字符集
+            if pattern.startswith("^", i + 1):
+                out.append("^")
+                i += 1
+            if pattern.startswith("]", i + 1):
+                out.append("]")
+                i += 1
+        elif ch == "]" and in_class:
+            in_class = False
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+# 扫描模式须与 re 结果一致的样例：全角/不换行空格缩进的引用式定义、带标题与括号的图片、HTML 与嵌入
+_SCAN_PARITY_SAMPLE = (
+    "\u3000\u3000[a]: https://e.com/a.png \"t\"\n"
+    "\u00a0[b]:\u3000https://e.com/b.png\n"
+    "[c]: https://e.com/c.png\n"
+    "正文 ![图\u3000一](https://e.com/x(1).png \"说明\") 与 <IMG alt=\"x\" src='https://e.com/y.png'>\n"
+    "![[本地\u3000图.png|200]]\n"
+)
+
+def _compile_scan_pattern(pattern: str):
+    """
+    整篇文档的扫描优先交给 RE2（线性时间，病态输入也不会回溯爆炸）；未安装或模式不被支持时退回 re。
+    RE2 的 \\b 只认 ASCII，扫描结果只用来定位，分组与替换仍由各类别原有的 re 模式完成；
+    \\s/\\S 已展开为 Unicode 空白集合。编译后先在样例上与 re 对照，定位结果不一致时同样退回 re。
+    """
+    fallback = re.compile(pattern, re.MULTILINE)
+    if re2 is not None:
+        try:
+            compiled = re2.compile("(?m)" + _re2_unicode_spaces(pattern))
+            spans = [(m.start(), m.end()) for m in compiled.finditer(_SCAN_PARITY_SAMPLE)]
+            if spans == [m.span() for m in fallback.finditer(_SCAN_PARITY_SAMPLE)]:
+                return compiled
+        except Exception:
+            pass
+    return fallback
+
+# 四类图片引用合成一个模式，一次扫描即可按文档顺序得到全部引用（具名分组标明类别）
+IMAGE_TOKEN_RE = _compile_scan_pattern(
+    "|".join([
+        f"(?P<ref>{REF_DEF_RE.pattern})",
+        f"(?P<md>{MD_IMAGE_RE.pattern})",
+        f"(?P<html>(?i:{HTML_IMG_RE.pattern}))",
+        f"(?P<embed>{WIKILINK_EMBED_RE.pattern})",
+    ])
+)
+IMAGE_TOKEN_KINDS = {"ref": REF_DEF_RE, "md": MD_IMAGE_RE, "html": HTML_IMG_RE, "embed": WIKILINK_EMBED_RE}
+# 类别 -> 具名分组的编号：google-re2 的 Match.start 只接受数字编号
+IMAGE_TOKEN_GROUPS = {kind: IMAGE_TOKEN_RE.groupindex[kind] for kind in IMAGE_TOKEN_KINDS}
+# 四类引用各自必含的 ASCII 标记（![ / ]: / <img）；原始字节里一个都没有的文件不必解码和扫描
+IMAGE_MARKER_BYTES_RE = re.compile(rb"!\[|\]:|<[iI][mM][gG]")
+# 标题/命名/图意提取用到的辅助模式（模块级编译一次，逐图调用时不再查 re 内部缓存）
+FRONT_MATTER_RE = re.compile(r"^---\s*(.*?)\s*---", re.DOTALL)
+FRONT_MATTER_TITLE_RES = [re.compile(rf"^\s*{key}\s*:\s*(.+)$", re.MULTILINE) for key in ("parent", "title", "Parent", "Title")]
+CJK_WORD_RE = re.compile(r"[\u4e00-\u9fff]{2,}")
+EN_WORD_RE = re.compile(r"[A-Za-z]{4,}")
+TRAILING_IMAGE_EXT_RE = re.compile(r"(?i)(?:[._\-\s])?(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)$")
+NON_WORD_RUN_RE = re.compile(r"[^\w\u4e00-\u9fff]+")
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+BARE_IMAGE_FILE_RE = re.compile(r"(?i)\b\S+\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b")
+ARTICLE_MARK_RE = re.compile(r'[『』「」【】《》()（）\*\-\+\=\[\]{}|\\]')
+SENTENCE_END_RE = re.compile(r"[。！？；]")
+WHITESPACE_RE = re.compile(r"\s+")
+VISIBLE_CHAR_RE = re.compile(r"[\u4e00-\u9fffA-Za-z0-9]")
+QUOTED_TITLE_RE = re.compile(r'(".*?"|\'.*?\')')
+FORBIDDEN_FILENAME_TABLE = str.maketrans("", "", '\\/:*?"<>|')
+ALT_ATTR_RE = re.compile(r'\balt=["\']([^"\']+)["\']', re.IGNORECASE)
+# 段落摘要优先选取包含这些术语的句子
+SUMMARY_KEY_TERMS = ('双壳纲', '船蛆', '巨型船蛆', '足丝', '鳃', '壳', '钻木', '习性', '外观', '结构', '照片', '示意图')
+TEXT_CACHE_SIZE = 512  # 关键词/段落摘要的记忆化条目数（同一段落的多张图片共用结果）
+
 
 def is_remote_url(url: str) -> bool:
     low = url.strip().lower()
@@ -82,24 +217,70 @@ def guess_ext_from_content_type(content_type: Optional[str]) -> Optional[str]:
 
 
 def sanitize_filename(name: str) -> str:
-    # Windows 不允许的字符: \ / : * ? " < > |
-    forbidden = '\\/:*?"<>|'
-    safe = "".join(ch for ch in name if ch not in forbidden)
-    # 清理控制字符和尾部空格/点（Windows）
-    safe = "".join(ch for ch in safe if ch.isprintable())
+    # Windows 不允许的字符: \ / : * ? " < > |（一次 translate 删除）
+    safe = name.translate(FORBIDDEN_FILENAME_TABLE)
+    # 清理控制字符和尾部空格/点（Windows）；整串可打印时跳过逐字符过滤
+    if not safe.isprintable():
+        safe = "".join(ch for ch in safe if ch.isprintable())
     safe = safe.strip(" .")
     return safe or "image"
 
 
+# 目录 -> (列出时间, 已存在/已占用的文件名)；同一进程内各 FileProcessor 共用，省去撞名时逐个 exists() 探测
+_DIR_NAMES: Dict[str, Tuple[float, set]] = {}
+_DIR_NAMES_LOCK = threading.Lock()
+
+def _dir_names_locked(dest_dir: Path) -> set:
+    key = str(dest_dir)
+    now = time.time()
+    cached = _DIR_NAMES.get(key)
+    if cached is not None and now - cached[0] < DIR_LISTING_TTL:
+        return cached[1]
+    try:
+        names = set(os.listdir(key))
+    except OSError:
+        names = set()
+    _DIR_NAMES[key] = (now, names)
+    return names
+
+# 已确认存在的目录 -> 确认时间；同一附件目录下的每张图片/每个文件不再各做一次 mkdir
+_ENSURED_DIRS: Dict[str, float] = {}
+
+def ensure_dir(path: Path) -> None:
+    """确保目录存在；DIR_LISTING_TTL 内确认过的目录直接跳过。写入失败时调用 forget_dir 让下次重新创建。"""
+    key = str(path)
+    now = time.time()
+    with _DIR_NAMES_LOCK:
+        if now - _ENSURED_DIRS.get(key, 0.0) < DIR_LISTING_TTL:
+            return
+    path.mkdir(parents=True, exist_ok=True)
+    with _DIR_NAMES_LOCK:
+        _ENSURED_DIRS[key] = now
+
+def forget_dir(path: Path) -> None:
+    """目录可能已被删除或改动：丢弃它的存在确认与缓存的文件名列表。"""
+    with _DIR_NAMES_LOCK:
+        _ENSURED_DIRS.pop(str(path), None)
+        _DIR_NAMES.pop(str(path), None)
+
 def ensure_unique_path(dest_dir: Path, filename: str) -> Path:
+    """
+    返回 dest_dir 下不冲突的路径（重名时依次尝试 “name (n).ext”），并在进程内占用该名字，
+    并发线程不会拿到同一个名字。已知存在的名字只查缓存的目录列表；列表里没有的候选再 exists() 确认一次，
+    列表过期（DIR_LISTING_TTL）或被其它程序改动时也不会覆盖已有文件。
+    """
     base = Path(filename).stem
     ext = Path(filename).suffix
-    candidate = dest_dir / (base + ext)
+    name = base + ext
     idx = 1
-    while candidate.exists():
-        candidate = dest_dir / f"{base} ({idx}){ext}"
-        idx += 1
-    return candidate
+    with _DIR_NAMES_LOCK:
+        names = _dir_names_locked(dest_dir)
+        while name in names or (dest_dir / name).exists():
+            names.add(name)
+            name = f"{base} ({idx}){ext}"
+            idx += 1
+        names.add(name)
+    return dest_dir / name
 
 
 def extract_filename_from_url(url: str) -> Tuple[str, Optional[str]]:
@@ -116,16 +297,31 @@ def extract_filename_from_url(url: str) -> Tuple[str, Optional[str]]:
     return (name if name else "image", ext if ext else None)
 
 
-def read_text_with_fallback(path: Path) -> str:
-    encodings = ["utf-8", "utf-16", "gb18030"]
-    for enc in encodings:
+def decode_text_with_fallback(data: bytes) -> str:
+    """按 utf-8 / utf-16 / gb18030 依次尝试解码，换行统一为 \\n（与文本模式读取一致）。"""
+    for enc in ("utf-8", "utf-16", "gb18030"):
         try:
-            return path.read_text(encoding=enc)
+            text = data.decode(enc)
+            break
         except UnicodeDecodeError:
             continue
-        except OSError:
-            break
-    return path.read_text(encoding="utf-8", errors="ignore")
+    else:
+        text = data.decode("utf-8", errors="ignore")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_text_with_fallback(path: Path) -> str:
+    return decode_text_with_fallback(path.read_bytes())
+
+
+def may_contain_images(data: bytes) -> bool:
+    """
+    在原始字节上粗筛是否可能含图片引用（只会多报、不会漏报）。
+    utf-8 与 gb18030 中 ASCII 字符都按原字节出现；utf-16 的标记夹着 \\x00，无法按字节判断，一律视为可能含有。
+    """
+    if data[:2] in (b"\xff\xfe", b"\xfe\xff") or b"\x00" in data:
+        return True
+    return IMAGE_MARKER_BYTES_RE.search(data) is not None
 
 
 def write_text_utf8(path: Path, text: str) -> None:
@@ -155,6 +351,524 @@ def split_md_target(raw: str) -> Tuple[str, str]:
     return url, trailing if trailing.startswith(" ") else ((" " + trailing) if trailing else "")
 
 
+_HTTP_POOL = None
+_HTTP_POOL_LOCK = threading.Lock()
+_HTTP_POOL_SIZE = HTTP_POOL_MAXSIZE
+# 代理地址 -> urllib3.ProxyManager；代理设置（HTTP(S)_PROXY/NO_PROXY 等）首次用到时读取一次
+_PROXY_POOLS: Dict[str, object] = {}
+_HTTP_PROXIES: Optional[Dict[str, str]] = None
+# 正在下载中的 URL -> _SharedDownload；同一 URL 的并发请求只发一次，其余线程等待同一结果
+_INFLIGHT: Dict[str, "_SharedDownload"] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def size_http_pool(concurrency: int) -> None:
+    """
+    按本次运行的最大并发连接数放大每主机的连接池（只在连接池创建前生效）。
+    池比并发小时，多出来的连接用完即被丢弃（urllib3 还会告警），同一 CDN 的后续请求又得重新握手。
+    """
+    global _HTTP_POOL_SIZE
+    with _HTTP_POOL_LOCK:
+        if _HTTP_POOL is None and not _PROXY_POOLS:
+            _HTTP_POOL_SIZE = max(HTTP_POOL_MAXSIZE, concurrency)
+
+def _proxy_for(url: str) -> Optional[str]:
+    """按环境/系统代理设置返回 url 应走的代理地址；未配置或命中 NO_PROXY 时返回 None（与 urlopen 的判断一致）。"""
+    global _HTTP_PROXIES
+    if _HTTP_PROXIES is None:
+        try:
+            _HTTP_PROXIES = getproxies()
+        except Exception:
+            _HTTP_PROXIES = {}
+    parts = urlparse(url)
+    proxy = _HTTP_PROXIES.get(parts.scheme.lower())
+    if not proxy:
+        return None
+    try:
+        if proxy_bypass(parts.hostname or ""):
+            return None
+    except Exception:
+        pass
+    return proxy
+
+def _pool_options() -> Dict:
+    return dict(
+        num_pools=HTTP_POOL_HOSTS,
+        maxsize=_HTTP_POOL_SIZE,
+        headers={"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER},
+        # 只跟随重定向，连接/读取失败交给 download_image 的重试循环（保留 --retry/--retry-delay 语义）
+        retries=urllib3.Retry(total=5, connect=0, read=0, status=0, redirect=5),
+    )
+
+def get_http_pool(url: str):
+    """
+    返回 url 该用的进程内共享 urllib3 连接池（懒创建），同一 CDN 的多张图片复用 keep-alive 连接。
+    配置了 HTTP(S)_PROXY 且 url 不在 NO_PROXY 内时返回对应代理的 ProxyManager。
+    未安装 urllib3，或代理不是 http(s)://（如 socks）时返回 None，download_image 退回 urllib.request。
+    """
+    global _HTTP_POOL
+    if urllib3 is None:
+        return None
+    proxy = _proxy_for(url)
+    with _HTTP_POOL_LOCK:
+        if proxy is None:
+            if _HTTP_POOL is None:
+                _HTTP_POOL = urllib3.PoolManager(**_pool_options())
+            return _HTTP_POOL
+        pool = _PROXY_POOLS.get(proxy)
+        if pool is None:
+            parts = urlparse(proxy)
+            if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+                return None
+            options = _pool_options()
+            proxy_url = proxy
+            if parts.username is not None:
+                # 代理地址里的账号密码改为 Proxy-Authorization 头
+                auth = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+                options["proxy_headers"] = urllib3.make_headers(proxy_basic_auth=auth)
+                proxy_url = f"{parts.scheme}://{parts.hostname}" + (f":{parts.port}" if parts.port else "")
+            try:
+                pool = urllib3.ProxyManager(proxy_url, **options)
+            except Exception:
+                return None
+            _PROXY_POOLS[proxy] = pool
+        return pool
+
+def _copy_response(resp, out) -> None:
+    """
+    把响应体写入已打开的文件 out（二进制）。
+    - 已知 Content-Length 且未压缩时先 posix_fallocate 预留空间（ext4/xfs 上得到连续区段）
+    - 用同一块缓冲区 readinto + memoryview 写出，不为每个数据块再分配 bytes
+    """
+    headers = resp.headers
+    try:
+        clen = 0 if headers.get("Content-Encoding") else int(headers.get("Content-Length") or 0)
+    except Exception:
+        clen = 0
+    if clen > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            out.flush()
+            os.posix_fallocate(out.fileno(), 0, clen)
+        except Exception:
+            pass
+    buf = bytearray(DOWNLOAD_CHUNK_SIZE)
+    view = memoryview(buf)
+    while True:
+        n = resp.readinto(buf)
+        if not n:
+            break
+        out.write(view[:n])
+    # 实际内容比 Content-Length 短时，截掉预留出的尾部空白
+    out.truncate()
+
+def _fetch_url(url: str, timeout: int, out) -> Tuple[str, str]:
+    """GET 一次 url，边收边写入文件对象 out，返回 (Content-Type, ETag)；HTTP 错误抛异常。重试由 download_image 负责。"""
+    pool = get_http_pool(url)
+    if pool is None:
+        req = Request(url, headers={"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER})
+        with urlopen(req, timeout=timeout) as resp:
+            _copy_response(resp, out)
+            return resp.headers.get("Content-Type", ""), resp.headers.get("ETag", "")
+    resp = pool.request("GET", url, timeout=timeout, preload_content=False)
+    try:
+        if resp.status >= 400:
+            raise OSError(f"HTTP Error {resp.status}: {resp.reason}")
+        _copy_response(resp, out)
+        return resp.headers.get("Content-Type", ""), resp.headers.get("ETag", "")
+    finally:
+        resp.release_conn()
+
+def _head_url(url: str, timeout: int) -> Optional[Dict[str, str]]:
+    """HEAD 一次 url，返回 {content_type, length, etag}；失败或服务器不支持 HEAD 时返回 None。"""
+    try:
+        pool = get_http_pool(url)
+        if pool is None:
+            req = Request(url, headers={"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER}, method="HEAD")
+            with urlopen(req, timeout=timeout) as resp:
+                headers = resp.headers
+        else:
+            resp = pool.request("HEAD", url, timeout=timeout, preload_content=False)
+            try:
+                if resp.status >= 400:
+                    return None
+                headers = resp.headers
+            finally:
+                resp.release_conn()
+        if headers.get("Content-Encoding"):
+            return None
+        return {
+            "content_type": headers.get("Content-Type", ""),
+            "length": headers.get("Content-Length", ""),
+            "etag": headers.get("ETag", ""),
+        }
+    except Exception:
+        return None
+
+def _still_unchanged(url: str, etag: str, timeout: int) -> bool:
+    """
+    带 If-None-Match 发一次条件 GET：服务器回 304 时返回 True（本地副本仍是最新）。
+    其它状态（200 即内容已变）或网络错误返回 False，不读正文，交给正常下载流程重新获取。
+    """
+    headers = {"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER, "If-None-Match": etag}
+    try:
+        pool = get_http_pool(url)
+        if pool is None:
+            with urlopen(Request(url, headers=headers), timeout=timeout):
+                return False
+        resp = pool.request("GET", url, headers=headers, timeout=timeout, preload_content=False, redirect=True)
+        try:
+            return resp.status == 304
+        finally:
+            # 200 的正文没读：关掉连接而不是放回池里
+            resp.close()
+            resp.release_conn()
+    except HTTPError as e:
+        return e.code == 304
+    except Exception:
+        return False
+
+def _remember_etag(path: Path, etag: str) -> None:
+    """把 ETag 记在文件的扩展属性上，供下次判断本地文件是否就是同一张远程图片；平台/文件系统不支持时忽略。"""
+    if not etag or not hasattr(os, "setxattr"):
+        return
+    try:
+        os.setxattr(str(path), ETAG_XATTR, etag.encode("utf-8"))
+    except Exception:
+        pass
+
+def _recalled_etag(path: Path) -> str:
+    if not hasattr(os, "getxattr"):
+        return ""
+    try:
+        return os.getxattr(str(path), ETAG_XATTR).decode("utf-8")
+    except Exception:
+        return ""
+
+def _matches_remote(path: Path, remote: Dict[str, str]) -> bool:
+    """
+    本地文件与 HEAD 结果一致：服务器给了 ETag 且与文件上记下的 ETag 相同，大小也等于 Content-Length。
+    只有大小相同不算：别处来的同名同大小图片会被误当成这张。
+    """
+    etag = remote.get("etag") or ""
+    if not etag or _recalled_etag(path) != etag:
+        return False
+    try:
+        size = int(remote.get("length") or 0)
+        return size > 0 and path.is_file() and path.stat().st_size == size
+    except Exception:
+        return False
+
+class _SharedDownload:
+    """
+    一次在途下载：内容先流式写入 spool 临时文件，所有等待同一 URL 的线程共用。
+    users 为尚未取走结果的线程数；最后一个取用者直接把 spool 改名为自己的目标文件，其余复制一份。
+    """
+
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        self.users = 1
+
+    def claim(self, spool: Path, final_path: Path) -> None:
+        with _INFLIGHT_LOCK:
+            last = self.users == 1
+            if last:
+                self.users = 0
+        if last:
+            try:
+                shutil.move(str(spool), str(final_path))
+            except Exception:
+                try:
+                    spool.unlink()
+                except Exception:
+                    pass
+                raise
+            return
+        try:
+            shutil.copyfile(spool, final_path)
+        finally:
+            with _INFLIGHT_LOCK:
+                self.users -= 1
+                done = self.users == 0
+            if done:
+                try:
+                    spool.unlink()
+                except Exception:
+                    pass
+
+    def release(self, spool: Path) -> None:
+        """取到结果却不再需要（如目标文件创建失败）时调用，保证 spool 最终被清理。"""
+        with _INFLIGHT_LOCK:
+            self.users -= 1
+            done = self.users == 0
+        if done:
+            try:
+                spool.unlink()
+            except Exception:
+                pass
+
+def _open_spool(spool_dir: Path) -> Tuple[int, Path]:
+    """
+    在 spool_dir 下独占创建 .mil-*.part 临时文件，返回 (fd, 路径)。
+    不用 tempfile.mkstemp：它固定以 0600 创建，spool 最终会被改名成图片本身，须和普通写文件一样按 umask 得到权限（通常 0644）。
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        path = spool_dir / f".mil-{os.urandom(6).hex()}.part"
+        try:
+            return os.open(str(path), flags, 0o666), path
+        except FileExistsError:
+            continue
+
+def _fetch_url_shared(url: str, timeout: int, spool_dir: Path) -> Tuple[_SharedDownload, Path, str, str]:
+    """
+    下载 url 到 spool_dir 下的临时文件，返回 (在途记录, spool 路径, Content-Type, ETag)。
+    同一 URL 同时只有一个线程真正联网，后到的线程直接复用其结果（或异常）；调用方须用 claim/release 取走 spool。
+    """
+    with _INFLIGHT_LOCK:
+        entry = _INFLIGHT.get(url)
+        owner = entry is None
+        if owner:
+            entry = _SharedDownload()
+            _INFLIGHT[url] = entry
+        else:
+            entry.users += 1
+    if owner:
+        spool: Optional[Path] = None
+        try:
+            fd, spool = _open_spool(spool_dir)
+            with os.fdopen(fd, "wb") as out:
+                content_type, etag = _fetch_url(url, timeout, out)
+        except BaseException as e:
+            if spool is not None:
+                try:
+                    spool.unlink()
+                except Exception:
+                    pass
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.pop(url, None)
+            entry.future.set_exception(e)
+        else:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.pop(url, None)
+            entry.future.set_result((spool, content_type, etag))
+    spool_path, content_type, etag = entry.future.result()
+    return entry, spool_path, content_type, etag
+
+
+class UrlDiskCache:
+    """
+    以 URL 为键的本地下载缓存（跨次运行复用）：index.json 记录 sha1(url) -> {size, content_type, etag, atime}，
+    图片内容存于 files/ 子目录。命中时先带 If-None-Match 向服务器确认（304 才复用本地副本，200 则重新下载），
+    本次运行已确认或刚下载的 URL 不再重复确认；服务器不给 ETag 的图片不入缓存。总量超过上限时按最近使用时间淘汰。
+    """
+
+    def __init__(self, root: Path = DISK_CACHE_DIR, max_bytes: int = DISK_CACHE_MAX_BYTES):
+        self.root = root
+        self.files_dir = root / "files"
+        self.index_path = root / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._index: Dict[str, Dict] = {}
+        self._fresh: set = set()  # 本次运行内已确认与服务器一致的键
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if isinstance(data, dict):
+                self._index = data
+        except Exception:
+            self._index = {}
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def is_fresh(self, url: str) -> bool:
+        """本次运行内已确认过的 URL：get 直接命中，不会再联网。"""
+        with self._lock:
+            return self._key(url) in self._fresh
+
+    def get(self, url: str, timeout: int) -> Optional[Tuple[Path, str]]:
+        """
+        命中返回 (缓存文件, Content-Type)。缓存文件丢失或大小与记录的 Content-Length 不符、
+        记录里没有 ETag、或服务器确认内容已变时视为未命中（后两种情况顺带移除记录）。
+        """
+        key = self._key(url)
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                return None
+            path = self.files_dir / key
+            try:
+                intact = path.stat().st_size == int(entry.get("size") or -1)
+            except (OSError, ValueError):
+                intact = False
+            etag = entry.get("etag") or ""
+            if not intact or not etag:
+                self._index.pop(key, None)
+                self._dirty = True
+                return None
+            fresh = key in self._fresh
+        if not fresh:
+            # 条件请求不持锁，其它线程的命中/写入不必排队等网络
+            if not _still_unchanged(url, etag, timeout):
+                return None
+        with self._lock:
+            if self._index.get(key) is not entry:
+                return None
+            self._fresh.add(key)
+            entry["atime"] = time.time()
+            self._dirty = True
+            return path, entry.get("content_type") or ""
+
+    def put(self, url: str, src: Path, content_type: str, etag: str) -> None:
+        """把已落盘的图片复制进缓存（先复制到临时文件再替换，读者不会看到半个文件）；没有 ETag 时无法再确认，不缓存。"""
+        if not etag:
+            return
+        key = self._key(url)
+        try:
+            ensure_dir(self.files_dir)
+            tmp = self.files_dir / f"{key}.tmp{threading.get_ident()}"
+            shutil.copyfile(src, tmp)
+            size = tmp.stat().st_size
+            os.replace(tmp, self.files_dir / key)
+        except Exception:
+            forget_dir(self.files_dir)
+            return
+        with self._lock:
+            self._index[key] = {"size": size, "content_type": content_type or "", "etag": etag, "atime": time.time()}
+            self._fresh.add(key)
+            self._dirty = True
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        total = sum(int(e.get("size") or 0) for e in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1].get("atime") or 0):
+            try:
+                (self.files_dir / key).unlink()
+            except Exception:
+                pass
+            total -= int(entry.get("size") or 0)
+            self._index.pop(key, None)
+            self._fresh.discard(key)
+            if total <= self.max_bytes:
+                break
+
+    def flush(self) -> None:
+        """把索引写回磁盘（先写临时文件再替换）；无变化时不写。"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self.root.mkdir(parents=True, exist_ok=True)
+                tmp = self.index_path.with_suffix(".json.tmp")
+                tmp.write_text(json.dumps(self._index, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self.index_path)
+                self._dirty = False
+            except Exception as e:
+                print(f"⚠️ 写入下载缓存索引失败：{e}")
+
+
+class DownloadedUrls:
+    """
+    本次运行内已下载的 url -> 本地文件，由 main 建一个交给所有 FileProcessor 共用：
+    其它文档（包括其它附件目录下的文档）再引用同一 URL 时从已下载的文件复制一份，不再联网。
+    与 UrlDiskCache 不同，不依赖 ETag，--no-cache 时同样生效；记录的文件已被删除或大小变化时视为未命中。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._paths: Dict[str, Tuple[Path, int]] = {}
+
+    def copy_to(self, url: str, dest_dir: Path, preferred_basename: Optional[str], ext_hint: Optional[str]) -> Optional[Path]:
+        """已下载过该 URL 且文件仍在时复制到 dest_dir 并返回新文件；否则返回 None（调用方照常下载）。"""
+        with self._lock:
+            known = self._paths.get(url)
+        if known is None:
+            return None
+        src, size = known
+        try:
+            if src.stat().st_size != size:
+                raise OSError("changed")
+            # 复制而非共用同一文件：后续按图意重命名（移动）某篇文档的图片时，不会弄断其它文档的引用
+            final_path = ensure_unique_path(dest_dir, _local_filename(url, "", preferred_basename, ext_hint or src.suffix or None))
+            shutil.copyfile(src, final_path)
+        except Exception:
+            with self._lock:
+                if self._paths.get(url) is known:
+                    self._paths.pop(url, None)
+            return None
+        _remember_etag(final_path, _recalled_etag(src))
+        return final_path
+
+    def put(self, url: str, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+        except Exception:
+            return
+        with self._lock:
+            self._paths[url] = (path, size)
+
+
+def _local_filename(url: str, content_type: str, preferred_basename: Optional[str], ext_hint: Optional[str]) -> str:
+    """按 URL / 扩展名提示 / Content-Type 决定落盘文件名（不含去重后缀）。"""
+    raw_name, ext_from_url = extract_filename_from_url(url)
+    ext = None
+    if ext_hint and ext_hint.startswith("."):
+        ext = ext_hint
+    elif ext_from_url:
+        ext = ext_from_url
+    else:
+        guessed = guess_ext_from_content_type(content_type)
+        if guessed:
+            ext = guessed
+    # 如果最终仍无扩展名，给个默认 .img
+    if not ext:
+        ext = ".img"
+
+    base = preferred_basename if preferred_basename else sanitize_filename(os.path.splitext(raw_name)[0])
+    base = base.strip(" .")
+    return f"{base}{ext}"
+
+
+def _find_existing_download(
+    url: str,
+    dest_dir: Path,
+    timeout: int,
+    preferred_basename: Optional[str],
+    ext_hint: Optional[str],
+) -> Optional[Path]:
+    """
+    dest_dir 里已有这张远程图片（之前的运行或其它文档下载过）时返回该文件，否则 None（调用方照常下载）。
+    判定依赖下载时记在扩展属性上的 ETag：平台不支持扩展属性（Windows/macOS）或文件上没有 ETag 时一律重新下载。
+    能从 URL/扩展名提示定出文件名且该文件不存在时不发 HEAD；需要 Content-Type 定扩展名时，
+    只有目录列表里已有同名（任意扩展名）文件才先 HEAD 再查，全新的无扩展名 URL 不多花一次往返。
+    """
+    name = _local_filename(url, "", preferred_basename, ext_hint)
+    remote: Optional[Dict[str, str]] = None
+    if not hasattr(os, "getxattr"):
+        return None
+    if name.endswith(".img"):
+        prefix = name[: -len(".img")] + "."
+        with _DIR_NAMES_LOCK:
+            names = [n for n in _dir_names_locked(dest_dir) if n.startswith(prefix)]
+        # 同名文件都不是本工具下载的（没记 ETag）时不可能命中，也不必 HEAD
+        if not any(_recalled_etag(dest_dir / n) for n in names):
+            return None
+        remote = _head_url(url, timeout)
+        if remote is None:
+            return None
+        name = _local_filename(url, remote["content_type"], preferred_basename, ext_hint)
+    candidate = dest_dir / name
+    if not candidate.is_file() or not _recalled_etag(candidate):
+        return None
+    if remote is None:
+        remote = _head_url(url, timeout)
+    if remote is None or not _matches_remote(candidate, remote):
+        return None
+    return candidate
+
+
 def download_image(
     url: str,
     dest_dir: Path,
@@ -163,55 +877,264 @@ def download_image(
     ext_hint: Optional[str] = None,
     retries: int = 2,
     retry_delay: float = 1.2,
+    cache: Optional[UrlDiskCache] = None,
+    log: Callable[[str], None] = print,
+    downloaded: Optional[DownloadedUrls] = None,
 ) -> Optional[Path]:
     """
     下载图片到 dest_dir，返回最终保存的 Path（唯一文件名）。失败返回 None。
+    重试/失败提示交给 log 输出（默认直接打印）。
     支持重试与退避；统一 UA/Accept 头；按 Content-Type 猜扩展。
+    传入 cache 时先查本地下载缓存，服务器确认未变（304）才从缓存复制；下载成功后写入缓存。
+    dest_dir 中已有本工具下载过的同名文件时先发 HEAD：ETag 与大小都一致才从该文件复制一份，不再下载正文
+    （仅 Linux 等支持扩展属性的平台；只有大小相同不作数）。
+    传入 downloaded 时本次运行内已下载过的 URL 直接从那份文件复制，不联网；成功后也记入 downloaded。
     """
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(dest_dir)
+    if downloaded is not None:
+        copied = downloaded.copy_to(url, dest_dir, preferred_basename, ext_hint)
+        if copied is not None:
+            return copied
+    if cache is not None:
+        hit = cache.get(url, timeout)
+        if hit is not None:
+            cached_path, content_type = hit
+            try:
+                final_path = ensure_unique_path(dest_dir, _local_filename(url, content_type, preferred_basename, ext_hint))
+                shutil.copyfile(cached_path, final_path)
+                if downloaded is not None:
+                    downloaded.put(url, final_path)
+                return final_path
+            except Exception:
+                pass
+    existing = _find_existing_download(url, dest_dir, timeout, preferred_basename, ext_hint)
+    if existing is not None:
+        # 复制而非共用同一文件：后续按图意重命名（移动）某篇文档的图片时，不会弄断其它文档的引用
+        try:
+            final_path = ensure_unique_path(dest_dir, existing.name)
+            shutil.copyfile(existing, final_path)
+            _remember_etag(final_path, _recalled_etag(existing))
+            if downloaded is not None:
+                downloaded.put(url, final_path)
+            return final_path
+        except Exception:
+            pass
     last_err: Optional[Exception] = None
     for attempt in range(retries + 1):
         try:
-            req = Request(url, headers={"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER})
-            with urlopen(req, timeout=timeout) as resp:
-                content = resp.read()
-                content_type = resp.headers.get("Content-Type", "")
-
-                # 文件名与扩展名处理
-                raw_name, ext_from_url = extract_filename_from_url(url)
-                ext = None
-                if ext_hint and ext_hint.startswith("."):
-                    ext = ext_hint
-                elif ext_from_url:
-                    ext = ext_from_url
-                else:
-                    guessed = guess_ext_from_content_type(content_type)
-                    if guessed:
-                        ext = guessed
-                # 如果最终仍无扩展名，给个默认 .img
-                if not ext:
-                    ext = ".img"
-
-                base = preferred_basename if preferred_basename else sanitize_filename(os.path.splitext(raw_name)[0])
-                base = base.strip(" .")
-                filename = f"{base}{ext}"
-                final_path = ensure_unique_path(dest_dir, filename)
-                final_path.write_bytes(content)
-                if attempt > 0:
-                    print(f"ℹ️ 重试成功：{url}")
-                return final_path
+            ensure_dir(dest_dir)
+            # 先流式写入临时文件，拿到 Content-Type 决定扩展名后再落到唯一文件名
+            entry, spool, content_type, etag = _fetch_url_shared(url, timeout, dest_dir)
+            try:
+                final_path = ensure_unique_path(dest_dir, _local_filename(url, content_type, preferred_basename, ext_hint))
+            except Exception:
+                entry.release(spool)
+                raise
+            entry.claim(spool, final_path)
+            _remember_etag(final_path, etag)
+            if cache is not None:
+                cache.put(url, final_path, content_type, etag)
+            if downloaded is not None:
+                downloaded.put(url, final_path)
+            if attempt > 0:
+                log(f"ℹ️ 重试成功：{url}")
+            return final_path
         except Exception as e:
             last_err = e
+            # 附件目录可能在运行中被删掉：下次尝试重新创建
+            forget_dir(dest_dir)
             if attempt < retries:
                 try:
                     time.sleep(retry_delay)
                 except Exception:
                     pass
             else:
-                print(f"❌ 下载失败：{url} -> {e}")
+                log(f"❌ 下载失败：{url} -> {e}")
     return None
 
 
+# 按并发数缓存的下载线程池：多个文件/多次调用复用同一批线程，不必每个文件重新起停
+_DOWNLOAD_EXECUTORS: Dict[int, ThreadPoolExecutor] = {}
+_DOWNLOAD_EXECUTORS_LOCK = threading.Lock()
+
+def _download_executor(workers: int) -> ThreadPoolExecutor:
+    workers = max(1, workers)
+    with _DOWNLOAD_EXECUTORS_LOCK:
+        pool = _DOWNLOAD_EXECUTORS.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mil-download")
+            _DOWNLOAD_EXECUTORS[workers] = pool
+        return pool
+
+_DNS_WARMED: Dict[str, float] = {}
+_DNS_WARMED_LOCK = threading.Lock()
+
+def _resolve_quietly(host: str, port: int) -> None:
+    try:
+        socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except Exception:
+        pass
+
+def warm_dns(urls: Iterable[str], workers: int = DOWNLOAD_WORKERS, cache: Optional[UrlDiskCache] = None) -> None:
+    """
+    在下载线程池里提前并发解析这批 URL 的主机名（不等待结果），让本机解析缓存先热起来，
+    逐张下载时不必在每个新主机上串行等 DNS。DNS_WARM_TTL 内解析过的主机跳过。
+    走代理的 URL 由代理解析，本机查询既多余又会泄露访问的主机；本次运行已确认过的缓存命中不会联网，同样跳过。
+    """
+    now = time.time()
+    targets: Dict[str, int] = {}
+    for url in urls:
+        if _proxy_for(url) is not None or (cache is not None and cache.is_fresh(url)):
+            continue
+        try:
+            parsed = urlparse(url)
+            host = parsed.hostname
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        except Exception:
+            continue
+        if host and host not in targets:
+            targets[host] = port
+    with _DNS_WARMED_LOCK:
+        fresh = [h for h in targets if now - _DNS_WARMED.get(h, 0.0) >= DNS_WARM_TTL]
+        for h in fresh:
+            _DNS_WARMED[h] = now
+    if not fresh:
+        return
+    pool = _download_executor(workers)
+    for h in fresh:
+        pool.submit(_resolve_quietly, h, targets[h])
+
+def newline_offsets(text: str) -> List[int]:
+    """返回 text 中全部换行符的下标（升序），配合 bisect 可 O(log n) 求任意偏移所在行号。"""
+    offsets: List[int] = []
+    pos = text.find("\n")
+    while pos != -1:
+        offsets.append(pos)
+        pos = text.find("\n", pos + 1)
+    return offsets
+
+
+def prefetch_images(
+    urls: Iterable[str],
+    dest_dir: Path,
+    timeout: int,
+    workers: int = DOWNLOAD_WORKERS,
+    retries: int = 2,
+    retry_delay: float = 1.2,
+    cache: Optional[UrlDiskCache] = None,
+    log: Callable[[str], None] = print,
+    downloaded: Optional[DownloadedUrls] = None,
+) -> Dict[str, Path]:
+    """
+    并发下载一批远程图片（按 URL 去重），返回 url -> 本地路径；失败的 URL 不在结果中。提示经 log 输出。
+    落盘文件名主干相同（不区分大小写）的 URL 归为一组串行下载，避免并发时 ensure_unique_path 撞名。
+    """
+    groups: Dict[str, List[str]] = {}
+    for url in dict.fromkeys(urls):
+        raw_name, _ = extract_filename_from_url(url)
+        stem = sanitize_filename(os.path.splitext(raw_name)[0]).strip(" .")
+        groups.setdefault(stem.lower(), []).append(url)
+    if not groups:
+        return {}
+
+    def fetch_group(group: List[str]) -> Dict[str, Path]:
+        saved: Dict[str, Path] = {}
+        for url in group:
+            _, ext_hint = extract_filename_from_url(url)
+            try:
+                path = download_image(
+                    url, dest_dir, timeout, ext_hint=ext_hint, retries=retries, retry_delay=retry_delay, cache=cache, log=log, downloaded=downloaded
+                )
+            except Exception as e:
+                log(f"⚠️ 下载异常：{url} -> {e}")
+                path = None
+            if path is not None:
+                saved[url] = path
+        return saved
+
+    result: Dict[str, Path] = {}
+    if len(groups) == 1:
+        # 只有一组时没有可并发的下载，直接在当前线程完成
+        result.update(fetch_group(next(iter(groups.values()))))
+        return result
+    for part in _download_executor(workers).map(fetch_group, groups.values()):
+        result.update(part)
+    return result
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def tokenize_keywords(s: str) -> Tuple[str, ...]:
+    """
+    提取上下文关键词（中英文），去重保序。结果按文本缓存，故返回不可变的元组。
+    """
+    if not s:
+        return ()
+    chinese = CJK_WORD_RE.findall(s)
+    english = EN_WORD_RE.findall(s)
+    tokens = chinese + english
+    seen = set()
+    unique = []
+    for t in tokens:
+        if t not in seen:
+            seen.add(t)
+            unique.append(t)
+    return tuple(unique)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def summarize_paragraph(text: str) -> str:
+    """
+    从段落文本中提取关键信息生成简洁描述。
+    - 先清理图片语法/标签与裸露的图片文件名，避免把“png/jpg”等噪声混入摘要
+    - 只依赖文本本身，按文本缓存：同一段落附近的多张图片不再重复清理与分句
+    """
+    if not text.strip():
+        return ""
+
+    # 1) 清理 HTML 标签与 Markdown/Obsidian 图片语法
+    try:
+        text2 = HTML_TAG_RE.sub("", text)
+    except Exception:
+        text2 = text
+    try:
+        text2 = MD_IMAGE_RE.sub("", text2)
+    except Exception:
+        pass
+    try:
+        text2 = WIKILINK_EMBED_RE.sub("", text2)
+    except Exception:
+        pass
+    # 2) 清理裸露的图片链接/文件名（*.png/jpg/...）
+    text2 = BARE_IMAGE_FILE_RE.sub("", text2)
+
+    # 3) 移除常见的文章标记和多余符号
+    text2 = ARTICLE_MARK_RE.sub('', text2)
+
+    # 4) 分句
+    sentences = SENTENCE_END_RE.split(text2)
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    if not sentences:
+        return ""
+
+    # 5) 优先选择包含关键生物学术语的句子
+    selected_sentences = []
+    for sentence in sentences:
+        if any(term in sentence for term in SUMMARY_KEY_TERMS):
+            selected_sentences.append(sentence)
+            if len(selected_sentences) >= 2:  # 最多选2句
+                break
+
+    if not selected_sentences:
+        selected_sentences = sentences[:2]
+
+    # 6) 合并并截断
+    summary = ' '.join(selected_sentences)
+    if len(summary) > 50:
+        summary = summary[:47] + "..."
+    return summary.strip()
+
+
 class FileProcessor:
     def __init__(
         self,
@@ -224,10 +1147,21 @@ class FileProcessor:
         max_name_len: int = 80,
         retry: int = 2,
         retry_delay: float = 1.2,
+        prefetched: Optional[Dict[str, Path]] = None,
+        workers: int = DOWNLOAD_WORKERS,
+        cache: Optional[UrlDiskCache] = None,
+        hardlink: bool = False,
+        log: Callable[[str], None] = print,
+        verbose: bool = True,
+        downloaded: Optional[DownloadedUrls] = None,
     ):
         self.md_path = md_path
         self.md_dir = md_path.parent
         self.attach_dir = self.md_dir / attach_dir_name
+        # 附件目录相对 md 所在目录的链接前缀，只算一次；附件目录内的文件直接拼接文件名
+        self._attach_rel = os.path.relpath(self.attach_dir, self.md_dir)
+        if os.sep == "\\":
+            self._attach_rel = self._attach_rel.replace("\\", "/")
         self.timeout = timeout
         self.dry_run = dry_run
         self.rename_images = rename_images
@@ -235,10 +1169,32 @@ class FileProcessor:
         self.max_name_len = max_name_len
         self.retry = retry
         self.retry_delay = retry_delay
+        self.workers = workers
+        self.cache = cache
+        # 多个文件共用的本次运行已下载 URL 表：其它文档已下载过的图片从本地复制，不再联网
+        self.downloaded = downloaded
+        # 处理过程中的提示（下载失败、重试、下载不完全等）；CLI 并发处理多个文件时传入收集函数，按文件统一输出
+        self.log = log
+        # 下载不完全时是否逐条列出剩余远程引用；关闭时只给计数（CLI 输出被重定向且未加 --verbose）
+        self.verbose = verbose
+        # 附件目录外的本地图片改为硬链接进附件目录（同一文件系统时不占额外空间），失败再复制
+        self.hardlink = hardlink
         # 相同 URL 在同一文件内重复出现时共用一次下载
         self.url_cache: Dict[str, Path] = {}
+        # 并发预下载已失败的 URL，替换阶段不再重复联网
+        self.failed_urls: set[str] = set()
+        # 调用方已预先下载好的 url -> 本地文件，处理时直接复用，仅改写链接
+        self.prefetched: Dict[str, Path] = dict(prefetched or {})
         # 处理时上下文
         self.current_text: str = ""
+        # current_text 的分行结果与各行起始偏移（按需构建，供段落上下文定位所在行）
+        self._lines_for: Optional[str] = None
+        self._lines: List[str] = []
+        self._line_starts: List[int] = []
+        # 行号 -> 段落上下文总结（同一行/同一文本只总结一次）
+        self._context_cache: Dict[int, str] = {}
+        # 规范化后的本地图片路径 -> stat 结果（不存在为 None），同一文件内同一路径只 stat 一次
+        self._local_stat_cache: Dict[str, Optional[os.stat_result]] = {}
         self.doc_title: Optional[str] = None
         self.image_seq: int = 0
         # 位置与命名状态（用于“上一图到当前图之间的文字”图意提取）
@@ -249,17 +1205,32 @@ class FileProcessor:
         # 监控数据
         self.remote_expected: int = 0
         self.remaining_remote: list[Dict] = []
+        # process() 写回文件时的新内容（未改动则为 None），调用方可直接复用，免去重新读取
+        self.written_text: Optional[str] = None
+
+    def _stat_local(self, src: str) -> Tuple[Optional[Path], Optional[os.stat_result]]:
+        """
+        把 src 规范化到 md 所在目录（纯字符串运算，不像 resolve() 那样逐级 readlink），返回 (路径, stat 结果)。
+        路径不存在时 stat 结果为 None；无法解析时两者皆为 None。
+        """
+        try:
+            norm = os.path.normpath(os.path.join(self.md_dir, src))
+        except Exception:
+            return None, None
+        if norm in self._local_stat_cache:
+            return Path(norm), self._local_stat_cache[norm]
+        try:
+            st: Optional[os.stat_result] = os.stat(norm)
+        except Exception:
+            st = None
+        self._local_stat_cache[norm] = st
+        return Path(norm), st
 
     def is_local_existing(self, src: str) -> bool:
         # 相对路径或绝对路径（位于库内）是否已存在
         if is_remote_url(src) or is_skippable_scheme(src):
             return False
-        # 规范化到文件所在目录
-        try:
-            candidate = (self.md_dir / Path(src)).resolve()
-        except Exception:
-            return False
-        return candidate.exists()
+        return self._stat_local(src)[1] is not None
 
     def url_to_local_rel(
         self,
@@ -304,6 +1275,8 @@ class FileProcessor:
                     ext = "." + ext
                 filename = f"{base}{ext}"
                 local_path = self.attach_dir / filename
+            elif url in self.failed_urls:
+                return url
             else:
                 # 实际下载，带重试与容错
                 try:
@@ -315,6 +1288,9 @@ class FileProcessor:
                         ext_hint=ext_hint,
                         retries=self.retry,
                         retry_delay=self.retry_delay,
+                        cache=self.cache,
+                        log=self.log,
+                        downloaded=self.downloaded,
                     )
                     if local_path_opt is None:
                         # 下载失败：返回原始 url（不改写，不纳入缓存/计数）
@@ -324,10 +1300,18 @@ class FileProcessor:
                     self.image_seq += 1
                     self.url_cache[url] = local_path
                 except Exception as e:
-                    print(f"⚠️ 下载异常：{url} -> {e}")
+                    self.log(f"⚠️ 下载异常：{url} -> {e}")
                     return url
 
-        rel = os.path.relpath(local_path, self.md_dir).replace("\\", "/")
+        return self._rel_to_md(local_path)
+
+    def _rel_to_md(self, path: Path) -> str:
+        """path 相对 md 所在目录的链接（posix 分隔）；附件目录内的文件不再走 os.path.relpath。"""
+        if path.parent == self.attach_dir:
+            return path.name if self._attach_rel == "." else f"{self._attach_rel}/{path.name}"
+        rel = os.path.relpath(path, self.md_dir)
+        if os.sep == "\\":
+            rel = rel.replace("\\", "/")
         return rel
 
     def relocate_or_rename_local(
@@ -345,12 +1329,9 @@ class FileProcessor:
         - 若已在 attachment 且文件名符合期望，则保持不变
         - dry-run 模式下仅返回预期路径，不实际变更
         """
-        # 解析本地路径
-        try:
-            src_path = (self.md_dir / Path(src)).resolve()
-        except Exception:
-            return src
-        if not src_path.exists():
+        # 解析本地路径（与 is_local_existing 共用同一次 stat）
+        src_path, st = self._stat_local(src)
+        if src_path is None or st is None:
             return src
 
         # 扩展名
@@ -381,26 +1362,37 @@ class FileProcessor:
 
         if self.dry_run:
             dest_path = dest_dir / filename
-            return os.path.relpath(dest_path, self.md_dir).replace("\\", "/")
+            return self._rel_to_md(dest_path)
 
         # 实际重命名/搬移
-        dest_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(dest_dir)
         dest_path = ensure_unique_path(dest_dir, filename)
 
         try:
             if src_path == dest_path:
                 pass
             elif src_path.parent == dest_dir:
-                src_path.rename(dest_path)
+                os.rename(src_path, dest_path)
+                self._local_stat_cache.pop(str(src_path), None)
             else:
-                # 若不在 attachment，则复制到 attachment（避免破坏外部原始资源）
-                dest_path.write_bytes(src_path.read_bytes())
+                # 若不在 attachment，则复制到 attachment（避免破坏外部原始资源）；
+                # shutil.copyfile 在 Linux 上走 sendfile/copy_file_range，数据不经过用户态
+                linked = False
+                if self.hardlink:
+                    try:
+                        os.link(src_path, dest_path)
+                        linked = True
+                    except OSError:
+                        pass
+                if not linked:
+                    shutil.copyfile(src_path, dest_path)
             self.image_seq += 1
         except Exception:
+            forget_dir(dest_dir)
             # 失败则返回原始相对路径
-            return os.path.relpath(src_path, self.md_dir).replace("\\", "/")
+            return self._rel_to_md(src_path)
 
-        return os.path.relpath(dest_path, self.md_dir).replace("\\", "/")
+        return self._rel_to_md(dest_path)
 
     def _extract_doc_title(self, text: str) -> str:
         """
@@ -410,12 +1402,12 @@ class FileProcessor:
         - 再否则用文件名（不含扩展名）
         """
         # YAML frontmatter
-        m = re.match(r"^---\s*(.*?)\s*---", text, flags=re.DOTALL)
+        m = FRONT_MATTER_RE.match(text)
         if m:
             fm = m.group(1)
             # 简单查找 parent/title 字段
-            for key in ["parent", "title", "Parent", "Title"]:
-                km = re.search(rf"^\s*{key}\s*:\s*(.+)$", fm, flags=re.MULTILINE)
+            for key_re in FRONT_MATTER_TITLE_RES:
+                km = key_re.search(fm)
                 if km:
                     candidate = km.group(1).strip().strip("'\"")
                     if candidate:
@@ -434,18 +1426,7 @@ class FileProcessor:
         """
         提取上下文关键词（中英文），去重保序。
         """
-        if not s:
-            return []
-        chinese = re.findall(r"[\u4e00-\u9fff]{2,}", s)
-        english = re.findall(r"[A-Za-z]{4,}", s)
-        tokens = chinese + english
-        seen = set()
-        unique = []
-        for t in tokens:
-            if t not in seen:
-                seen.add(t)
-                unique.append(t)
-        return unique
+        return list(tokenize_keywords(s))
 
     def _clean_title_fragment(self, s: Optional[str]) -> str:
         if not s:
@@ -473,12 +1454,14 @@ class FileProcessor:
         - simple/semantic：沿用 context 生成逻辑
         """
         idx = self.image_seq + 1  # 预估序号（下载后会自增）
-        doc_title = self.doc_title or self._extract_doc_title(self.current_text)
+        if not self.doc_title:
+            self.doc_title = self._extract_doc_title(self.current_text)
+        doc_title = self.doc_title
 
         def _strip_trailing_image_ext(s: str) -> str:
             if not s:
                 return s
-            s2 = re.sub(r"(?i)(?:[._\-\s])?(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)$", "", s)
+            s2 = TRAILING_IMAGE_EXT_RE.sub("", s)
             return s2.rstrip(" ._")
 
         if (self.rename_strategy or "").lower() == "seq":
@@ -493,7 +1476,7 @@ class FileProcessor:
         # 默认/其它策略：原“段落摘要 + 图意编号”
         context_desc = self._analyze_paragraph_context(match_pos)
         if context_desc:
-            clean_desc = re.sub(r'[^\w\u4e00-\u9fff]+', '_', context_desc).strip('_')
+            clean_desc = NON_WORD_RUN_RE.sub('_', context_desc).strip('_')
             base = f"{doc_title}_{clean_desc}_图意{idx}"
         else:
             base = f"{doc_title}_图意{idx}"
@@ -503,6 +1486,20 @@ class FileProcessor:
             base = base[: self.max_name_len].rstrip(" ._")
         return base
 
+    def _line_index(self) -> Tuple[List[str], List[int]]:
+        """current_text 的 splitlines() 结果与各行起始偏移，同一文本只计算一次。"""
+        if self._lines_for is not self.current_text:
+            lines = self.current_text.splitlines()
+            starts: List[int] = []
+            pos = 0
+            for line in lines:
+                starts.append(pos)
+                pos += len(line) + 1
+            self._lines, self._line_starts = lines, starts
+            self._context_cache = {}
+            self._lines_for = self.current_text
+        return self._lines, self._line_starts
+
     def _analyze_paragraph_context(self, match_pos: Optional[int]) -> str:
         """
         分析图片所在段落的上下文，返回简洁的段落内容总结。
@@ -510,21 +1507,23 @@ class FileProcessor:
         if match_pos is None or not self.current_text:
             return ""
 
-        lines = self.current_text.splitlines()
         if match_pos >= len(self.current_text):
             return ""
+        lines, starts = self._line_index()
 
-        # 找到图片所在的行
+        # 找到图片所在的行（各行起始偏移按 “行长 + 1” 累计，二分定位）
         current_line_idx = 0
-        current_pos = 0
-        for i, line in enumerate(lines):
-            if current_pos <= match_pos < current_pos + len(line) + 1:  # +1 for newline
-                current_line_idx = i
-                break
-            current_pos += len(line) + 1
-
-        # 向上查找最近的非空段落（跳过标题行）
+        i = bisect.bisect_right(starts, match_pos) - 1
+        if 0 <= i < len(lines) and match_pos < starts[i] + len(lines[i]) + 1:  # +1 for newline
+            current_line_idx = i
+        # 结果只取决于所在行，同一行的多张图片直接复用
+        cached = self._context_cache.get(current_line_idx)
+        if cached is not None:
+            return cached
+
+        # 向上查找最近的非空段落（跳过标题行）；逆序收集后再翻转，字符数用累加值而非每次重新求和
         paragraph_lines = []
+        total_len = 0
         for i in range(current_line_idx, -1, -1):
             line = lines[i].strip()
             if not line:
@@ -538,11 +1537,13 @@ class FileProcessor:
                     continue
                 break
 
-            paragraph_lines.insert(0, line)
+            paragraph_lines.append(line)
+            total_len += len(line)
 
             # 如果找到足够的内容（超过100字符），停止
-            if sum(len(l) for l in paragraph_lines) > 100:
+            if total_len > 100:
                 break
+        paragraph_lines.reverse()
 
         # 向下查找补充内容
         for i in range(current_line_idx + 1, len(lines)):
@@ -554,68 +1555,24 @@ class FileProcessor:
                 break
 
             paragraph_lines.append(line)
+            total_len += len(line)
 
-            if sum(len(l) for l in paragraph_lines) > 200:
+            if total_len > 200:
                 break
 
         # 合并段落内容
         paragraph_text = ' '.join(paragraph_lines)
 
         # 提取关键词并生成简洁描述
-        return self._summarize_paragraph(paragraph_text)
+        summary = self._summarize_paragraph(paragraph_text)
+        self._context_cache[current_line_idx] = summary
+        return summary
 
     def _summarize_paragraph(self, text: str) -> str:
         """
-        从段落文本中提取关键信息生成简洁描述。
-        - 先清理图片语法/标签与裸露的图片文件名，避免把“png/jpg”等噪声混入摘要
+        从段落文本中提取关键信息生成简洁描述（见 summarize_paragraph）。
         """
-        if not text.strip():
-            return ""
-
-        # 1) 清理 HTML 标签与 Markdown/Obsidian 图片语法
-        try:
-            text2 = re.sub(r"<[^>]+>", "", text)
-        except Exception:
-            text2 = text
-        try:
-            text2 = MD_IMAGE_RE.sub("", text2)
-        except Exception:
-            pass
-        try:
-            text2 = WIKILINK_EMBED_RE.sub("", text2)
-        except Exception:
-            pass
-        # 2) 清理裸露的图片链接/文件名（*.png/jpg/...）
-        text2 = re.sub(r"(?i)\b\S+\.(?:png|jpe?g|gif|webp|bmp|svg|tiff?|ico|heic)\b", "", text2)
-
-        # 3) 移除常见的文章标记和多余符号
-        text2 = re.sub(r'[『』「」【】《》()（）\*\-\+\=\[\]{}|\\]', '', text2)
-
-        # 4) 分句
-        sentences = re.split(r'[。！？；]', text2)
-        sentences = [s.strip() for s in sentences if s.strip()]
-
-        if not sentences:
-            return ""
-
-        # 5) 优先选择包含关键生物学术语的句子
-        key_terms = ['双壳纲', '船蛆', '巨型船蛆', '足丝', '鳃', '壳', '钻木', '习性', '外观', '结构', '照片', '示意图']
-
-        selected_sentences = []
-        for sentence in sentences:
-            if any(term in sentence for term in key_terms):
-                selected_sentences.append(sentence)
-                if len(selected_sentences) >= 2:  # 最多选2句
-                    break
-
-        if not selected_sentences:
-            selected_sentences = sentences[:2]
-
-        # 6) 合并并截断
-        summary = ' '.join(selected_sentences)
-        if len(summary) > 50:
-            summary = summary[:47] + "..."
-        return summary.strip()
+        return summarize_paragraph(text)
 
     def _derive_intent_between(self, prev_pos: int, curr_pos: int) -> str:
         """
@@ -629,9 +1586,9 @@ class FileProcessor:
             raw = self.current_text[prev_pos:curr_pos]
         except Exception:
             return ""
-        snippet = re.sub(r"\s+", " ", raw).strip()
+        snippet = WHITESPACE_RE.sub(" ", raw).strip()
         # 至少包含若干可见字符（中文/英文/数字）
-        visible_chars = re.findall(r"[\u4e00-\u9fffA-Za-z0-9]", snippet)
+        visible_chars = VISIBLE_CHAR_RE.findall(snippet)
         if len(visible_chars) < 4:
             return ""
         return self._summarize_paragraph(snippet)
@@ -647,7 +1604,7 @@ class FileProcessor:
         curr = match_pos or 0
         intent = self._derive_intent_between(self.last_image_pos, curr)
         if intent:
-            clean_intent = re.sub(r'[^\w\u4e00-\u9fff]+', '_', intent).strip('_')
+            clean_intent = NON_WORD_RUN_RE.sub('_', intent).strip('_')
             if self.last_intent != clean_intent:
                 self.block_index += 1
                 self.block_image_index = 1
@@ -678,16 +1635,16 @@ class FileProcessor:
             return m.group(0)
 
         # 从 trailing 中尝试提取 "title"
-        title_match = re.search(r'(".*?"|\'.*?\')', trailing or "")
+        title_match = QUOTED_TITLE_RE.search(trailing or "")
         title = None
         if title_match:
             title = title_match.group(0)
 
         def _clean_alt(a: Optional[str]) -> str:
             alt_raw = a or ""
-            alt_clean = re.sub(r"<[^>]+>", "", alt_raw)
+            alt_clean = HTML_TAG_RE.sub("", alt_raw)
             alt_clean = alt_clean.replace("|", " ").strip()
-            alt_clean = re.sub(r"\s+", " ", alt_clean).strip()
+            alt_clean = WHITESPACE_RE.sub(" ", alt_clean).strip()
             return alt_clean
 
         def _title_trailing(t: Optional[str]) -> str:
@@ -721,7 +1678,7 @@ class FileProcessor:
 
         full_tag = f"{head}{src}{tail}"
         alt_attr = None
-        alt_m = re.search(r'\balt=["\']([^"\']+)["\']', full_tag, flags=re.IGNORECASE)
+        alt_m = ALT_ATTR_RE.search(full_tag)
         if alt_m:
             alt_attr = alt_m.group(1)
 
@@ -776,46 +1733,73 @@ class FileProcessor:
                 return f"![[{new_rel}|{alias}]]" if alias else f"![[{new_rel}]]"
             return m.group(0)
 
+    def replace_ref_def(self, m: re.Match) -> str:
+        key = m.group(1)
+        url = m.group(2)
+        title = m.group(3) or ""
+        if url and is_remote_url(url) and not is_skippable_scheme(url):
+            new_rel = self.url_to_local_rel(url)
+            return f"[{key}]: {new_rel}{(' ' + title) if title else ''}"
+        return m.group(0)
+
     def replace_ref_defs(self, text: str) -> str:
         """
         处理引用式图片/链接定义，把远程 URL 下载到本地并改写为本地路径。
         """
-        def _rep(m: re.Match) -> str:
-            key = m.group(1)
+        return REF_DEF_RE.sub(self.replace_ref_def, text)
+
+    @staticmethod
+    def scan_image_tokens(text: str) -> List[Tuple[str, re.Match]]:
+        """
+        一次扫描找出全部图片引用，按文档顺序返回 (类别, 匹配)；类别为 ref/md/html/embed。
+        匹配对象由该类别原有的正则在同一区间重新匹配得到，分组编号与各 replace_* 方法一致，位置为全文偏移。
+        """
+        tokens: List[Tuple[str, re.Match]] = []
+        for m in IMAGE_TOKEN_RE.finditer(text):
+            # 不依赖 lastgroup：RE2 的匹配对象未必提供
+            kind = next((k for k, g in IMAGE_TOKEN_GROUPS.items() if m.start(g) >= 0), None)
+            if kind is None:
+                continue
+            sub = IMAGE_TOKEN_KINDS[kind].fullmatch(text, m.start(), m.end())
+            if sub is not None:
+                tokens.append((kind, sub))
+        return tokens
+
+    @staticmethod
+    def remote_target(kind: str, m: re.Match) -> Optional[str]:
+        """返回该引用指向的远程 URL（需下载的）；本地路径或可跳过的协议返回 None。"""
+        if kind == "md":
+            url, _ = split_md_target(m.group(2))
+        elif kind == "embed":
+            url = m.group(1).strip().split("|", 1)[0].strip()
+        else:
             url = m.group(2)
-            title = m.group(3) or ""
-            if url and is_remote_url(url) and not is_skippable_scheme(url):
-                new_rel = self.url_to_local_rel(url)
-                return f"[{key}]: {new_rel}{(' ' + title) if title else ''}"
-            return m.group(0)
-        return REF_DEF_RE.sub(_rep, text)
+        if url and is_remote_url(url) and not is_skippable_scheme(url):
+            return url
+        return None
 
     def process(self) -> Tuple[int, int, int]:
         """
         处理单个 md 文件，返回 (下载数, 替换数, 引用式定义替换数)
         """
-        original = read_text_with_fallback(self.md_path)
-        text = original
-
-        # 统计预期远程图片数量（用于二次校验）
+        data = self.md_path.read_bytes()
+        if not may_contain_images(data):
+            # 没有任何图片标记：无需解码、扫描与写回
+            return 0, 0, 0
+        original = decode_text_with_fallback(data)
+
+        # 一次扫描得到全部图片引用；统计预期远程图片数量（用于二次校验），顺带收集全部远程 URL 供并发预下载
+        tokens = self.scan_image_tokens(original)
         remote_expected = 0
+        remote_urls: List[str] = []
         try:
-            # Markdown 内联
-            for m in MD_IMAGE_RE.finditer(original):
-                url, _ = split_md_target(m.group(2))
-                if url and is_remote_url(url) and not is_skippable_scheme(url):
-                    remote_expected += 1
-            # HTML <img>
-            for m in HTML_IMG_RE.finditer(original):
-                src = m.group(2)
-                if src and is_remote_url(src) and not is_skippable_scheme(src):
-                    remote_expected += 1
-            # Obsidian 嵌入
-            for m in WIKILINK_EMBED_RE.finditer(original):
-                inside = m.group(1).strip()
-                tgt = inside.split("|", 1)[0].strip()
-                if tgt and is_remote_url(tgt) and not is_skippable_scheme(tgt):
-                    remote_expected += 1
+            for kind, m in tokens:
+                url = self.remote_target(kind, m)
+                if url:
+                    remote_urls.append(url)
+                    # 引用式定义不计入预期数，与替换阶段一致
+                    if kind != "ref":
+                        remote_expected += 1
         except Exception:
             remote_expected = 0
         # 记录到实例，便于二次校验与报告
@@ -831,26 +1815,57 @@ class FileProcessor:
         self.block_index = 0
         self.block_image_index = 0
         self.url_cache.clear()
-
-        # 先处理引用式定义
-        before = text
-        text = self.replace_ref_defs(text)
-        ref_repl = 0 if text == before else len(list(REF_DEF_RE.finditer(before)))  # 近似
-
-        # 处理 Markdown 内联
-        before = text
-        text = MD_IMAGE_RE.sub(self.replace_md_inline, text)
-        inline_repl = 0 if text == before else 1  # 统计粗略为是否发生变化
-
-        # 处理 HTML <img>
-        before = text
-        text = HTML_IMG_RE.sub(self.replace_html_img, text)
-        html_repl = 0 if text == before else 1
-
-        # 处理 Obsidian 嵌入
-        before = text
-        text = WIKILINK_EMBED_RE.sub(self.replace_wikilink_embed, text)
-        embed_repl = 0 if text == before else 1
+        self.failed_urls.clear()
+        self._local_stat_cache.clear()
+        if not self.dry_run:
+            self.url_cache.update(self.prefetched)
+            # 不按上下文重命名时文件名只取决于 URL，可先并发下载好，替换阶段命中缓存、不再逐张联网
+            pending = [u for u in remote_urls if u not in self.url_cache]
+            if pending:
+                warm_dns(pending, self.workers, self.cache)
+            if pending and not self.rename_images and self.workers > 1:
+                try:
+                    fetched = prefetch_images(
+                        pending,
+                        self.attach_dir,
+                        self.timeout,
+                        self.workers,
+                        self.retry,
+                        self.retry_delay,
+                        cache=self.cache,
+                        log=self.log,
+                        downloaded=self.downloaded,
+                    )
+                    self.url_cache.update(fetched)
+                    self.failed_urls.update(u for u in pending if u not in fetched)
+                except Exception as e:
+                    self.log(f"⚠️ 并发下载失败，改为逐张下载：{e}")
+
+        # 按文档顺序逐个替换，以原文切片 + 新片段拼出结果
+        handlers = {
+            "ref": self.replace_ref_def,
+            "md": self.replace_md_inline,
+            "html": self.replace_html_img,
+            "embed": self.replace_wikilink_embed,
+        }
+        changed = {kind: False for kind in handlers}
+        parts: List[str] = []
+        cursor = 0
+        for kind, m in tokens:
+            new_seg = handlers[kind](m)
+            if new_seg != m.group(0):
+                changed[kind] = True
+            parts.append(original[cursor:m.start()])
+            parts.append(new_seg)
+            cursor = m.end()
+        parts.append(original[cursor:])
+        text = "".join(parts)
+
+        # 统计粗略为各类是否发生变化；引用式定义有变化时按定义总数计（近似）
+        ref_repl = sum(1 for kind, _ in tokens if kind == "ref") if changed["ref"] else 0
+        inline_repl = 1 if changed["md"] else 0
+        html_repl = 1 if changed["html"] else 0
+        embed_repl = 1 if changed["embed"] else 0
 
         # 下载总数 = 实际缓存的远程 url 个数（dry-run 为 0）
         download_count = 0 if self.dry_run else len(self.url_cache)
@@ -858,22 +1873,14 @@ class FileProcessor:
         # 扫描剩余远程引用（行号/类型/URL），用于核验报告
         remaining: list[Dict] = []
         try:
-            # MD 内联
-            for m in MD_IMAGE_RE.finditer(text):
-                url, _ = split_md_target(m.group(2))
-                if url and is_remote_url(url) and not is_skippable_scheme(url):
-                    remaining.append({"kind": "md", "url": url, "line": text[:m.start()].count("\n") + 1})
-            # HTML <img>
-            for m in HTML_IMG_RE.finditer(text):
-                src = m.group(2)
-                if src and is_remote_url(src) and not is_skippable_scheme(src):
-                    remaining.append({"kind": "html", "url": src, "line": text[:m.start()].count("\n") + 1})
-            # Obsidian 嵌入
-            for m in WIKILINK_EMBED_RE.finditer(text):
-                inside = m.group(1).strip()
-                tgt = inside.split("|", 1)[0].strip()
-                if tgt and is_remote_url(tgt) and not is_skippable_scheme(tgt):
-                    remaining.append({"kind": "wikilink", "url": tgt, "line": text[:m.start()].count("\n") + 1})
+            kind_names = {"md": "md", "html": "html", "embed": "wikilink"}
+            newlines = newline_offsets(text)
+            for kind, m in self.scan_image_tokens(text):
+                if kind == "ref":
+                    continue
+                url = self.remote_target(kind, m)
+                if url:
+                    remaining.append({"kind": kind_names[kind], "url": url, "line": bisect.bisect_left(newlines, m.start()) + 1})
         except Exception:
             remaining = []
         self.remaining_remote = remaining
@@ -881,36 +1888,105 @@ class FileProcessor:
         # 二次校验与提示（仅在非 dry-run 下）
         if not self.dry_run and self.remote_expected > 0 and download_count < self.remote_expected:
             try:
-                print(f"⚠️ 远程图片下载不完全：预期 {self.remote_expected}，实际下载 {download_count}。剩余远程 {len(self.remaining_remote)} 处。")
-                for r in self.remaining_remote[:10]:
-                    print(f"   • [{r['kind']}] line {r['line']}: {r['url']}")
-                if len(self.remaining_remote) > 10:
-                    print(f"   • 其余 {len(self.remaining_remote) - 10} 处已省略…")
+                # 整段拼好后一次输出：少几次写调用，--jobs 并发时各文件的提示也不会互相穿插
+                lines = [f"⚠️ 远程图片下载不完全：预期 {self.remote_expected}，实际下载 {download_count}。剩余远程 {len(self.remaining_remote)} 处。"]
+                if self.verbose:
+                    lines.extend(f"   • [{r['kind']}] line {r['line']}: {r['url']}" for r in self.remaining_remote[:10])
+                    if len(self.remaining_remote) > 10:
+                        lines.append(f"   • 其余 {len(self.remaining_remote) - 10} 处已省略…")
+                self.log("\n".join(lines))
             except Exception:
                 pass
 
         # 如内容变化则写回
         if text != original and not self.dry_run:
             write_text_utf8(self.md_path, text)
+            self.written_text = text
 
         replace_total = (inline_repl + html_repl + embed_repl)
         return download_count, replace_total, ref_repl
 
 
-def find_md_files(target: Path, recursive: bool) -> list[Path]:
-    results: list[Path] = []
-    if target.is_file() and target.suffix.lower() == ".md":
+def _walk_md(root: str, recursive: bool, skip_hidden: bool = False, follow_symlinks: bool = False) -> Iterable[os.DirEntry]:
+    """
+    用 os.scandir 遍历 root 下的 .md 文件（显式栈，不递归调用）；DirEntry 自带类型信息，普通文件不必再 stat。
+    默认与 Path.rglob 一致：进入以 . 开头的目录，不进入指向目录的符号链接。
+    skip_hidden 时跳过以 . 开头的目录（.obsidian、.trash、.git 等）；
+    follow_symlinks 时也进入符号链接目录，按 (st_dev, st_ino) 记录已进入的目录，链接绕回时不会死循环。
+    """
+    visited: set = set()
+    if follow_symlinks:
+        try:
+            st = os.stat(root)
+            visited.add((st.st_dev, st.st_ino))
+        except OSError:
+            pass
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if not recursive or (skip_hidden and entry.name.startswith(".")):
+                        continue
+                    if follow_symlinks:
+                        st = entry.stat()
+                        key = (st.st_dev, st.st_ino)
+                        if key in visited:
+                            continue
+                        visited.add(key)
+                    stack.append(entry.path)
+                elif os.path.normcase(entry.name).endswith(".md") and entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+
+
+def find_md_files(
+    target: Path,
+    recursive: bool,
+    sort: Optional[str] = "name",
+    skip_hidden: bool = False,
+    follow_symlinks: bool = False,
+) -> list[Path]:
+    """
+    列出 target（单个 .md 或目录）下要处理的 Markdown 文件。
+    sort="name" 按路径排序；"mtime" 按修改时间从新到旧（取自 DirEntry 缓存的 stat，不再逐个 stat 路径）；
+    None 时保持目录遍历的原始顺序，省去超大目录树上的排序。
+    符号链接文件解析到真实路径后可能与已列出的文件相同，只保留第一次出现的。
+    skip_hidden / follow_symlinks 见 _walk_md。
+    """
+    if target.name.lower().endswith(".md") and target.is_file():
         return [target.resolve()]
-    if target.is_dir():
-        if recursive:
-            for p in target.rglob("*.md"):
-                if p.is_file():
-                    results.append(p.resolve())
-        else:
-            for p in target.glob("*.md"):
-                if p.is_file():
-                    results.append(p.resolve())
-    return sorted(results)
+    if not target.is_dir():
+        return []
+    root = str(target.resolve())
+    results: list[Path] = []
+    mtimes: list[int] = []
+    seen: set = set()
+    for entry in _walk_md(root, recursive, skip_hidden, follow_symlinks):
+        # 目录已整体解析过；只有符号链接文件（跟随目录链接时则是全部文件）还需解析到真实路径
+        path = Path(entry.path).resolve() if (follow_symlinks or entry.is_symlink()) else Path(entry.path)
+        if path in seen:
+            continue
+        seen.add(path)
+        results.append(path)
+        if sort == "mtime":
+            try:
+                mtimes.append(entry.stat().st_mtime_ns)
+            except OSError:
+                mtimes.append(0)
+    if sort == "mtime":
+        order = sorted(range(len(results)), key=lambda i: (-mtimes[i], results[i]))
+        return [results[i] for i in order]
+    if sort:
+        results.sort()
+    return results
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
@@ -919,15 +1995,26 @@ def build_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument("path", type=Path, help="Path to a Markdown file or a folder containing Markdown files")
     parser.add_argument("-r", "--recursive", action="store_true", help="Recursively process subfolders when 'path' is a folder")
+    parser.add_argument("--skip-hidden-dirs", action="store_true", help="With -r, skip folders whose name starts with '.' (.obsidian, .trash, .git)")
+    parser.add_argument("--follow-symlinks", action="store_true", help="With -r, also descend into symlinked folders (each real folder is visited once)")
+    parser.add_argument("--sort", choices=["name", "mtime", "none"], default="name", help="Processing order: by path, most recently modified first, or file-system order without sorting (faster start on very large trees)")
     parser.add_argument("--attach-dir-name", default=ATTACH_DIR_NAME_DEFAULT, help="Attachment folder name to create next to each Markdown file")
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="HTTP timeout (seconds) when downloading images")
     parser.add_argument("--dry-run", action="store_true", help="Preview changes without downloading or modifying files")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List each remaining remote reference even when output is not a terminal")
     parser.add_argument("--rename-images", action="store_true", help="Rename downloaded images using document title and nearby context")
     parser.add_argument("--rename-strategy", choices=["simple", "context", "semantic", "seq"], default="seq", help="Strategy when renaming images (seq: 标题+两位全局编号，如 {title}_{index:02d})")
     parser.add_argument("--max-name-len", type=int, default=80, help="Maximum base filename length when renaming images")
     parser.add_argument("--retry", type=int, default=2, help="Retry count for image downloads")
     parser.add_argument("--retry-delay", type=float, default=1.2, help="Delay (seconds) between retries")
+    parser.add_argument("--cache-dir", type=Path, default=DISK_CACHE_DIR, help="Directory of the persistent download cache shared across runs")
+    parser.add_argument("--no-cache", action="store_true", help="Always download from the network instead of reusing cached images")
+    parser.add_argument("--jobs", type=int, default=FILE_JOBS, help="Markdown files processed concurrently; files sharing an attachment folder still run one at a time (1 = sequential)")
+    parser.add_argument("--hardlink", action="store_true", help="Hard-link local images from outside the attachment folder instead of copying them (falls back to copying across file systems)")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="Concurrent image downloads per Markdown file (1 = sequential)")
     parser.add_argument("--report", type=Path, default=None, help="Write an aggregated JSON report of processing results")
+    parser.add_argument("--pretty-report", action="store_true", help="Indent the JSON report for reading (default: compact)")
+    parser.add_argument("--report-format", choices=["array", "ndjson"], default="array", help="'array' writes one JSON list at the end; 'ndjson' appends one JSON object per line as each file finishes")
     return parser
 
 def main() -> None:
@@ -944,7 +2031,13 @@ def main() -> None:
         print(f"❌ Path not found: {target}")
         sys.exit(1)
 
-    md_files = find_md_files(target, args.recursive)
+    md_files = find_md_files(
+        target,
+        args.recursive,
+        sort=None if args.sort == "none" else args.sort,
+        skip_hidden=args.skip_hidden_dirs,
+        follow_symlinks=args.follow_symlinks,
+    )
     if not md_files:
         print("⚠️ No Markdown files found to process.")
         sys.exit(0)
@@ -954,9 +2047,33 @@ def main() -> None:
     total_ref = 0
     processed = 0
 
-    print(f"🔍 Found {len(md_files)} Markdown file(s). {'[dry-run]' if args.dry_run else ''}")
-    reports: list[Dict] = []
-    for md in md_files:
+    print(f"🔍 Found {len(md_files)} Markdown file(s). {'[dry-run]' if args.dry_run else ''}{' [file-system order]' if args.sort == 'none' else (' [newest first]' if args.sort == 'mtime' else '')}")
+    # 按 md_files 的位置存放（并发时各组完成先后不一，报告仍保持文件列表顺序）；出错的文件留空
+    reports: list[Optional[tuple]] = [None] * len(md_files)
+    # 运行期间工作目录不变，只取一次，逐文件显示相对路径时不再各调一次 getcwd
+    cwd = os.getcwd()
+    # 输出被重定向（日志/CI）时默认只给剩余远程引用的计数，逐条明细在 --report 中；终端或 --verbose 下照常列出
+    list_remaining = args.verbose or sys.stdout.isatty()
+    report_path: Optional[Path] = None
+    ndjson_out = None
+    if args.report and not args.dry_run:
+        try:
+            report_path = args.report.expanduser().resolve()
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            if args.report_format == "ndjson":
+                ndjson_out = open(report_path, "w", encoding="utf-8", buffering=1)  # 行缓冲：每条记录写完即落盘
+        except Exception as e:
+            print(f"⚠️ Failed to write report: {e}")
+            report_path = None
+    cache = None if (args.no_cache or args.dry_run) else UrlDiskCache(args.cache_dir.expanduser())
+    # 本次运行内已下载的 URL：其它文档（含其它附件目录）再引用时本地复制，--no-cache 时同样生效
+    downloaded = None if args.dry_run else DownloadedUrls()
+    # 所有文件共用一个连接池：预下载线程 + 各文件线程里的逐张下载，都可能同时连到同一主机
+    size_http_pool(args.workers + args.jobs)
+
+    def process_one(md: Path):
+        # 处理期间的提示先收集起来，由 report 跟在该文件的摘要行后输出：--jobs 并发时也能看出属于哪个文件
+        messages: List[str] = []
         try:
             processor = FileProcessor(
                 md,
@@ -968,36 +2085,105 @@ def main() -> None:
                 args.max_name_len,
                 retry=args.retry,
                 retry_delay=args.retry_delay,
+                workers=args.workers,
+                hardlink=args.hardlink,
+                cache=cache,
+                log=messages.append,
+                verbose=list_remaining,
+                downloaded=downloaded,
             )
-            dl, repl, ref = processor.process()
-            processed += 1
-            total_would_dl += len(processor.url_cache)
-            total_repl += repl
-            total_ref += ref
-            rel_md = os.path.relpath(md, Path.cwd())
-            if args.dry_run:
-                print(f"  • {rel_md} -> would download {len(processor.url_cache)} image(s), replace {repl} block(s), update {ref} reference(s)")
-            else:
-                print(f"  • {rel_md} -> downloaded {dl} image(s), replaced {repl} block(s), updated {ref} reference(s)")
-                # 智能核验：剩余远程引用逐条列出（最多 10 条）
-                if getattr(processor, "remaining_remote", []):
-                    print(f"    Remaining remote refs ({len(processor.remaining_remote)}):")
-                    for r in processor.remaining_remote[:10]:
-                        print(f"      - [{r.get('kind')}] line {r.get('line')}: {r.get('url')}")
-                    if len(processor.remaining_remote) > 10:
-                        print(f"      - ... {len(processor.remaining_remote) - 10} more")
-            # 汇总报告
-            reports.append({
-                "md": str(md),
-                "downloaded": dl,
-                "replaced_blocks": repl,
-                "updated_ref_defs": ref,
-                "remote_expected": getattr(processor, "remote_expected", 0),
-                "remaining_remote_count": len(getattr(processor, "remaining_remote", [])),
-                "remaining_remote": getattr(processor, "remaining_remote", []),
-            })
+            return md, processor, processor.process(), messages
         except Exception as e:
-            print(f"  • {md} -> Error: {e}")
+            return md, None, e, messages
+
+    def report(slot: int, md: Path, processor: Optional[FileProcessor], outcome, messages: List[str]) -> None:
+        nonlocal processed, total_would_dl, total_repl, total_ref
+        notes = [f"    {line}" for msg in messages for line in msg.splitlines()]
+        if processor is None:
+            print("\n".join([f"  • {md} -> Error: {outcome}"] + notes))
+            return
+        dl, repl, ref = outcome
+        processed += 1
+        total_would_dl += len(processor.url_cache)
+        total_repl += repl
+        total_ref += ref
+        rel_md = os.path.relpath(md, cwd)
+        if args.dry_run:
+            print("\n".join([f"  • {rel_md} -> would download {len(processor.url_cache)} image(s), replace {repl} block(s), update {ref} reference(s)"] + notes))
+        else:
+            lines = [f"  • {rel_md} -> downloaded {dl} image(s), replaced {repl} block(s), updated {ref} reference(s)"]
+            lines.extend(notes)
+            # 智能核验：剩余远程引用逐条列出（最多 10 条），与摘要行一起一次输出
+            if getattr(processor, "remaining_remote", []):
+                if not list_remaining:
+                    lines.append(f"    Remaining remote refs: {len(processor.remaining_remote)} (use --verbose or --report for details)")
+                else:
+                    lines.append(f"    Remaining remote refs ({len(processor.remaining_remote)}):")
+                    lines.extend(f"      - [{r.get('kind')}] line {r.get('line')}: {r.get('url')}" for r in processor.remaining_remote[:10])
+                    if len(processor.remaining_remote) > 10:
+                        lines.append(f"      - ... {len(processor.remaining_remote) - 10} more")
+            print("\n".join(lines))
+        # 汇总报告
+        remaining = getattr(processor, "remaining_remote", [])
+        row = (str(md), dl, repl, ref, getattr(processor, "remote_expected", 0), len(remaining), remaining)
+        if ndjson_out is not None:
+            # NDJSON：每处理完一个文件就写一行，不在内存里攒整份报告，中途中断也保留已完成的记录
+            try:
+                record = dict(zip(REPORT_FIELDS, row))
+                if orjson is not None:
+                    ndjson_out.write(orjson.dumps(record).decode("utf-8") + "\n")
+                else:
+                    ndjson_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"⚠️ Failed to write report record: {e}")
+        else:
+            reports[slot] = row
+
+    # 写入同一附件目录的文件必须逐个处理（ensure_unique_path 不能并发），不同附件目录之间并发
+    # 附件目录可能是指向共享目录的符号链接，需解析；同一目录下的文件只解析一次
+    # 组内按 (md_files 下标, 路径) 记录：槽位按下标定位，不依赖路径唯一
+    groups: Dict[str, List[Tuple[int, Path]]] = {}
+    attach_keys: Dict[Path, str] = {}
+    for slot, md in enumerate(md_files):
+        key = attach_keys.get(md.parent)
+        if key is None:
+            try:
+                key = str((md.parent / args.attach_dir_name).resolve())
+            except Exception:
+                key = str(md.parent / args.attach_dir_name)
+            attach_keys[md.parent] = key
+        groups.setdefault(key, []).append((slot, md))
+    jobs = max(1, min(args.jobs, len(groups)))
+    if jobs == 1:
+        for slot, md in enumerate(md_files):
+            report(slot, *process_one(md))
+    else:
+        # 各组并发处理，结果放进按 md_files 位置的槽位；主线程按文件列表顺序逐个等待并输出，
+        # 终端输出、NDJSON 行序与 --sort 的顺序一致，不会一个附件目录一个附件目录地成批出现
+        outcomes: list = [None] * len(md_files)
+        ready = threading.Condition()
+
+        def run_group(group: List[Tuple[int, Path]]) -> None:
+            for slot, md in group:
+                try:
+                    outcome = process_one(md)
+                except BaseException as e:  # 保证槽位一定被填上，主线程不会一直等
+                    outcome = (md, None, e, [])
+                with ready:
+                    outcomes[slot] = outcome
+                    ready.notify_all()
+
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="mil-file") as pool:
+            for group in groups.values():
+                pool.submit(run_group, group)
+            for i in range(len(md_files)):
+                with ready:
+                    while outcomes[i] is None:
+                        ready.wait()
+                    outcome, outcomes[i] = outcomes[i], None
+                report(i, *outcome)
+    if cache is not None:
+        cache.flush()
 
     print("——")
     if args.dry_run:
@@ -1005,14 +2191,40 @@ def main() -> None:
     else:
         print(f"✅ Done. Processed {processed} file(s). Downloaded {total_would_dl} image(s). Replaced {total_repl} block(s). Updated {total_ref} reference definition(s).")
         # 写报告（如指定）
-        if args.report:
+        if ndjson_out is not None:
             try:
-                report_path = args.report.expanduser().resolve()
-                report_path.parent.mkdir(parents=True, exist_ok=True)
-                report_path.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+                ndjson_out.close()
                 print(f"📝 Report written: {report_path}")
             except Exception as e:
                 print(f"⚠️ Failed to write report: {e}")
+        elif report_path is not None:
+            # 先写同目录 .tmp 并 fsync，再 os.replace 覆盖：中途崩溃不会留下截断的 JSON，旧报告保持完整
+            tmp = report_path.with_name(report_path.name + ".tmp")
+            try:
+                records = [dict(zip(REPORT_FIELDS, row)) for row in reports if row is not None]
+                # 装了 orjson 时一次编码成 UTF-8 字节写出；否则边序列化边写入 1 MiB 缓冲的文件。默认紧凑格式
+                if orjson is not None:
+                    option = orjson.OPT_INDENT_2 if args.pretty_report else 0
+                    with open(tmp, "wb") as f:
+                        f.write(orjson.dumps(records, option=option))
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    with open(tmp, "w", encoding="utf-8", buffering=REPORT_WRITE_BUFFER) as f:
+                        if args.pretty_report:
+                            json.dump(records, f, ensure_ascii=False, indent=2)
+                        else:
+                            json.dump(records, f, ensure_ascii=False, separators=(",", ":"))
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp, report_path)
+                print(f"📝 Report written: {report_path}")
+            except Exception as e:
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+                print(f"⚠️ Failed to write report: {e}")
 
 if __name__ == "__main__":
     main()